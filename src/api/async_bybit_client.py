@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Асинхронный Bybit API клиент на asyncio/aiohttp
+Повторяет публичные методы BybitClient и использует общий пул соединений,
+ту же подпись запросов, синхронизацию времени и ограничение частоты
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Any
+
+import aiohttp
+
+from .bybit_client import (
+    DUPLICATE_ORDER_LINK_ID,
+    BybitAPIError,
+    BybitClient,
+    BybitConnectionError,
+    RateLimiter,
+    ServerClock,
+    SingleFlight,
+    batch_failures,
+    build_query_string,
+    generate_signature,
+    mark_already_placed,
+    order_ref,
+    split_batch_result,
+)
+from . import json_codec
+from .klines import KlineArray
+from .metrics import ApiMetrics
+from .pagination import aiter_pages
+from .resilience import ResilienceLayer
+
+
+class AsyncBybitClient:
+    """Асинхронный клиент для работы с Bybit API
+
+    Все запросы идут через одну aiohttp.ClientSession с пулом соединений,
+    поэтому сотни символов можно загружать конкурентно из одного event loop.
+
+    Пример:
+        async with AsyncBybitClient(api_key, api_secret) as client:
+            klines = await client.get_kline_many('spot', symbols, '60')
+    """
+
+    TIMESTAMP_ERROR_CODES = BybitClient.TIMESTAMP_ERROR_CODES
+
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = True,
+                 max_connections: int = 100, rate_limiter: Optional[RateLimiter] = None,
+                 base_url: Optional[str] = None):
+        """
+        Args:
+            api_key: API ключ
+            api_secret: API секрет
+            testnet: Использовать тестовую сеть
+            max_connections: Размер пула соединений
+            rate_limiter: Общий RateLimiter (например, из синхронного BybitClient)
+            base_url: Переопределение адреса API (для локальных стендов)
+        """
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.testnet = testnet
+        self.recv_window = 20000
+
+        if base_url:
+            self.base_url = base_url.rstrip('/')
+        elif testnet:
+            self.base_url = "https://api-testnet.bybit.com"
+        else:
+            self.base_url = "https://api.bybit.com"
+
+        self.max_connections = max_connections
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # Одинаковые одновременные GET (например, из get_kline_many) выполняются один раз
+        self.single_flight = SingleFlight()
+        # Задержки, размеры, ожидание лимитов, повторы и ошибки по endpoint
+        self.metrics = ApiMetrics()
+        # Повторы временных ошибок и размыкатели цепи по endpoint
+        self.resilience = ResilienceLayer(metrics=self.metrics)
+        # Синхронизация выполняется асинхронно в _ensure_clock, поэтому функция запроса не нужна
+        self.clock = ServerClock(None)
+
+        self.logger = logging.getLogger(__name__)
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._clock_lock: Optional[asyncio.Lock] = None
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Ленивое создание общей сессии с пулом соединений"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=10),
+                headers={'Content-Type': 'application/json', 'User-Agent': 'TradingBot/1.0'}
+            )
+        return self._session
+
+    async def close(self):
+        """Закрытие сессии и пула соединений"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _fetch_server_time_ms(self) -> Optional[int]:
+        """Запрос времени сервера без аутентификации (None при ошибке)"""
+        try:
+            session = await self._get_session()
+            async with session.get(f"{self.base_url}/v5/market/time", timeout=aiohttp.ClientTimeout(total=5)) as response:
+                response.raise_for_status()
+                data = json_codec.loads(await response.read())
+                if data.get('retCode') == 0:
+                    result = data.get('result', {})
+                    time_nano = result.get('timeNano')
+                    if time_nano:
+                        return int(time_nano) // 1_000_000
+                    return int(result.get('timeSecond', 0)) * 1000
+        except Exception as e:
+            self.logger.debug(f"Ошибка получения времени сервера: {e}")
+        return None
+
+    async def sync_clock(self) -> bool:
+        """Измерение смещения часов сервера"""
+        local_before = time.time()
+        mono_before = time.monotonic()
+        server_ms = await self._fetch_server_time_ms()
+        mono_after = time.monotonic()
+        return self.clock.record_measurement(server_ms, local_before, mono_before, mono_after)
+
+    async def _ensure_clock(self):
+        """Синхронизация часов при первом запросе и по истечении интервала"""
+        if not self.clock.needs_resync():
+            return
+        if self._clock_lock is None:
+            self._clock_lock = asyncio.Lock()
+        async with self._clock_lock:
+            # Другая корутина могла уже выполнить синхронизацию
+            if self.clock.needs_resync():
+                await self.sync_clock()
+
+    async def _make_request(self, method: str, endpoint: str, params: Dict = None, body: Dict = None) -> Dict:
+        """Выполнение HTTP запроса к API (одинаковые одновременные GET объединяются)"""
+        send = lambda: self._request_with_resync(method, endpoint, params, body)
+        if method.upper() == 'GET':
+            key = (endpoint, build_query_string(params))
+            return await self.single_flight.do_async(
+                key, lambda: self.resilience.call_async(endpoint, send)
+            )
+        payload = body if body is not None else params
+        return await self.resilience.call_async(endpoint, send, idempotent=BybitClient.is_idempotent(payload))
+
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        """Статистика объединения одинаковых GET запросов (hits/misses)"""
+        return self.single_flight.stats()
+
+    def get_resilience_stats(self) -> Dict[str, Any]:
+        """Повторы, фатальные ошибки и состояние размыкателей цепи по endpoint"""
+        return self.resilience.stats()
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Задержки p50/p95/p99, размеры, ожидание лимитов, повторы и коды ошибок по endpoint"""
+        return self.metrics.snapshot()
+
+    async def _request_with_resync(self, method: str, endpoint: str, params: Dict = None, body: Dict = None) -> Dict:
+        """Запрос с однократным повтором после пересинхронизации часов"""
+        try:
+            return await self._send_request(method, endpoint, params, body)
+        except BybitAPIError as e:
+            if e.ret_code not in self.TIMESTAMP_ERROR_CODES:
+                raise
+            self.logger.warning(f"Ошибка синхронизации времени ({e.ret_code}), пересинхронизация часов")
+            await self.sync_clock()
+            return await self._send_request(method, endpoint, params, body)
+
+    async def _send_request(self, method: str, endpoint: str, params: Dict = None, body: Dict = None) -> Dict:
+        """Подпись и отправка одного HTTP запроса к API"""
+        method = method.upper()
+        self.metrics.record_rate_limit_wait(endpoint, await self.rate_limiter.acquire_async(endpoint))
+        await self._ensure_clock()
+
+        url = f"{self.base_url}{endpoint}"
+        timestamp = str(self.clock.now_ms())
+
+        if method == 'GET':
+            payload = build_query_string(params)
+            if payload:
+                # Отправляем ровно ту строку, которая была подписана
+                url = f"{url}?{payload}"
+            data_str = None
+        elif method == 'POST':
+            request_body = body if body is not None else (params or {})
+            payload = json_codec.dumps_str(request_body)
+            data_str = payload
+        else:
+            raise ValueError(f"Неподдерживаемый HTTP метод: {method}")
+
+        headers = {
+            'X-BAPI-API-KEY': self.api_key,
+            'X-BAPI-TIMESTAMP': timestamp,
+            'X-BAPI-SIGN': generate_signature(self.api_key, self.api_secret, self.recv_window, timestamp, payload),
+            'X-BAPI-RECV-WINDOW': str(self.recv_window),
+            'Content-Type': 'application/json'
+        }
+
+        started = time.perf_counter()
+        raw = b''
+        error_code = None
+        try:
+            try:
+                session = await self._get_session()
+                async with session.request(method, url, data=data_str, headers=headers) as response:
+                    self.rate_limiter.update_from_headers(endpoint, response.headers)
+                    response.raise_for_status()
+                    raw = await response.read()
+            except aiohttp.ClientResponseError as e:
+                self.logger.error(f"Ошибка HTTP запроса: {e}")
+                error_code = e.status
+                raise BybitConnectionError(f"Ошибка соединения с API: {e}", e.status)
+            except aiohttp.ClientError as e:
+                self.logger.error(f"Ошибка HTTP запроса: {e}")
+                error_code = type(e).__name__
+                raise BybitConnectionError(f"Ошибка соединения с API: {e}")
+            except asyncio.TimeoutError as e:
+                self.logger.error(f"Таймаут HTTP запроса: {endpoint}")
+                error_code = 'timeout'
+                raise BybitConnectionError(f"Ошибка соединения с API: таймаут {endpoint}") from e
+
+            try:
+                data = json_codec.loads(raw)
+            except ValueError as e:
+                self.logger.error(f"Ошибка парсинга JSON: {e}")
+                error_code = 'invalid_json'
+                raise BybitConnectionError(f"Некорректный ответ API: {e}")
+
+            if data.get('retCode') != 0:
+                error_code = data.get('retCode')
+                error_msg = data.get('retMsg', 'Неизвестная ошибка API')
+                self.logger.error(f"API ошибка: {error_msg}")
+                raise BybitAPIError(f"API ошибка: {error_msg}", data.get('retCode'))
+
+            if endpoint in BybitClient.BATCH_ENDPOINTS:
+                return dict(data.get('result') or {}, retExtInfo=data.get('retExtInfo') or {})
+            return data.get('result', {})
+        finally:
+            self.metrics.record_request(endpoint, (time.perf_counter() - started) * 1000,
+                                        len(payload), len(raw), error_code)
+
+    async def get_server_time(self) -> int:
+        """Получение времени сервера"""
+        result = await self._make_request('GET', '/v5/market/time')
+        return int(result.get('timeSecond', 0))
+
+    async def test_connection(self) -> bool:
+        """Тест соединения с API"""
+        try:
+            await self._make_request('GET', '/v5/market/time')
+            return True
+        except Exception as e:
+            self.logger.error(f"Ошибка соединения: {e}")
+            return False
+
+    async def get_wallet_balance(self, account_type: str = "UNIFIED", coin: str = None) -> Dict:
+        """Получение баланса кошелька (пустой словарь при ошибке)"""
+        try:
+            params = {'accountType': account_type}
+            if coin:
+                params['coin'] = coin
+            return await self._make_request('GET', '/v5/account/wallet-balance', params)
+        except Exception as e:
+            self.logger.error(f"Ошибка получения баланса кошелька: {e}")
+            return {}
+
+    async def get_fund_balance(self, coin: str = None) -> Dict:
+        """Получение баланса FUND кошелька"""
+        params = {'accountType': 'FUND'}
+        if coin:
+            params['coin'] = coin
+        return await self._make_request('GET', '/v5/asset/transfer/query-account-coins-balance', params)
+
+    async def get_positions(self, category: str = "linear", symbol: str = None, settle_coin: str = "USDT") -> List[Dict]:
+        """Получение позиций (пустой список при ошибке)"""
+        params = {'category': category}
+        if symbol:
+            params['symbol'] = symbol
+        elif settle_coin:
+            params['settleCoin'] = settle_coin
+        try:
+            result = await self._make_request('GET', '/v5/position/list', params)
+            return result.get('list', [])
+        except Exception as e:
+            self.logger.error(f"Ошибка получения позиций: {e}")
+            return []
+
+    async def get_tickers(self, category: str = "linear", symbol: str = None) -> List[Dict]:
+        """Получение тикеров"""
+        params = {'category': category}
+        if symbol:
+            params['symbol'] = symbol
+        result = await self._make_request('GET', '/v5/market/tickers', params)
+        return result.get('list', [])
+
+    async def get_kline(self, category: str, symbol: str, interval: str, limit: int = 200,
+                        start: int = None, end: int = None) -> KlineArray:
+        """Получение исторических данных (свечи) в виде KlineArray"""
+        params = {
+            'category': category,
+            'symbol': symbol,
+            'interval': interval,
+            'limit': limit
+        }
+        if start is not None:
+            params['start'] = int(start)
+        if end is not None:
+            params['end'] = int(end)
+
+        result = await self._make_request('GET', '/v5/market/kline', params)
+        return KlineArray.from_rows(result.get('list', []))
+
+    async def get_kline_many(self, category: str, symbols: List[str], interval: str,
+                             limit: int = 200, start: int = None, end: int = None) -> Dict[str, Any]:
+        """Конкурентная загрузка свечей для множества символов
+
+        Returns:
+            Dict[str, Any]: symbol -> KlineArray со свечами, либо Exception, если загрузка не удалась
+        """
+        results = await asyncio.gather(
+            *[self.get_kline(category, symbol, interval, limit, start, end) for symbol in symbols],
+            return_exceptions=True
+        )
+        return dict(zip(symbols, results))
+
+    async def get_instruments_info(self, category: str, symbol: str = None) -> List[Dict]:
+        """Получение информации об инструментах"""
+        params = {'category': category}
+        if symbol:
+            params['symbol'] = symbol
+        result = await self._make_request('GET', '/v5/market/instruments-info', params)
+        return result.get('list', [])
+
+    async def place_order(self, category: str, symbol: str, side: str, order_type: str,
+                          qty: str, price: str = None, **kwargs) -> Dict:
+        """Размещение ордера"""
+        params = {
+            'category': category,
+            'symbol': symbol,
+            'side': side,
+            'orderType': order_type,
+            'qty': qty
+        }
+        if price:
+            params['price'] = price
+        params.update(kwargs)
+        params.setdefault('orderLinkId', f"rest-{uuid.uuid4().hex[:28]}")
+        try:
+            return await self._make_request('POST', '/v5/order/create', params)
+        except BybitAPIError as e:
+            if e.ret_code != DUPLICATE_ORDER_LINK_ID:
+                raise
+            # Повтор после обрыва: ордер разместила первая отправка
+            order = await self.get_order(category, symbol, order_link_id=params['orderLinkId'])
+            if order is None:
+                raise
+            self.logger.info(f"Ордер {params['orderLinkId']} уже размещён, повтор отклонён как дубликат")
+            return order_ref(order)
+
+    async def cancel_order(self, category: str, symbol: str, order_id: str = None,
+                           order_link_id: str = None) -> Dict:
+        """Отмена ордера"""
+        params = {'category': category, 'symbol': symbol}
+        if order_id:
+            params['orderId'] = order_id
+        elif order_link_id:
+            params['orderLinkId'] = order_link_id
+        else:
+            raise ValueError("Необходимо указать order_id или order_link_id")
+        return await self._make_request('POST', '/v5/order/cancel', params)
+
+    async def _batch_request(self, endpoint: str, category: str, requests_: List[Dict]) -> List[Dict]:
+        """Пакеты по BATCH_LIMITS[category] с результатом по каждому ордеру (см. BybitClient)"""
+        limit = BybitClient.BATCH_LIMITS.get(category, 10)
+        results: List[Dict] = []
+        for start in range(0, len(requests_), limit):
+            chunk = requests_[start:start + limit]
+            try:
+                result = await self._make_request('POST', endpoint, body={'category': category, 'request': chunk})
+            except BybitAPIError as e:
+                results.extend(batch_failures(chunk, e.ret_code, str(e)))
+                continue
+            except Exception as e:
+                if not results:
+                    raise
+                results.extend(batch_failures(requests_[start:], None, str(e)))
+                break
+            results.extend(split_batch_result(chunk, result))
+        if endpoint == '/v5/order/create-batch':
+            await self._resolve_duplicates(category, results)
+        return results
+
+    async def _resolve_duplicates(self, category: str, results: List[Dict]):
+        """Дубликаты orderLinkId в результате пакета - уже размещённые ордера (см. BybitClient)"""
+        for item in results:
+            if item['code'] != DUPLICATE_ORDER_LINK_ID or not item.get('orderLinkId'):
+                continue
+            try:
+                order = await self.get_order(category, item.get('symbol'), order_link_id=item['orderLinkId'])
+            except Exception as e:
+                self.logger.warning(f"Не удалось проверить ордер {item['orderLinkId']}: {e}")
+                continue
+            if order is not None:
+                mark_already_placed(item, order)
+
+    async def place_batch_orders(self, category: str, orders: List[Dict]) -> List[Dict]:
+        """Пакетное размещение ордеров (/v5/order/create-batch), результат по каждому ордеру"""
+        requests_ = []
+        for order in orders:
+            request = dict(order)
+            request.setdefault('orderLinkId', f"batch-{uuid.uuid4().hex[:26]}")
+            requests_.append(request)
+        return await self._batch_request('/v5/order/create-batch', category, requests_)
+
+    async def amend_batch_orders(self, category: str, amendments: List[Dict]) -> List[Dict]:
+        """Пакетное изменение ордеров (/v5/order/amend-batch)"""
+        return await self._batch_request('/v5/order/amend-batch', category, BybitClient._order_refs(amendments))
+
+    async def cancel_batch_orders(self, category: str, cancellations: List[Dict]) -> List[Dict]:
+        """Пакетная отмена ордеров (/v5/order/cancel-batch)"""
+        return await self._batch_request('/v5/order/cancel-batch', category, BybitClient._order_refs(cancellations))
+
+    async def get_open_orders(self, category: str = "spot", symbol: str = None, limit: int = 50) -> Dict:
+        """Получение открытых ордеров"""
+        params = {'category': category, 'limit': limit}
+        if symbol:
+            params['symbol'] = symbol
+        return await self._make_request('GET', '/v5/order/realtime', params)
+
+    async def get_order(self, category: str, symbol: str = None, order_id: str = None,
+                        order_link_id: str = None) -> Optional[Dict]:
+        """Ордер по orderId или orderLinkId, None - биржа его не знает (см. BybitClient.get_order)"""
+        params = {'category': category}
+        if symbol:
+            params['symbol'] = symbol
+        if order_id:
+            params['orderId'] = order_id
+        elif order_link_id:
+            params['orderLinkId'] = order_link_id
+        else:
+            raise ValueError("Необходимо указать order_id или order_link_id")
+        result = await self._make_request('GET', '/v5/order/realtime', params)
+        orders = result.get('list') or []
+        return orders[0] if orders else None
+
+    async def get_order_history(self, category: str, symbol: str = None, limit: int = 50) -> List[Dict]:
+        """Получение истории ордеров"""
+        params = {'category': category, 'limit': limit}
+        if symbol:
+            params['symbol'] = symbol
+        result = await self._make_request('GET', '/v5/order/history', params)
+        return result.get('list', [])
+
+    async def get_execution_list(self, category: str, symbol: str = None, limit: int = 50) -> List[Dict]:
+        """Получение истории исполнений"""
+        params = {'category': category, 'limit': limit}
+        if symbol:
+            params['symbol'] = symbol
+        result = await self._make_request('GET', '/v5/execution/list', params)
+        return result.get('list', [])
+
+    def iter_order_history(self, category: str, symbol: str = None, start_time: int = None,
+                           end_time: int = None, limit: int = None, **filters) -> AsyncIterator[Dict]:
+        """Вся история ордеров по страницам (async for), окна по 7 дней"""
+        params = dict(filters, category=category, symbol=symbol)
+        return aiter_pages(self._make_request, '/v5/order/history', params, start_time, end_time, limit)
+
+    def iter_executions(self, category: str, symbol: str = None, start_time: int = None,
+                        end_time: int = None, limit: int = None, **filters) -> AsyncIterator[Dict]:
+        """Все исполнения по страницам (async for), окна по 7 дней"""
+        params = dict(filters, category=category, symbol=symbol)
+        return aiter_pages(self._make_request, '/v5/execution/list', params, start_time, end_time, limit)
+
+    def iter_transfers(self, coin: str = None, status: str = None, start_time: int = None,
+                       end_time: int = None, limit: int = None) -> AsyncIterator[Dict]:
+        """Все внутренние переводы по страницам (async for), окна по 7 дней"""
+        params = {'coin': coin, 'status': status}
+        return aiter_pages(self._make_request, '/v5/asset/transfer/query-inter-transfer-list',
+                           params, start_time, end_time, limit)
+
+    async def inter_transfer(self, coin: str, amount: str, from_account: str, to_account: str) -> Dict:
+        """Внутренний перевод между кошельками"""
+        body = {
+            'transferId': str(uuid.uuid4()),
+            'coin': coin,
+            'amount': amount,
+            'fromAccountType': from_account,
+            'toAccountType': to_account
+        }
+        return await self._make_request('POST', '/v5/asset/transfer/inter-transfer', body=body)
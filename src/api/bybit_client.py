@@ -6,46 +6,654 @@ Bybit API клиент для торгового бота
 """
 
 import time
+import asyncio
+import copy
 import hmac
 import hashlib
 import requests
-import json
 import logging
-from typing import Dict, List, Optional, Any
+import sys
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta
 import threading
+from collections import OrderedDict
 from decimal import Decimal
 
+from . import json_codec
+from .journal import ApiJournal
+from .metrics import ApiMetrics
+from .pagination import iter_pages
+from .interval_capabilities import IntervalCapabilityCache, default_capabilities_path
+from .klines import KlineArray
+from .resilience import ResilienceLayer
+
+
+def generate_signature(api_key: str, api_secret: str, recv_window: int, timestamp: str, payload: str) -> str:
+    """Генерация подписи HMAC-SHA256 для запроса согласно спецификации Bybit V5
+
+    Строка для подписи: timestamp + api_key + recv_window + payload
+    где payload - это query string для GET или raw body для POST
+    """
+    # Очистка API ключа и секрета от пробелов и невидимых символов
+    sign_str = f"{timestamp}{api_key.strip()}{recv_window}{payload}"
+    return hmac.new(
+        api_secret.strip().encode('utf-8'),
+        sign_str.encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+
+
+def build_query_string(params: Optional[Dict]) -> str:
+    """Query string с отсортированными параметрами (в том же виде, в каком она подписывается)"""
+    if not params:
+        return ''
+    return '&'.join([f"{k}={v}" for k, v in sorted(params.items())])
+
+
+def format_klines(klines: List[List]) -> List[Dict]:
+    """Преобразование строк свечей API в список словарей (совместимое представление KlineArray)"""
+    return KlineArray.from_rows(klines).to_dicts()
+
+
+def split_batch_result(requests_: List[Dict], result: Dict) -> List[Dict]:
+    """Результат пакетного запроса по ордерам в порядке requests_
+
+    Биржа возвращает result.list и retExtInfo.list в порядке запроса; каждый
+    элемент ответа: symbol, orderId, orderLinkId, code, msg и success.
+    """
+    rows = result.get('list') or []
+    infos = (result.get('retExtInfo') or {}).get('list') or []
+    items = []
+    for index, request in enumerate(requests_):
+        row = rows[index] if index < len(rows) else {}
+        info = infos[index] if index < len(infos) else {}
+        code = info.get('code', 0 if row.get('orderId') else None)
+        items.append({
+            'symbol': request.get('symbol'),
+            'orderId': row.get('orderId') or request.get('orderId', ''),
+            'orderLinkId': row.get('orderLinkId') or request.get('orderLinkId', ''),
+            'code': code,
+            'msg': info.get('msg') or ('OK' if code == 0 else 'Нет результата для ордера'),
+            'success': code == 0
+        })
+    return items
+
+
+def batch_failures(requests_: List[Dict], code: Optional[int], msg: str) -> List[Dict]:
+    """Одинаковый отказ для всех ордеров пакета (запрос отклонён целиком)"""
+    return [{
+        'symbol': request.get('symbol'),
+        'orderId': request.get('orderId', ''),
+        'orderLinkId': request.get('orderLinkId', ''),
+        'code': code,
+        'msg': msg,
+        'success': False
+    } for request in requests_]
+
+
+class BybitAPIError(Exception):
+    """Ошибка, возвращённая API Bybit (retCode != 0)"""
+
+    def __init__(self, message: str, ret_code: Optional[int] = None):
+        super().__init__(message)
+        self.ret_code = ret_code
+
+
+# Повтор ордера отклонён: ордер с таким orderLinkId уже есть (первая отправка дошла до биржи)
+DUPLICATE_ORDER_LINK_ID = 110072
+
+
+def order_ref(order: Dict) -> Dict:
+    """Ответ в формате /v5/order/create по записи ордера"""
+    return {'orderId': order.get('orderId', ''), 'orderLinkId': order.get('orderLinkId', '')}
+
+
+def mark_already_placed(item: Dict, order: Dict) -> Dict:
+    """Элемент результата пакета, отклонённый как дубликат, для уже размещённого ордера"""
+    item.update(orderId=order.get('orderId', ''), code=0, msg='OK (ордер уже размещён)', success=True)
+    return item
+
+
+class BybitConnectionError(Exception):
+    """Сбой транспорта: обрыв соединения, таймаут, HTTP ошибка или некорректный ответ"""
+
+    def __init__(self, message: str, http_status: Optional[int] = None):
+        super().__init__(message)
+        self.http_status = http_status
+
+
+class TokenBucket:
+    """Token bucket для одной группы эндпоинтов
+
+    Блокировка удерживается только на время пересчёта токенов, ожидание
+    выполняется вне блокировки, поэтому ограниченный поток не мешает остальным.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Скорость пополнения (запросов в секунду)
+            capacity: Максимальный размер всплеска запросов
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self._last_refill = now
+
+    def try_acquire(self) -> float:
+        """Попытка взять токен без ожидания
+
+        Returns:
+            float: 0.0, если токен получен, иначе рекомендуемое время ожидания в секундах
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return 0.0
+            return (1.0 - self.tokens) / self.rate
+
+    def acquire(self) -> float:
+        """Блокирующее получение токена
+
+        Returns:
+            float: Суммарное время ожидания в секундах
+        """
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self) -> float:
+        """Асинхронное получение токена (ожидание через asyncio.sleep)"""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
 
 class RateLimiter:
-    """Контроль частоты запросов к API"""
-    
-    def __init__(self, max_requests: int = 120, time_window: int = 60):
-        self.max_requests = max_requests
-        self.time_window = time_window
-        self.requests = []
-        self.lock = threading.Lock()
-    
-    def wait_if_needed(self):
-        """Ожидание если превышен лимит запросов"""
-        with self.lock:
-            now = time.time()
-            # Удаляем старые запросы
-            self.requests = [req_time for req_time in self.requests 
-                           if now - req_time < self.time_window]
-            
-            if len(self.requests) >= self.max_requests:
-                sleep_time = self.time_window - (now - self.requests[0]) + 1
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
-                    self.requests = []
-            
-            self.requests.append(now)
+    """Контроль частоты запросов к API
+
+    Отдельные token bucket для групп эндпоинтов Bybit: рыночные данные (лимит по IP),
+    аккаунт и ордера (лимиты по UID). Остаток и время сброса окна из заголовков
+    X-Bapi-Limit-Status / X-Bapi-Limit-Reset-Timestamp учитываются по каждому эндпоинту.
+    """
+
+    # (скорость в запросах/сек, размер всплеска) для каждой группы
+    DEFAULT_LIMITS = {
+        'market': (20.0, 40),
+        'account': (10.0, 20),
+        'order': (10.0, 10),
+    }
+
+    def __init__(self, limits: Optional[Dict[str, tuple]] = None):
+        self.limits = dict(self.DEFAULT_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self.buckets = {group: TokenBucket(rate, capacity)
+                        for group, (rate, capacity) in self.limits.items()}
+        # endpoint -> {'remaining': остаток по заголовку, 'reset_at': сброс окна (monotonic)}
+        self._endpoint_status: Dict[str, Dict] = {}
+        self._endpoint_lock = threading.Lock()
+
+    @staticmethod
+    def get_endpoint_group(endpoint: Optional[str]) -> str:
+        """Определение группы лимитов по пути эндпоинта"""
+        if not endpoint or endpoint.startswith('/v5/market/'):
+            return 'market'
+        if endpoint.startswith('/v5/order/'):
+            return 'order'
+        return 'account'
+
+    def get_bucket(self, endpoint: Optional[str] = None) -> TokenBucket:
+        return self.buckets[self.get_endpoint_group(endpoint)]
+
+    def _endpoint_wait(self, endpoint: Optional[str]) -> float:
+        """Время до сброса окна эндпоинта, исчерпавшего свой серверный лимит
+
+        Пока окно не сброшено, каждый запрос уменьшает сообщённый сервером
+        остаток; следующий ответ API уточняет его заново.
+        """
+        if not endpoint:
+            return 0.0
+        with self._endpoint_lock:
+            status = self._endpoint_status.get(endpoint)
+            if status is None:
+                return 0.0
+            now = time.monotonic()
+            if status['reset_at'] is not None and now >= status['reset_at']:
+                del self._endpoint_status[endpoint]
+                return 0.0
+            if status['remaining'] > 0:
+                status['remaining'] -= 1
+                return 0.0
+            return status['reset_at'] - now if status['reset_at'] is not None else 0.0
+
+    def wait_if_needed(self, endpoint: Optional[str] = None) -> float:
+        """Блокирующее ожидание, если лимит эндпоинта или его группы исчерпан"""
+        waited = 0.0
+        while True:
+            wait = self._endpoint_wait(endpoint)
+            if wait <= 0:
+                break
+            time.sleep(wait)
+            waited += wait
+        return waited + self.get_bucket(endpoint).acquire()
+
+    async def acquire_async(self, endpoint: Optional[str] = None) -> float:
+        """Асинхронное ожидание, если лимит эндпоинта или его группы исчерпан"""
+        waited = 0.0
+        while True:
+            wait = self._endpoint_wait(endpoint)
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+            waited += wait
+        return waited + await self.get_bucket(endpoint).acquire_async()
+
+    def update_from_headers(self, endpoint: Optional[str], headers) -> None:
+        """Учёт заголовков лимитов из ответа API
+
+        X-Bapi-Limit-Status - остаток запросов конкретного эндпоинта, поэтому он
+        хранится по эндпоинту и не ограничивает остальные эндпоинты группы.
+        """
+        if not headers or not endpoint:
+            return
+        lowered = {str(k).lower(): v for k, v in headers.items()}
+        try:
+            remaining = lowered.get('x-bapi-limit-status')
+            reset_ts = lowered.get('x-bapi-limit-reset-timestamp')
+            if remaining is None:
+                return
+            reset_at = None
+            if reset_ts is not None:
+                reset_at = time.monotonic() + max(0.0, int(reset_ts) / 1000 - time.time())
+            with self._endpoint_lock:
+                self._endpoint_status[endpoint] = {'remaining': int(remaining), 'reset_at': reset_at}
+        except (TypeError, ValueError):
+            pass
+
+
+class ServerClock:
+    """Синхронизация локальных часов с временем сервера Bybit
+
+    Смещение измеряется одним запросом к /v5/market/time, после чего метки
+    времени для подписи строятся из локального монотонного времени плюс смещение.
+    Повторная синхронизация выполняется в фоне по истечении resync_interval
+    или принудительно после ошибки timestamp/recv_window.
+    """
+
+    def __init__(self, fetch_server_time_ms, resync_interval: float = 300.0):
+        """
+        Args:
+            fetch_server_time_ms: Функция, возвращающая время сервера в мс (или None при ошибке)
+            resync_interval: Период фоновой пересинхронизации в секундах
+        """
+        self._fetch_server_time_ms = fetch_server_time_ms
+        self.resync_interval = resync_interval
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._sync_thread = None
+        # Опорная точка: время сервера (мс) в момент монотонного времени _anchor_monotonic
+        self._anchor_server_ms = None
+        self._anchor_monotonic = 0.0
+        self.offset_ms = 0
+        self.last_rtt_ms = 0.0
+        self.sync_count = 0
+
+    def sync(self) -> bool:
+        """Синхронное измерение смещения часов сервера
+
+        Returns:
+            bool: True, если время сервера получено
+        """
+        if self._fetch_server_time_ms is None:
+            return False
+
+        local_before = time.time()
+        mono_before = time.monotonic()
+        server_ms = self._fetch_server_time_ms()
+        mono_after = time.monotonic()
+
+        return self.record_measurement(server_ms, local_before, mono_before, mono_after)
+
+    def record_measurement(self, server_ms: Optional[int], local_before: float,
+                           mono_before: float, mono_after: float) -> bool:
+        """Учёт результата измерения времени сервера, выполненного извне (например, через aiohttp)
+
+        Args:
+            server_ms: Время сервера в мс или None, если запрос не удался
+            local_before: time.time() перед запросом
+            mono_before: time.monotonic() перед запросом
+            mono_after: time.monotonic() после ответа
+        """
+        if server_ms is None:
+            self.logger.warning("Не удалось получить время сервера для синхронизации часов")
+            return False
+
+        # Считаем, что сервер ответил в середине интервала запроса
+        rtt = mono_after - mono_before
+        mono_mid = mono_before + rtt / 2
+
+        with self._lock:
+            self._anchor_server_ms = int(server_ms)
+            self._anchor_monotonic = mono_mid
+            self.offset_ms = int(server_ms - (local_before + rtt / 2) * 1000)
+            self.last_rtt_ms = rtt * 1000
+            self.sync_count += 1
+
+        self.logger.debug(f"Часы синхронизированы: смещение {self.offset_ms} мс, RTT {self.last_rtt_ms:.1f} мс")
+        return True
+
+    def _resync_in_background(self):
+        """Запуск пересинхронизации в фоновом потоке (не более одного потока одновременно)"""
+        with self._lock:
+            if self._sync_thread is not None and self._sync_thread.is_alive():
+                return
+            self._sync_thread = threading.Thread(target=self.sync, name="bybit-clock-sync", daemon=True)
+            self._sync_thread.start()
+
+    def needs_resync(self) -> bool:
+        """Проверка, устарела ли последняя синхронизация"""
+        with self._lock:
+            if self._anchor_server_ms is None:
+                return True
+            return time.monotonic() - self._anchor_monotonic > self.resync_interval
+
+    def now_ms(self) -> int:
+        """Текущее время сервера в миллисекундах"""
+        # Опорная точка читается под замком: фоновая пересинхронизация
+        # может обновить её в любой момент
+        with self._lock:
+            anchor_server_ms, anchor_monotonic = self._anchor_server_ms, self._anchor_monotonic
+
+        if anchor_server_ms is None:
+            # Первая синхронизация выполняется синхронно, при неудаче используем локальное время
+            if not self.sync():
+                return int(time.time() * 1000)
+            with self._lock:
+                anchor_server_ms, anchor_monotonic = self._anchor_server_ms, self._anchor_monotonic
+            if anchor_server_ms is None:
+                return int(time.time() * 1000)
+
+        elapsed = time.monotonic() - anchor_monotonic
+        server_now = anchor_server_ms + int(elapsed * 1000)
+
+        if elapsed > self.resync_interval and self._fetch_server_time_ms is not None:
+            self._resync_in_background()
+
+        return server_now
+
+
+class _LeaderCancelled(Exception):
+    """Запрос, который ждали в SingleFlight.do_async, отменён вместе с вызвавшей его задачей"""
+
+
+class SingleFlight:
+    """Объединение одинаковых одновременных запросов (single-flight)
+
+    Первый вызов с данным ключом выполняет запрос, остальные вызовы с тем же
+    ключом, пришедшие до его завершения, ждут и получают собственную копию
+    того же результата или то же исключение. Завершённые результаты не кэшируются.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, Dict[str, Any]] = {}
+        self._async_calls: Dict[Any, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def do(self, key, fn):
+        """Синхронный вызов fn() не более одного раза на ключ одновременно"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = {'done': threading.Event(), 'waiters': 0, 'result': None, 'error': None}
+                self._calls[key] = call
+                self.misses += 1
+                leader = True
+            else:
+                call['waiters'] += 1
+                self.hits += 1
+                leader = False
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return copy.deepcopy(call['result'])
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                waiters = call['waiters']
+            if waiters and call['error'] is None:
+                # Снимок для ожидающих: лидер может изменять свой результат после возврата
+                call['result'] = copy.deepcopy(result)
+            call['done'].set()
+        return result
+
+    async def do_async(self, key, coro_factory):
+        """Асинхронный вариант do() для корутин одного event loop
+
+        Если лидер отменён, ожидающие не получают CancelledError: один из них
+        выполняет запрос заново, остальные ждут уже его.
+        """
+        while True:
+            call = self._async_calls.get(key)
+            if call is None:
+                break
+            call['waiters'] += 1
+            with self._lock:
+                self.hits += 1
+            try:
+                # shield: отмена ожидающего не должна отменять общий запрос
+                return copy.deepcopy(await asyncio.shield(call['future']))
+            except _LeaderCancelled:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        call = {'future': future, 'waiters': 0}
+        self._async_calls[key] = call
+        with self._lock:
+            self.misses += 1
+        try:
+            result = await coro_factory()
+        except asyncio.CancelledError:
+            if call['waiters']:
+                future.set_exception(_LeaderCancelled())
+            else:
+                future.cancel()
+            raise
+        except Exception as e:
+            if call['waiters']:
+                future.set_exception(e)
+            else:
+                future.cancel()
+            raise
+        finally:
+            self._async_calls.pop(key, None)
+        future.set_result(copy.deepcopy(result) if call['waiters'] else result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики объединения: hits - запросы, получившие чужой результат"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'in_flight': len(self._calls) + len(self._async_calls),
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+
+def _approx_size(value) -> int:
+    """Приблизительный размер JSON-подобной структуры в байтах"""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_approx_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class TTLCache:
+    """Ограниченный по размеру кэш с временем жизни записей и вытеснением LRU
+
+    Ключи - кортежи (endpoint, query_string), поэтому записи можно сбрасывать
+    целиком по endpoint (например, балансы после размещения ордера).
+    """
+
+    def __init__(self, max_entries: int = 512, default_ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        # key -> (value, expires_at, size)
+        self._entries: 'OrderedDict[Any, tuple]' = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key) -> Optional[Any]:
+        """Значение по ключу или None, если записи нет или она устарела"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        size = _approx_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, endpoint: Optional[str] = None) -> int:
+        """Удаление всех записей endpoint (или всего кэша); возвращает число удалённых"""
+        with self._lock:
+            if endpoint is None:
+                keys = list(self._entries)
+            else:
+                keys = [k for k in self._entries if isinstance(k, tuple) and k and k[0] == endpoint]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        self.invalidate()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики попаданий и занимаемая память"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'approx_bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
 
 
 class BybitClient:
     """Клиент для работы с Bybit API"""
+
+    # Коды ошибок Bybit, связанные с рассинхронизацией времени (timestamp/recv_window)
+    TIMESTAMP_ERROR_CODES = (10002,)
+    
+    # Время жизни кэшированных GET ответов по endpoint (секунды); остальные не кэшируются
+    CACHE_TTLS = {
+        '/v5/market/instruments-info': 6 * 3600,
+        '/v5/market/tickers': 2.0,
+        '/v5/account/wallet-balance': 0.5,
+        '/v5/asset/transfer/query-account-coins-balance': 0.5,
+        '/v5/position/list': 0.5,
+    }
     
+    # Данные аккаунта, сбрасываемые после ордеров и переводов
+    ACCOUNT_CACHE_ENDPOINTS = (
+        '/v5/account/wallet-balance',
+        '/v5/asset/transfer/query-account-coins-balance',
+        '/v5/position/list',
+    )
+    
+    # POST запросы, после которых балансы в кэше считаются устаревшими
+    ACCOUNT_MUTATING_PREFIXES = ('/v5/order/', '/v5/asset/transfer/')
+    
+    # Поля, по которым биржа распознаёт повторную отправку POST запроса
+    IDEMPOTENCY_KEYS = ('orderLinkId', 'transferId')
+
+    # Пакетные endpoint: к result добавляется retExtInfo с кодами по каждому ордеру
+    BATCH_ENDPOINTS = ('/v5/order/create-batch', '/v5/order/amend-batch', '/v5/order/cancel-batch')
+
+    # Максимум ордеров в одном пакетном запросе по категориям
+    BATCH_LIMITS = {'spot': 10, 'linear': 20, 'inverse': 20, 'option': 20}
+
+    @classmethod
+    def is_idempotent(cls, payload: Optional[Dict]) -> bool:
+        """POST можно повторить: у запроса (у каждого ордера пакета) есть идентификатор клиента"""
+        if not payload:
+            return False
+        batch = payload.get('request')
+        if isinstance(batch, list):
+            return bool(batch) and all(any(item.get(k) for k in cls.IDEMPOTENCY_KEYS) for item in batch)
+        return any(payload.get(k) for k in cls.IDEMPOTENCY_KEYS)
+
     def __init__(self, api_key: str, api_secret: str, testnet: bool = True):
         self.api_key = api_key
         self.api_secret = api_secret
@@ -61,9 +669,31 @@ class BybitClient:
         # Rate limiter
         self.rate_limiter = RateLimiter()
         
-        # Кэш для данных
-        self.cache = {}
-        self.cache_timeout = 30  # секунд
+        # Объединение одинаковых одновременных GET запросов
+        self.single_flight = SingleFlight()
+        
+        # Поддерживаемые интервалы свечей по символам (сохраняются между запусками)
+        self.interval_capabilities = IntervalCapabilityCache(default_capabilities_path())
+        
+        # Синхронизация времени с сервером (одна сверка вместо запроса перед каждым вызовом)
+        self.clock = ServerClock(self._fetch_server_time_ms)
+        
+        # Задержки, размеры, ожидание лимитов, повторы и ошибки по endpoint
+        self.metrics = ApiMetrics()
+        
+        # Повторы временных ошибок и размыкатели цепи по endpoint
+        self.resilience = ResilienceLayer(metrics=self.metrics)
+        
+        # Кэш GET ответов: ограниченный LRU с временем жизни по endpoint (CACHE_TTLS)
+        self.cache_timeout = 30  # секунд, для _set_cached_data
+        self.cache_ttls = dict(self.CACHE_TTLS)
+        self.cache = TTLCache(max_entries=512, default_ttl=self.cache_timeout)
+        # Поколения endpoint: увеличиваются при сбросе, проверяются перед записью в кэш
+        self._cache_generations: Dict[str, int] = {}
+        self._cache_lock = threading.Lock()
+        
+        # Журнал запросов/ответов для воспроизведения (start_recording)
+        self.journal: Optional[ApiJournal] = None
         
         # Настройка логирования
         self.logger = logging.getLogger(__name__)
@@ -79,60 +709,126 @@ class BybitClient:
         self.session.encoding = 'utf-8'
     
     def _generate_signature(self, timestamp: str, payload: str) -> str:
-        """Генерация подписи для запроса согласно спецификации Bybit V5
-        
-        Строка для подписи: timestamp + api_key + recv_window + payload
-        где payload - это query string для GET или raw body для POST
-        """
-        # Очистка API ключа и секрета от пробелов и невидимых символов
-        api_key = self.api_key.strip()
-        api_secret = self.api_secret.strip()
-        
-        # Формирование строки для подписи
-        sign_str = f"{timestamp}{api_key}{self.recv_window}{payload}"
-        
-        self.logger.debug(f"Строка для подписи: {sign_str}")
-        
-        # Генерация подписи
-        return hmac.new(
-            api_secret.encode('utf-8'),
-            sign_str.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
+        """Генерация подписи для запроса согласно спецификации Bybit V5"""
+        self.logger.debug(f"Строка для подписи: {timestamp}{self.api_key.strip()}{self.recv_window}{payload}")
+        return generate_signature(self.api_key, self.api_secret, self.recv_window, timestamp, payload)
     
-    def _get_server_time_raw(self) -> int:
-        """Получение времени сервера без аутентификации"""
+    def _fetch_server_time_ms(self) -> Optional[int]:
+        """Запрос времени сервера без аутентификации (None при ошибке)"""
         try:
             url = f"{self.base_url}/v5/market/time"
             response = self.session.get(url, timeout=5)
             response.raise_for_status()
             data = response.json()
             if data.get('retCode') == 0:
-                return int(data.get('result', {}).get('timeSecond', 0)) * 1000
-        except:
-            pass
-        return int(time.time() * 1000)
+                result = data.get('result', {})
+                time_nano = result.get('timeNano')
+                if time_nano:
+                    return int(time_nano) // 1_000_000
+                return int(result.get('timeSecond', 0)) * 1000
+        except Exception as e:
+            self.logger.debug(f"Ошибка получения времени сервера: {e}")
+        return None
+    
+    def _get_server_time_raw(self) -> int:
+        """Время сервера в миллисекундах по синхронизированным часам"""
+        return self.clock.now_ms()
     
     def _make_request(self, method: str, endpoint: str, params: Dict = None, body: Dict = None) -> Dict:
-        """Выполнение HTTP запроса к API"""
-        self.rate_limiter.wait_if_needed()
+        """Выполнение HTTP запроса к API
+        
+        Одинаковые GET запросы (endpoint + отсортированные параметры), выполняемые
+        одновременно из разных потоков, объединяются в один сетевой запрос.
+        Временные ошибки повторяются слоем resilience; для endpoint с высокой
+        долей ошибок запросы временно отклоняются с CircuitOpenError.
+        """
+        send = lambda: self._request_with_resync(method, endpoint, params, body)
+        if method.upper() == 'GET':
+            key = (endpoint, build_query_string(params))
+            ttl = self.cache_ttls.get(endpoint)
+            if ttl:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    # Вызывающий код может изменять ответ - отдаём копию
+                    return copy.deepcopy(cached)
+                generation = self._cache_generation(endpoint)
+            result = self.single_flight.do(key, lambda: self.resilience.call(endpoint, send))
+            if ttl:
+                # Ответ, запрошенный до invalidate_account_cache(), в кэш не попадает
+                with self._cache_lock:
+                    if self._cache_generations.get(endpoint, 0) == generation:
+                        self.cache.set(key, copy.deepcopy(result), ttl)
+            return result
+        
+        # POST повторяется при обрыве, только если биржа отбросит дубликат по идентификатору клиента
+        payload = body if body is not None else params
+        result = self.resilience.call(endpoint, send, idempotent=self.is_idempotent(payload))
+        if endpoint.startswith(self.ACCOUNT_MUTATING_PREFIXES):
+            self.invalidate_account_cache()
+        return result
+    
+    def _cache_generation(self, endpoint: str) -> int:
+        with self._cache_lock:
+            return self._cache_generations.get(endpoint, 0)
+    
+    def invalidate_account_cache(self):
+        """Сброс кэшированных балансов и позиций (после ордера, перевода или события кошелька)
+        
+        Поколение endpoint увеличивается, поэтому GET, начатый до сброса,
+        не запишет в кэш устаревший баланс.
+        """
+        with self._cache_lock:
+            for endpoint in self.ACCOUNT_CACHE_ENDPOINTS:
+                self._cache_generations[endpoint] = self._cache_generations.get(endpoint, 0) + 1
+                self.cache.invalidate(endpoint)
+    
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        """Статистика объединения одинаковых GET запросов (hits/misses)"""
+        return self.single_flight.stats()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Статистика кэша ответов: попадания, вытеснения, занимаемая память"""
+        return self.cache.stats()
+    
+    def get_resilience_stats(self) -> Dict[str, Any]:
+        """Повторы, фатальные ошибки и состояние размыкателей цепи по endpoint"""
+        return self.resilience.stats()
+    
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Задержки p50/p95/p99, размеры, ожидание лимитов, повторы и коды ошибок по endpoint"""
+        return self.metrics.snapshot()
+    
+    def _request_with_resync(self, method: str, endpoint: str, params: Dict = None, body: Dict = None) -> Dict:
+        """Запрос с однократным повтором после пересинхронизации часов"""
+        try:
+            return self._send_request(method, endpoint, params, body)
+        except BybitAPIError as e:
+            if e.ret_code not in self.TIMESTAMP_ERROR_CODES:
+                raise
+            # Часы разошлись с сервером - пересинхронизируем и повторяем запрос один раз
+            self.logger.warning(f"Ошибка синхронизации времени ({e.ret_code}), пересинхронизация часов")
+            self.clock.sync()
+            return self._send_request(method, endpoint, params, body)
+    
+    def _send_request(self, method: str, endpoint: str, params: Dict = None, body: Dict = None) -> Dict:
+        """Подпись и отправка одного HTTP запроса к API"""
+        self.metrics.record_rate_limit_wait(endpoint, self.rate_limiter.wait_if_needed(endpoint))
         
         url = f"{self.base_url}{endpoint}"
-        # Получаем серверное время для синхронизации
+        # Метка времени по синхронизированным с сервером часам
         timestamp = str(self._get_server_time_raw())
         
         # Подготовка query string для GET запросов
         query_string = ''
         if params and method.upper() == 'GET':
-            sorted_params = sorted(params.items())
-            query_string = '&'.join([f"{k}={v}" for k, v in sorted_params])
+            query_string = build_query_string(params)
         
         # Подготовка body для POST запросов
         body_str = ''
         if body is not None and method.upper() != 'GET':
-            body_str = json.dumps(body, separators=(',', ':'))
+            body_str = json_codec.dumps_str(body)
         elif params and method.upper() != 'GET':
-            body_str = json.dumps(params, separators=(',', ':'))
+            body_str = json_codec.dumps_str(params)
         
         # Определение payload для подписи
         payload = query_string if method.upper() == 'GET' else body_str
@@ -149,6 +845,9 @@ class BybitClient:
             'Content-Type': 'application/json'
         }
         
+        started = time.perf_counter()
+        response = None
+        error_code = None
         try:
             if method.upper() == 'GET':
                 response = self.session.get(url, params=params, headers=headers, timeout=10)
@@ -158,37 +857,73 @@ class BybitClient:
             else:
                 raise ValueError(f"Неподдерживаемый HTTP метод: {method}")
             
+            self.rate_limiter.update_from_headers(endpoint, response.headers)
+            if self.journal is not None:
+                self._record_response(method, endpoint, payload, response, started)
             response.raise_for_status()
-            data = response.json()
+            data = self._decode_response(response)
             
             # Проверка ответа API
             if data.get('retCode') != 0:
+                error_code = data.get('retCode')
                 error_msg = data.get('retMsg', 'Неизвестная ошибка API')
                 self.logger.error(f"API ошибка: {error_msg}")
-                raise Exception(f"API ошибка: {error_msg}")
-            
+                raise BybitAPIError(f"API ошибка: {error_msg}", data.get('retCode'))
+
+            if endpoint in self.BATCH_ENDPOINTS:
+                return dict(data.get('result') or {}, retExtInfo=data.get('retExtInfo') or {})
             return data.get('result', {})
             
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Ошибка HTTP запроса: {e}")
-            raise Exception(f"Ошибка соединения с API: {e}")
-        except json.JSONDecodeError as e:
+            status = e.response.status_code if e.response is not None else None
+            error_code = status or type(e).__name__
+            raise BybitConnectionError(f"Ошибка соединения с API: {e}", status)
+        except BybitConnectionError:
+            error_code = 'invalid_json'
+            raise
+        finally:
+            self.metrics.record_request(
+                endpoint, (time.perf_counter() - started) * 1000, len(payload),
+                len(response.content) if response is not None else 0, error_code
+            )
+    
+    def start_recording(self, path, append: bool = False) -> ApiJournal:
+        """Запись всех ответов REST в журнал для replay_server (JSONL, .gz - сжатый)"""
+        self.stop_recording()
+        self.journal = ApiJournal(path, append=append)
+        self.logger.info(f"Запись запросов API в журнал {self.journal.path}")
+        return self.journal
+    
+    def stop_recording(self):
+        journal, self.journal = self.journal, None
+        if journal is not None:
+            journal.close()
+            self.logger.info(f"Журнал API закрыт: {journal.events} событий")
+    
+    def _record_response(self, method: str, endpoint: str, payload: str, response, started: float):
+        try:
+            body = json_codec.loads(response.content)
+        except ValueError:
+            body = response.text[:1000]
+        self.journal.record_http(method, endpoint, payload, response.status_code, body,
+                                 (time.perf_counter() - started) * 1000)
+    
+    def _decode_response(self, response) -> Dict:
+        """Разбор тела ответа быстрым JSON кодеком"""
+        try:
+            return json_codec.loads(response.content)
+        except ValueError as e:
             self.logger.error(f"Ошибка парсинга JSON: {e}")
-            raise Exception(f"Некорректный ответ API: {e}")
+            raise BybitConnectionError(f"Некорректный ответ API: {e}")
     
     def _get_cached_data(self, cache_key: str) -> Optional[Dict]:
         """Получение данных из кэша"""
-        if cache_key in self.cache:
-            data, timestamp = self.cache[cache_key]
-            if time.time() - timestamp < self.cache_timeout:
-                return data
-            else:
-                del self.cache[cache_key]
-        return None
+        return self.cache.get(cache_key)
     
     def _set_cached_data(self, cache_key: str, data: Dict):
-        """Сохранение данных в кэш"""
-        self.cache[cache_key] = (data, time.time())
+        """Сохранение данных в кэш на cache_timeout секунд"""
+        self.cache.set(cache_key, data, self.cache_timeout)
     
     def get_wallet_balance(self, account_type: str = "UNIFIED", coin: str = None) -> Dict:
         """Получение баланса кошелька для UNIFIED аккаунта
@@ -197,12 +932,7 @@ class BybitClient:
             account_type: Тип аккаунта (только UNIFIED поддерживается)
             coin: Фильтр по монете (опционально)
         """
-        # Отключаем кэширование для отладки
-        # cache_key = f"wallet_balance_{account_type}_{coin or 'all'}"
-        # cached_data = self._get_cached_data(cache_key)
-        # if cached_data:
-        #     return cached_data
-        
+        # Кэшируется в _make_request на доли секунды и сбрасывается после ордеров (CACHE_TTLS)
         self.logger.info(f"Запрос баланса кошелька: {account_type}, монета: {coin or 'все'}")
         
         try:
@@ -210,10 +940,7 @@ class BybitClient:
             if coin:
                 params['coin'] = coin
                 
-            result = self._make_request('GET', '/v5/account/wallet-balance', params)
-            
-            # self._set_cached_data(cache_key, result)
-            return result
+            return self._make_request('GET', '/v5/account/wallet-balance', params)
         except Exception as e:
             self.logger.error(f"Ошибка получения баланса кошелька: {e}")
             import traceback
@@ -226,19 +953,11 @@ class BybitClient:
         Args:
             coin: Фильтр по монете (опционально)
         """
-        cache_key = f"fund_balance_{coin or 'all'}"
-        cached_data = self._get_cached_data(cache_key)
-        if cached_data:
-            return cached_data
-        
         params = {'accountType': 'FUND'}
         if coin:
             params['coin'] = coin
             
-        result = self._make_request('GET', '/v5/asset/transfer/query-account-coins-balance', params)
-        
-        self._set_cached_data(cache_key, result)
-        return result
+        return self._make_request('GET', '/v5/asset/transfer/query-account-coins-balance', params)
     
     def inter_transfer(self, coin: str, amount: str, from_account: str, to_account: str) -> Dict:
         """Внутренний перевод между кошельками
@@ -249,7 +968,6 @@ class BybitClient:
             from_account: Исходный кошелек (например, 'FUND')
             to_account: Целевой кошелек (например, 'UNIFIED')
         """
-        import uuid
         transfer_id = str(uuid.uuid4())
         
         body = {
@@ -277,13 +995,7 @@ class BybitClient:
         return self._make_request('GET', '/v5/asset/transfer/query-transfer-coin-list', params)
     
     def get_positions(self, category: str = "linear", symbol: str = None, settle_coin: str = "USDT") -> List[Dict]:
-        """Получение позиций"""
-        # Отключаем кэширование для отладки
-        # cache_key = f"positions_{category}_{symbol or 'all'}_{settle_coin}"
-        # cached_data = self._get_cached_data(cache_key)
-        # if cached_data:
-        #     return cached_data
-        
+        """Получение позиций (кэшируются на доли секунды и сбрасываются после ордеров, см. CACHE_TTLS)"""
         params = {'category': category}
         if symbol:
             params['symbol'] = symbol
@@ -302,7 +1014,6 @@ class BybitClient:
             if not positions:
                 self.logger.warning(f"Нет позиций для {category} с параметрами {params}")
             
-            # self._set_cached_data(cache_key, positions)
             return positions
         except Exception as e:
             self.logger.error(f"Ошибка получения позиций: {e}")
@@ -311,21 +1022,13 @@ class BybitClient:
             return []
     
     def get_tickers(self, category: str = "linear", symbol: str = None) -> List[Dict]:
-        """Получение тикеров"""
-        cache_key = f"tickers_{category}_{symbol or 'all'}"
-        cached_data = self._get_cached_data(cache_key)
-        if cached_data:
-            return cached_data
-        
+        """Получение тикеров (кэшируются на несколько секунд, см. CACHE_TTLS)"""
         params = {'category': category}
         if symbol:
             params['symbol'] = symbol
         
         result = self._make_request('GET', '/v5/market/tickers', params)
-        tickers = result.get('list', [])
-        
-        self._set_cached_data(cache_key, tickers)
-        return tickers
+        return result.get('list', [])
         
     def _flatten_unified_balance(self, resp: dict) -> dict:
         """UNIFIED → удобный словарь:
@@ -386,7 +1089,6 @@ class BybitClient:
         
     def get_unified_balance_flat(self, coins: list[str] = None) -> dict:
         """Получение плоской структуры баланса UNIFIED кошелька"""
-        # Отключаем кэширование для отладки
         self.logger.info("Запрос баланса UNIFIED кошелька")
         try:
             params = {'accountType': 'UNIFIED'}
@@ -420,7 +1122,7 @@ class BybitClient:
         except Exception:
             return Decimal('0')
     
-    def get_kline(self, category: str, symbol: str, interval: str, limit: int = 200, start: int = None, end: int = None) -> List[Dict]:
+    def get_kline(self, category: str, symbol: str, interval: str, limit: int = 200, start: int = None, end: int = None) -> KlineArray:
         """Получение исторических данных (свечи)
         
         Args:
@@ -430,6 +1132,9 @@ class BybitClient:
             limit: Количество свечей (макс. 1000)
             start: Начальное время в миллисекундах (UNIX timestamp)
             end: Конечное время в миллисекундах (UNIX timestamp)
+        
+        Returns:
+            KlineArray: Колонки NumPy в порядке API (новые первыми); klines[i] возвращает словарь
         """
         params = {
             'category': category,
@@ -445,131 +1150,137 @@ class BybitClient:
             params['end'] = int(end)
         
         result = self._make_request('GET', '/v5/market/kline', params)
-        klines = result.get('list', [])
-        
-        # Преобразование в удобный формат
-        formatted_klines = []
-        for kline in klines:
-            formatted_klines.append({
-                'timestamp': int(kline[0]),
-                'open': float(kline[1]),
-                'high': float(kline[2]),
-                'low': float(kline[3]),
-                'close': float(kline[4]),
-                'volume': float(kline[5])
-            })
         
-        return formatted_klines
+        # Колоночное декодирование без промежуточных словарей
+        return KlineArray.from_rows(result.get('list', []))
     
     def get_klines(self, category: str, symbol: str, interval: str, limit: int = 200, start: int = None, end: int = None) -> Dict:
         """Получение исторических данных (свечи) - обертка для совместимости
         
         Этот метод является оберткой для get_kline, возвращающей результат в формате,
-        ожидаемом в trading_bot_main.py
+        ожидаемом в trading_bot_main.py. Неподдерживаемый интервал заменяется
+        через fetch_with_interval_fallback.
         """
-        try:
-            # Расширенная карта интервалов с поддержкой множественных форматов
-            interval_map = {
-                # Минутные интервалы
-                "1": "1", "1m": "1", "1min": "1",
-                "3": "3", "3m": "3", "3min": "3",
-                "5": "5", "5m": "5", "5min": "5",
-                "15": "15", "15m": "15", "15min": "15",
-                "30": "30", "30m": "30", "30min": "30",
-                
-                # Часовые интервалы
-                "60": "60", "1h": "60", "1hour": "60",
-                "120": "120", "2h": "120", "2hour": "120",
-                "240": "240", "4h": "240", "4hour": "240",
-                "360": "360", "6h": "360", "6hour": "360",
-                "720": "720", "12h": "720", "12hour": "720",
-                
-                # Дневные и недельные интервалы
-                "D": "D", "1d": "D", "1day": "D", "daily": "D",
-                "W": "W", "1w": "W", "1week": "W", "weekly": "W",
-                "M": "M", "1M": "M", "1month": "M", "monthly": "M"
-            }
-            
-            api_interval = interval_map.get(interval, interval)
-            
-            # Получаем данные через базовый метод
-            klines = self._make_request('GET', '/v5/market/kline', {
+        def fetch(kline_interval: str) -> Dict:
+            return self._make_request('GET', '/v5/market/kline', {
                 'category': category,
                 'symbol': symbol,
-                'interval': api_interval,
+                'interval': kline_interval,
                 'limit': limit,
                 **({"start": start} if start is not None else {}),
                 **({"end": end} if end is not None else {})
             })
+        
+        return self.fetch_with_interval_fallback(category, symbol, interval, fetch)[0]
+    
+    def fetch_with_interval_fallback(self, category: str, symbol: str, interval: str,
+                                     fetch: Callable[[str], Any]) -> Tuple[Any, str]:
+        """Запрос свечей с заменой интервала, не поддерживаемого для символа
+        
+        При ошибке "Invalid period" перебираются альтернативные интервалы;
+        результаты запоминаются в interval_capabilities, поэтому заведомо
+        неподдерживаемые интервалы повторно не запрашиваются.
+        
+        Args:
+            fetch: fetch(интервал в формате API) - запрос свечей (REST или локальное хранилище)
+        
+        Returns:
+            Tuple[Any, str]: Результат fetch и интервал, с которым он получен
+        """
+        # Расширенная карта интервалов с поддержкой множественных форматов
+        interval_map = {
+            # Минутные интервалы
+            "1": "1", "1m": "1", "1min": "1",
+            "3": "3", "3m": "3", "3min": "3",
+            "5": "5", "5m": "5", "5min": "5",
+            "15": "15", "15m": "15", "15min": "15",
+            "30": "30", "30m": "30", "30min": "30",
             
-            return klines
-        except Exception as e:
-            error_msg = str(e)
-            # Если ошибка связана с неподдерживаемым интервалом, пробуем альтернативные
-            if "Invalid period" in error_msg or "invalid interval" in error_msg.lower():
-                self.logger.warning(f"Интервал {interval} не поддерживается для {symbol}, пробуем альтернативные")
-                
-                # Расширенный список альтернативных интервалов в порядке приоритета
-                alternative_intervals = []
-                
-                # Определяем альтернативы на основе исходного интервала
-                if interval in ["1h", "60", "1hour"]:
-                    alternative_intervals = ["30", "15", "240", "120"]  # 30m, 15m, 4h, 2h
-                elif interval in ["4h", "240", "4hour"]:
-                    alternative_intervals = ["120", "60", "360", "D"]  # 2h, 1h, 6h, 1d
-                elif interval in ["1d", "D", "daily"]:
-                    alternative_intervals = ["720", "240", "W"]  # 12h, 4h, 1w
-                elif interval in ["15", "15m", "15min"]:
-                    alternative_intervals = ["5", "30", "60"]  # 5m, 30m, 1h
-                elif interval in ["5", "5m", "5min"]:
-                    alternative_intervals = ["1", "15", "30"]  # 1m, 15m, 30m
-                else:
-                    # Универсальные альтернативы для неизвестных интервалов
-                    alternative_intervals = ["60", "15", "240", "D", "5", "30"]
-                
-                # Пробуем альтернативные интервалы
-                for alt_interval in alternative_intervals:
-                    try:
-                        self.logger.info(f"Пробуем интервал {alt_interval} для {symbol}")
-                        klines = self._make_request('GET', '/v5/market/kline', {
-                            'category': category,
-                            'symbol': symbol,
-                            'interval': alt_interval,
-                            'limit': limit,
-                            **({"start": start} if start is not None else {}),
-                            **({"end": end} if end is not None else {})
-                        })
-                        self.logger.info(f"✅ Успешно получены данные с интервалом {alt_interval} для {symbol}")
-                        return klines
-                    except Exception as alt_error:
-                        self.logger.debug(f"Альтернативный интервал {alt_interval} также не работает: {alt_error}")
-                        continue
-                
-                # Если все альтернативы не сработали, пробуем базовые интервалы
-                basic_intervals = ["60", "15", "D", "5"]  # Самые распространенные интервалы
-                for basic_interval in basic_intervals:
-                    if basic_interval not in alternative_intervals:  # Избегаем повторных попыток
-                        try:
-                            self.logger.info(f"Пробуем базовый интервал {basic_interval} для {symbol}")
-                            klines = self._make_request('GET', '/v5/market/kline', {
-                                'category': category,
-                                'symbol': symbol,
-                                'interval': basic_interval,
-                                'limit': limit,
-                                **({"start": start} if start is not None else {}),
-                                **({"end": end} if end is not None else {})
-                            })
-                            self.logger.info(f"✅ Успешно получены данные с базовым интервалом {basic_interval} для {symbol}")
-                            return klines
-                        except Exception as basic_error:
-                            self.logger.debug(f"Базовый интервал {basic_interval} также не работает: {basic_error}")
-                            continue
-                
-                # Если все альтернативы не сработали
-                self.logger.error(f"❌ Не удалось получить данные для {symbol} ни с одним интервалом")
+            # Часовые интервалы
+            "60": "60", "1h": "60", "1hour": "60",
+            "120": "120", "2h": "120", "2hour": "120",
+            "240": "240", "4h": "240", "4hour": "240",
+            "360": "360", "6h": "360", "6hour": "360",
+            "720": "720", "12h": "720", "12hour": "720",
             
-            self.logger.error(f"API ошибка: {error_msg}")
-            raise Exception(f"API ошибка: {error_msg}")
+            # Дневные и недельные интервалы
+            "D": "D", "1d": "D", "1day": "D", "daily": "D",
+            "W": "W", "1w": "W", "1week": "W", "weekly": "W",
+            "M": "M", "1M": "M", "1month": "M", "monthly": "M"
+        }
+        
+        api_interval = interval_map.get(interval, interval)
+        
+        caps = self.interval_capabilities
+        
+        # Интервал, на который API уже отвечал "Invalid period", не запрашиваем повторно
+        if caps.is_bad(category, symbol, api_interval):
+            caps.record_avoided()
+            error_msg = f"Invalid period: интервал {api_interval} не поддерживается для {symbol} (кэш)"
+        else:
+            try:
+                klines = fetch(api_interval)
+                caps.mark_good(category, symbol, api_interval, api_interval)
+                return klines, api_interval
+            except Exception as e:
+                error_msg = str(e)
+                if not self._is_interval_error(error_msg):
+                    self.logger.error(f"API ошибка: {error_msg}")
+                    raise Exception(f"API ошибка: {error_msg}")
+                caps.mark_bad(category, symbol, api_interval)
+                # Если ошибка связана с неподдерживаемым интервалом, пробуем альтернативные
+                self.logger.warning(f"Интервал {interval} не поддерживается для {symbol}, пробуем альтернативные")
+        
+        # Расширенный список альтернативных интервалов в порядке приоритета
+        # Определяем альтернативы на основе исходного интервала
+        if interval in ["1h", "60", "1hour"]:
+            alternative_intervals = ["30", "15", "240", "120"]  # 30m, 15m, 4h, 2h
+        elif interval in ["4h", "240", "4hour"]:
+            alternative_intervals = ["120", "60", "360", "D"]  # 2h, 1h, 6h, 1d
+        elif interval in ["1d", "D", "daily"]:
+            alternative_intervals = ["720", "240", "W"]  # 12h, 4h, 1w
+        elif interval in ["15", "15m", "15min"]:
+            alternative_intervals = ["5", "30", "60"]  # 5m, 30m, 1h
+        elif interval in ["5", "5m", "5min"]:
+            alternative_intervals = ["1", "15", "30"]  # 1m, 15m, 30m
+        else:
+            # Универсальные альтернативы для неизвестных интервалов
+            alternative_intervals = ["60", "15", "240", "D", "5", "30"]
+        
+        # Если все альтернативы не сработали, пробуем базовые (самые распространенные) интервалы
+        basic_intervals = ["60", "15", "D", "5"]
+        candidates = alternative_intervals + [i for i in basic_intervals if i not in alternative_intervals]
+        
+        # Ранее найденная замена проверяется первой
+        resolved = caps.resolved(category, symbol, api_interval)
+        if resolved:
+            candidates = [resolved] + [i for i in candidates if i != resolved]
+        
+        for alt_interval in candidates:
+            if caps.is_bad(category, symbol, alt_interval):
+                caps.record_avoided()
+                continue
+            try:
+                self.logger.info(f"Пробуем интервал {alt_interval} для {symbol}")
+                klines = fetch(alt_interval)
+                caps.mark_good(category, symbol, api_interval, alt_interval)
+                self.logger.info(f"✅ Успешно получены данные с интервалом {alt_interval} для {symbol}")
+                return klines, alt_interval
+            except Exception as alt_error:
+                if self._is_interval_error(str(alt_error)):
+                    caps.mark_bad(category, symbol, alt_interval)
+                self.logger.debug(f"Альтернативный интервал {alt_interval} также не работает: {alt_error}")
+                continue
+        
+        # Если все альтернативы не сработали
+        self.logger.error(f"❌ Не удалось получить данные для {symbol} ни с одним интервалом")
+        self.logger.error(f"API ошибка: {error_msg}")
+        raise Exception(f"API ошибка: {error_msg}")
+    
+    @staticmethod
+    def _is_interval_error(error_msg: str) -> bool:
+        """Ответ API о неподдерживаемом интервале свечей"""
+        return "Invalid period" in error_msg or "invalid interval" in error_msg.lower()
     
     def place_order(self, category: str, symbol: str, side: str, order_type: str, 
                    qty: str, price: str = None, **kwargs) -> Dict:
@@ -587,9 +1298,21 @@ class BybitClient:
         
         # Дополнительные параметры
         params.update(kwargs)
+        # Свой orderLinkId делает повтор после обрыва безопасным: дубликат биржа отклонит
+        params.setdefault('orderLinkId', f"rest-{uuid.uuid4().hex[:28]}")
         
-        result = self._make_request('POST', '/v5/order/create', params)
-        return result
+        try:
+            return self._make_request('POST', '/v5/order/create', params)
+        except BybitAPIError as e:
+            if e.ret_code != DUPLICATE_ORDER_LINK_ID:
+                raise
+            # Повтор после обрыва: ордер разместила первая отправка
+            order = self.get_order(category, symbol, order_link_id=params['orderLinkId'])
+            if order is None:
+                raise
+            self.logger.info(f"Ордер {params['orderLinkId']} уже размещён, повтор отклонён как дубликат")
+            self.invalidate_account_cache()
+            return order_ref(order)
     
     def cancel_order(self, category: str, symbol: str, order_id: str = None, 
                     order_link_id: str = None) -> Dict:
@@ -608,7 +1331,91 @@ class BybitClient:
         
         result = self._make_request('POST', '/v5/order/cancel', params)
         return result
-    
+
+    def _batch_request(self, endpoint: str, category: str, requests_: List[Dict]) -> List[Dict]:
+        """Отправка ордеров пакетами по BATCH_LIMITS[category] с результатом по каждому ордеру
+
+        Пакет, отклонённый биржей целиком, даёт отказ для каждого его ордера.
+        Сетевая ошибка или разомкнутая цепь на первом пакете пробрасывается
+        (ничего не отправлено); на последующих - неотправленные ордера
+        получают отказ с code=None.
+        """
+        limit = self.BATCH_LIMITS.get(category, 10)
+        results: List[Dict] = []
+        for start in range(0, len(requests_), limit):
+            chunk = requests_[start:start + limit]
+            try:
+                result = self._make_request('POST', endpoint, body={'category': category, 'request': chunk})
+            except BybitAPIError as e:
+                results.extend(batch_failures(chunk, e.ret_code, str(e)))
+                continue
+            except Exception as e:
+                if not results:
+                    raise
+                results.extend(batch_failures(requests_[start:], None, str(e)))
+                break
+            results.extend(split_batch_result(chunk, result))
+        if endpoint == '/v5/order/create-batch':
+            self._resolve_duplicates(category, results)
+        return results
+
+    def _resolve_duplicates(self, category: str, results: List[Dict]):
+        """Ордера пакета, отклонённые как дубликаты orderLinkId, ищутся на бирже
+        и считаются размещёнными (повтор пакета после обрыва соединения)"""
+        for item in results:
+            if item['code'] != DUPLICATE_ORDER_LINK_ID or not item.get('orderLinkId'):
+                continue
+            try:
+                order = self.get_order(category, item.get('symbol'), order_link_id=item['orderLinkId'])
+            except Exception as e:
+                self.logger.warning(f"Не удалось проверить ордер {item['orderLinkId']}: {e}")
+                continue
+            if order is not None:
+                mark_already_placed(item, order)
+
+    @staticmethod
+    def _order_refs(items: List[Dict]) -> List[Dict]:
+        """Копии запросов изменения/отмены; каждый должен ссылаться на ордер"""
+        for item in items:
+            if not (item.get('orderId') or item.get('orderLinkId')):
+                raise ValueError("Необходимо указать orderId или orderLinkId для каждого ордера")
+        return [dict(item) for item in items]
+
+    def place_batch_orders(self, category: str, orders: List[Dict]) -> List[Dict]:
+        """Пакетное размещение ордеров (/v5/order/create-batch)
+
+        Args:
+            category: Категория (spot - до 10 ордеров в запросе, linear/inverse/option - до 20)
+            orders: Ордера в формате API: symbol, side, orderType, qty, price, ...
+
+        Returns:
+            List[Dict]: По элементу на ордер в порядке orders
+                (symbol, orderId, orderLinkId, code, msg, success)
+        """
+        requests_ = []
+        for order in orders:
+            request = dict(order)
+            # Свой orderLinkId у каждого ордера делает повтор пакета безопасным
+            request.setdefault('orderLinkId', f"batch-{uuid.uuid4().hex[:26]}")
+            requests_.append(request)
+        return self._batch_request('/v5/order/create-batch', category, requests_)
+
+    def amend_batch_orders(self, category: str, amendments: List[Dict]) -> List[Dict]:
+        """Пакетное изменение ордеров (/v5/order/amend-batch)
+
+        Args:
+            amendments: symbol, orderId или orderLinkId и изменяемые поля (qty, price, ...)
+        """
+        return self._batch_request('/v5/order/amend-batch', category, self._order_refs(amendments))
+
+    def cancel_batch_orders(self, category: str, cancellations: List[Dict]) -> List[Dict]:
+        """Пакетная отмена ордеров (/v5/order/cancel-batch)
+
+        Args:
+            cancellations: symbol и orderId или orderLinkId для каждого ордера
+        """
+        return self._batch_request('/v5/order/cancel-batch', category, self._order_refs(cancellations))
+
     def get_order_history(self, category: str, symbol: str = None, limit: int = 50) -> List[Dict]:
         """Получение истории ордеров"""
         params = {
@@ -640,6 +1447,29 @@ class BybitClient:
         
         return self._make_request('GET', '/v5/order/realtime', params)
     
+    def get_order(self, category: str, symbol: str = None, order_id: str = None,
+                  order_link_id: str = None) -> Optional[Dict]:
+        """Ордер по orderId или orderLinkId (/v5/order/realtime)
+        
+        По идентификатору биржа возвращает и недавно закрытые ордера, поэтому
+        так можно проверить, дошёл ли запрос, ответ на который не получен.
+        
+        Returns:
+            Optional[Dict]: Запись ордера или None, если биржа его не знает
+        """
+        params = {'category': category}
+        if symbol:
+            params['symbol'] = symbol
+        if order_id:
+            params['orderId'] = order_id
+        elif order_link_id:
+            params['orderLinkId'] = order_link_id
+        else:
+            raise ValueError("Необходимо указать order_id или order_link_id")
+        
+        orders = self._make_request('GET', '/v5/order/realtime', params).get('list') or []
+        return orders[0] if orders else None
+    
     def get_execution_list(self, category: str, symbol: str = None, limit: int = 50) -> List[Dict]:
         """Получение истории исполнений"""
         params = {
@@ -653,6 +1483,36 @@ class BybitClient:
         result = self._make_request('GET', '/v5/execution/list', params)
         return result.get('list', [])
     
+    def iter_order_history(self, category: str, symbol: str = None, start_time: int = None,
+                           end_time: int = None, limit: int = None, **filters) -> Iterator[Dict]:
+        """Вся история ордеров по страницам (nextPageCursor) с разбиением на окна по 7 дней
+        
+        Строки отдаются по одной по мере загрузки страниц.
+        
+        Args:
+            category: Категория (spot, linear, inverse)
+            symbol: Символ торговой пары (опционально)
+            start_time: Начало диапазона в мс (опционально)
+            end_time: Конец диапазона в мс (опционально)
+            limit: Размер страницы (по умолчанию максимальный - 50)
+            **filters: Дополнительные фильтры API (orderStatus, orderFilter и т.д.)
+        """
+        params = dict(filters, category=category, symbol=symbol)
+        return iter_pages(self._make_request, '/v5/order/history', params, start_time, end_time, limit)
+    
+    def iter_executions(self, category: str, symbol: str = None, start_time: int = None,
+                        end_time: int = None, limit: int = None, **filters) -> Iterator[Dict]:
+        """Все исполнения по страницам с разбиением на окна по 7 дней (limit до 100)"""
+        params = dict(filters, category=category, symbol=symbol)
+        return iter_pages(self._make_request, '/v5/execution/list', params, start_time, end_time, limit)
+    
+    def iter_transfers(self, coin: str = None, status: str = None, start_time: int = None,
+                       end_time: int = None, limit: int = None) -> Iterator[Dict]:
+        """Все внутренние переводы между кошельками по страницам с разбиением на окна по 7 дней"""
+        params = {'coin': coin, 'status': status}
+        return iter_pages(self._make_request, '/v5/asset/transfer/query-inter-transfer-list',
+                          params, start_time, end_time, limit)
+    
     def test_connection(self) -> bool:
         """Тест соединения с API"""
         try:
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Реестр торговых инструментов Bybit (spot, linear)
+Параметры инструментов загружаются одним пакетным запросом на категорию,
+сохраняются в таблицу available_symbols и обновляются в фоне. Проверки
+ордеров (qtyStep, minOrderQty, minOrderAmt, tickSize) читаются из памяти.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Any
+
+
+# Поля фильтров instruments-info, поднимаемые на верхний уровень записи
+FILTER_KEYS = ('lotSizeFilter', 'priceFilter', 'leverageFilter')
+
+
+def flatten_instrument(category: str, instrument: Dict) -> Dict:
+    """Плоская запись инструмента: поля фильтров на верхнем уровне плюс category"""
+    record = {k: v for k, v in instrument.items() if k not in FILTER_KEYS}
+    for key in FILTER_KEYS:
+        record.update(instrument.get(key) or {})
+    record['category'] = category
+    return record
+
+
+def _to_float(value, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def order_rules(record: Dict) -> Dict:
+    """Правила размещения ордера в формате TradingEngine.get_instrument_info"""
+    min_order_qty = _to_float(record.get('minOrderQty'))
+    min_order_amt = _to_float(record.get('minOrderAmt'), 5.0) or 5.0  # По умолчанию 5 USDT
+    max_order_qty = _to_float(record.get('maxOrderQty'))
+    max_market_order_qty = _to_float(record.get('maxMarketOrderQty'))
+    qty_step = _to_float(record.get('qtyStep'))
+
+    # Если qtyStep не задан, используем minOrderQty как шаг
+    if qty_step == 0:
+        qty_step = min_order_qty if min_order_qty > 0 else 0.00001
+
+    # Для рыночных ордеров ограничение maxMarketOrderQty обычно реалистичнее maxOrderQty
+    effective_max_qty = max_order_qty
+    if max_market_order_qty > 0 and (max_order_qty == 0 or max_market_order_qty < max_order_qty):
+        effective_max_qty = max_market_order_qty
+
+    return {
+        'symbol': record.get('symbol'),
+        'minOrderQty': min_order_qty,
+        'minOrderAmt': min_order_amt,
+        'maxOrderQty': effective_max_qty,
+        'qtyStep': qty_step,
+        'tickSize': _to_float(record.get('tickSize')),
+        'basePrecision': str(record.get('basePrecision') or '0.00001'),
+        'quotePrecision': str(record.get('quotePrecision') or '0.0000001')
+    }
+
+
+class InstrumentRegistry:
+    """Потокобезопасный реестр инструментов с фоновым обновлением
+
+    Пример:
+        registry = InstrumentRegistry(bybit_client, db_manager)
+        registry.load_from_db()
+        if not registry.is_loaded():
+            registry.refresh()
+        registry.start()
+        rules = registry.get_order_rules('BTCUSDT')
+    """
+
+    CATEGORIES = ('spot', 'linear')
+
+    # Соответствие колонок available_symbols полям записи
+    DB_COLUMNS = {
+        'symbol': 'symbol', 'category': 'category', 'base_coin': 'baseCoin', 'quote_coin': 'quoteCoin',
+        'symbol_status': 'status', 'price_scale': 'priceScale',
+        'tick_size': 'tickSize', 'min_price': 'minPrice', 'max_price': 'maxPrice',
+        'min_order_qty': 'minOrderQty', 'max_order_qty': 'maxOrderQty', 'qty_step': 'qtyStep',
+        'min_order_amt': 'minOrderAmt', 'max_market_order_qty': 'maxMarketOrderQty',
+        'base_precision': 'basePrecision', 'quote_precision': 'quotePrecision',
+        'post_only_max_order_qty': 'postOnlyMaxOrderQty', 'min_leverage': 'minLeverage',
+        'max_leverage': 'maxLeverage', 'leverage_step': 'leverageStep',
+    }
+
+    def __init__(self, rest_client, db_manager=None, categories=CATEGORIES,
+                 refresh_interval: float = 6 * 3600, min_refresh_gap: float = 60.0):
+        """
+        Args:
+            rest_client: BybitClient для загрузки instruments-info
+            db_manager: DatabaseManager для сохранения в available_symbols (опционально)
+            categories: Загружаемые категории
+            refresh_interval: Период фонового обновления в секундах
+            min_refresh_gap: Минимальный интервал между внеочередными обновлениями
+        """
+        self.rest_client = rest_client
+        self.db_manager = db_manager
+        self.categories = tuple(categories)
+        self.refresh_interval = refresh_interval
+        self.min_refresh_gap = min_refresh_gap
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._records: Dict[tuple, Dict] = {}
+        self._rules: Dict[tuple, Dict] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_refresh = 0.0
+        self.refresh_count = 0
+        self.lookups = 0
+        self.misses = 0
+
+    # ---- Загрузка ----
+
+    def is_loaded(self) -> bool:
+        with self._lock:
+            return bool(self._records)
+
+    def _replace(self, records: List[Dict], loaded_at: float):
+        by_key = {(r['category'], r['symbol']): r for r in records if r.get('symbol')}
+        rules = {key: order_rules(record) for key, record in by_key.items()}
+        with self._lock:
+            # Категории, которые не удалось загрузить, сохраняют прежние данные
+            loaded_categories = {key[0] for key in by_key}
+            for key in list(self._records):
+                if key[0] in loaded_categories:
+                    self._records.pop(key)
+                    self._rules.pop(key, None)
+            self._records.update(by_key)
+            self._rules.update(rules)
+            self.last_refresh = loaded_at
+
+    def fetch_category(self, category: str) -> List[Dict]:
+        """Все инструменты категории (постранично по nextPageCursor)"""
+        records = []
+        cursor = None
+        while True:
+            params = {'category': category, 'limit': 1000}
+            if cursor:
+                params['cursor'] = cursor
+            result = self.rest_client._make_request('GET', '/v5/market/instruments-info', params)
+            records.extend(flatten_instrument(category, i) for i in result.get('list', []))
+            cursor = result.get('nextPageCursor')
+            if not cursor:
+                return records
+
+    def refresh(self) -> bool:
+        """Пакетная загрузка всех категорий из API и сохранение в БД"""
+        cache = getattr(self.rest_client, 'cache', None)
+        if cache is not None and hasattr(cache, 'invalidate'):
+            # Ответы instruments-info кэшируются клиентом на часы - обновление должно идти в сеть
+            cache.invalidate('/v5/market/instruments-info')
+
+        records = []
+        for category in self.categories:
+            try:
+                records.extend(self.fetch_category(category))
+            except Exception as e:
+                self.logger.error(f"Ошибка загрузки инструментов {category}: {e}")
+        if not records:
+            return False
+
+        self._replace(records, time.time())
+        self.refresh_count += 1
+        self.logger.info(f"Реестр инструментов обновлён: {len(records)} инструментов")
+
+        if self.db_manager is not None:
+            with self._lock:
+                all_records = list(self._records.values())
+            self.db_manager.save_available_symbols(all_records)
+        return True
+
+    def load_from_db(self) -> bool:
+        """Быстрый старт из таблицы available_symbols без сетевых запросов"""
+        if self.db_manager is None:
+            return False
+        rows = self.db_manager.get_available_symbols(limit=1000000)
+        records = []
+        newest = 0.0
+        for row in rows:
+            row = dict(row)
+            record = {}
+            for column, key in self.DB_COLUMNS.items():
+                if row.get(column) is not None:
+                    record[key] = row[column]
+            records.append(record)
+            newest = max(newest, self._parse_db_time(row.get('last_updated')))
+        if not records:
+            return False
+        self._replace(records, newest)
+        self.logger.info(f"Реестр инструментов загружен из БД: {len(records)} инструментов")
+        return True
+
+    @staticmethod
+    def _parse_db_time(value) -> float:
+        """CURRENT_TIMESTAMP SQLite (UTC) -> unix time"""
+        if not value:
+            return 0.0
+        try:
+            parsed = datetime.strptime(str(value), '%Y-%m-%d %H:%M:%S')
+            return parsed.replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            return 0.0
+
+    # ---- Фоновое обновление ----
+
+    def start(self):
+        """Фоновое обновление; устаревшие данные из БД обновляются сразу"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        if time.time() - self.last_refresh >= self.refresh_interval:
+            self._wake.set()
+        self._thread = threading.Thread(target=self._refresh_loop, name="InstrumentRegistry", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def request_refresh(self):
+        """Внеочередное обновление (например, после запроса неизвестного символа)"""
+        if time.time() - self.last_refresh >= self.min_refresh_gap:
+            self._wake.set()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.refresh()
+            except Exception as e:
+                self.logger.error(f"Ошибка фонового обновления реестра инструментов: {e}")
+
+    # ---- Чтение ----
+
+    def get(self, symbol: str, category: str = 'spot') -> Optional[Dict]:
+        """Плоская запись инструмента или None"""
+        with self._lock:
+            record = self._records.get((category, symbol))
+            return dict(record) if record is not None else None
+
+    def get_order_rules(self, symbol: str, category: str = 'spot') -> Optional[Dict]:
+        """qtyStep/minOrderQty/minOrderAmt/tickSize и т.д. из памяти (None, если символ неизвестен)"""
+        with self._lock:
+            self.lookups += 1
+            rules = self._rules.get((category, symbol))
+            if rules is None:
+                self.misses += 1
+                return None
+            return dict(rules)
+
+    def symbols(self, category: str = 'spot', status: Optional[str] = 'Trading') -> List[str]:
+        with self._lock:
+            return sorted(symbol for (cat, symbol), record in self._records.items()
+                          if cat == category and (status is None or record.get('status') == status))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'instruments': len(self._records),
+                'last_refresh': self.last_refresh,
+                'refresh_count': self.refresh_count,
+                'lookups': self.lookups,
+                'misses': self.misses
+            }
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Кэш поддерживаемых интервалов свечей по (category, symbol)
+Запоминает интервалы, на которые API ответил "Invalid period", и интервал,
+которым удалось заменить запрошенный, чтобы не повторять заведомо неудачные
+запросы. Состояние сохраняется в JSON и переживает перезапуск.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Any
+
+
+def default_capabilities_path() -> Path:
+    """data/interval_capabilities.json рядом с базой данных проекта"""
+    return Path(__file__).parent.parent.parent / 'data' / 'interval_capabilities.json'
+
+
+class IntervalCapabilityCache:
+    """Потокобезопасный кэш неподдерживаемых интервалов с сохранением на диск"""
+
+    def __init__(self, path: Optional[Path] = None, bad_ttl: float = 7 * 86400):
+        """
+        Args:
+            path: JSON файл состояния (None - только в памяти)
+            bad_ttl: Через сколько секунд неподдерживаемый интервал проверяется заново
+        """
+        self.path = Path(path) if path is not None else None
+        self.bad_ttl = bad_ttl
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # "category:symbol" -> {'bad': {interval: marked_at}, 'resolved': {requested: interval}}
+        self._entries: Dict[str, Dict[str, Dict]] = {}
+        self.avoided_requests = 0
+        self.load()
+
+    @staticmethod
+    def _key(category: str, symbol: str) -> str:
+        return f"{category}:{symbol}"
+
+    def load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            with self._lock:
+                self._entries = {
+                    key: {'bad': dict(entry.get('bad', {})), 'resolved': dict(entry.get('resolved', {}))}
+                    for key, entry in data.items()
+                }
+        except Exception as e:
+            self.logger.warning(f"Не удалось загрузить кэш интервалов {self.path}: {e}")
+
+    def _save_locked(self):
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.logger.warning(f"Не удалось сохранить кэш интервалов {self.path}: {e}")
+
+    def is_bad(self, category: str, symbol: str, interval: str) -> bool:
+        """Известно ли, что интервал не поддерживается (с учётом bad_ttl)"""
+        with self._lock:
+            entry = self._entries.get(self._key(category, symbol))
+            if not entry:
+                return False
+            marked_at = entry['bad'].get(interval)
+            if marked_at is None:
+                return False
+            if time.time() - marked_at > self.bad_ttl:
+                entry['bad'].pop(interval, None)
+                return False
+            return True
+
+    def resolved(self, category: str, symbol: str, interval: str) -> Optional[str]:
+        """Интервал, которым ранее успешно заменили запрошенный"""
+        with self._lock:
+            entry = self._entries.get(self._key(category, symbol))
+            return entry['resolved'].get(interval) if entry else None
+
+    def mark_bad(self, category: str, symbol: str, interval: str):
+        with self._lock:
+            entry = self._entries.setdefault(self._key(category, symbol), {'bad': {}, 'resolved': {}})
+            entry['bad'][interval] = time.time()
+            # Замена, которая сама перестала работать, больше не используется
+            for requested, resolved in list(entry['resolved'].items()):
+                if resolved == interval:
+                    entry['resolved'].pop(requested)
+            self._save_locked()
+
+    def mark_good(self, category: str, symbol: str, requested: str, interval: str):
+        """Успешный запрос: запоминаем замену requested -> interval"""
+        with self._lock:
+            key = self._key(category, symbol)
+            entry = self._entries.get(key)
+            changed = False
+            if entry is not None and interval in entry['bad']:
+                entry['bad'].pop(interval)
+                changed = True
+            if requested != interval:
+                entry = entry or self._entries.setdefault(key, {'bad': {}, 'resolved': {}})
+                if entry['resolved'].get(requested) != interval:
+                    entry['resolved'][requested] = interval
+                    changed = True
+            if changed:
+                self._save_locked()
+
+    def record_avoided(self, count: int = 1):
+        with self._lock:
+            self.avoided_requests += count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'symbols': len(self._entries),
+                'bad_intervals': sum(len(e['bad']) for e in self._entries.values()),
+                'resolved_intervals': sum(len(e['resolved']) for e in self._entries.values()),
+                'avoided_requests': self.avoided_requests
+            }
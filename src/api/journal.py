@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Журнал запросов и ответов Bybit API для записи и воспроизведения
+Одна компактная JSON строка на событие (JSONL, опционально .gz):
+    {"k":"http","t":...,"m":"GET","e":"/v5/market/tickers","q":"category=spot","st":200,"ms":41.7,"b":{...}}
+    {"k":"ws","t":...,"u":"/v5/public/spot","b":{...}}
+Ключи и подписи не записываются: только путь, параметры и тело ответа.
+"""
+
+import gzip
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+from urllib.parse import urlparse
+
+from . import json_codec
+
+
+def _open(path: Path, mode: str):
+    if path.suffix == '.gz':
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+class ApiJournal:
+    """Потокобезопасная запись событий HTTP и WebSocket в журнал
+
+    Пример:
+        client.start_recording('data/journals/session.jsonl.gz')
+        ...
+        client.stop_recording()
+    """
+
+    def __init__(self, path: Union[str, Path], append: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = _open(self.path, 'ab' if append else 'wb')
+        self.events = 0
+
+    def _write(self, event: Dict):
+        line = json_codec.dumps(event) + b'\n'
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self.events += 1
+
+    def record_http(self, method: str, endpoint: str, payload: str, status: Optional[int],
+                    body: Any, latency_ms: float):
+        """Ответ REST запроса (payload - query string для GET или тело POST)"""
+        self._write({
+            'k': 'http', 't': time.time(), 'm': method.upper(), 'e': endpoint,
+            'q': payload, 'st': status, 'ms': round(latency_ms, 2), 'b': body
+        })
+
+    def record_ws(self, url: str, message: Any):
+        """Входящее сообщение WebSocket (хранится путь адреса, например /v5/public/spot)"""
+        self._write({'k': 'ws', 't': time.time(), 'u': urlparse(url).path or url, 'b': message})
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_journal(path: Union[str, Path]) -> Iterator[Dict]:
+    """События журнала в порядке записи (повреждённые строки пропускаются)"""
+    with _open(Path(path), 'rb') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json_codec.loads(line)
+            except ValueError:
+                continue
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Быстрый JSON кодек для ответов API и файлов состояния
+Использует orjson или msgspec, если они установлены, иначе стандартный json.
+Вывод всегда компактный (без отступов и пробелов) в UTF-8, ошибки разбора
+любого кодека - ValueError (как json.JSONDecodeError).
+
+Пример:
+    from src.api import json_codec
+    data = json_codec.load_file(path)
+    json_codec.dump_file(path, data)
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class JsonCodec:
+    """Стандартный json: компактные разделители, без экранирования кириллицы"""
+
+    name = 'json'
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any, default: Optional[Callable] = None) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default).encode('utf-8')
+
+
+class OrjsonCodec(JsonCodec):
+    """orjson: разбор и сериализация на Rust, numpy массивы и нестроковые ключи"""
+
+    name = 'orjson'
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+    def dumps(self, obj: Any, default: Optional[Callable] = None) -> bytes:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if default is not None:
+            # Даты отдаются в default, как в стандартном json (например, default=str)
+            options |= orjson.OPT_PASSTHROUGH_DATETIME
+        return orjson.dumps(obj, default=default, option=options)
+
+
+class MsgspecCodec(JsonCodec):
+    """msgspec.json: быстрый разбор без промежуточных объектов"""
+
+    name = 'msgspec'
+
+    def __init__(self):
+        self._decoder = msgspec.json.Decoder()
+        self._encoder = msgspec.json.Encoder()
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        try:
+            return self._decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+
+    def dumps(self, obj: Any, default: Optional[Callable] = None) -> bytes:
+        if default is not None:
+            return msgspec.json.encode(obj, enc_hook=default)
+        return self._encoder.encode(obj)
+
+
+def available_backends() -> list:
+    """Имена кодеков, доступных в текущем окружении (по убыванию скорости)"""
+    names = []
+    if orjson is not None:
+        names.append('orjson')
+    if msgspec is not None:
+        names.append('msgspec')
+    names.append('json')
+    return names
+
+
+def make_codec(name: str) -> JsonCodec:
+    if name == 'orjson' and orjson is not None:
+        return OrjsonCodec()
+    if name == 'msgspec' and msgspec is not None:
+        return MsgspecCodec()
+    if name == 'json':
+        return JsonCodec()
+    raise ValueError(f"JSON кодек недоступен: {name}")
+
+
+def set_backend(name: str) -> JsonCodec:
+    """Переключение кодека для всего процесса (например, для бенчмарка)"""
+    global codec
+    codec = make_codec(name)
+    return codec
+
+
+def get_backend() -> str:
+    return codec.name
+
+
+# Кодек процесса: BYBIT_JSON_BACKEND=json|orjson|msgspec или самый быстрый доступный
+codec: JsonCodec = make_codec(os.environ.get('BYBIT_JSON_BACKEND') or available_backends()[0])
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Разбор JSON из bytes или str"""
+    return codec.loads(data)
+
+
+def dumps(obj: Any, default: Optional[Callable] = None) -> bytes:
+    """Компактная сериализация в UTF-8 bytes"""
+    return codec.dumps(obj, default)
+
+
+def dumps_str(obj: Any, default: Optional[Callable] = None) -> str:
+    """Компактная сериализация в str (тело запроса, строка для подписи)"""
+    return codec.dumps(obj, default).decode('utf-8')
+
+
+def load_file(path: Union[str, Path]) -> Any:
+    """Чтение и разбор JSON файла целиком"""
+    with open(path, 'rb') as f:
+        return codec.loads(f.read())
+
+
+def dump_file(path: Union[str, Path], obj: Any, default: Optional[Callable] = None):
+    """Атомарная запись компактного JSON: временный файл и os.replace
+
+    Читатели никогда не видят наполовину записанный файл.
+    """
+    path = Path(path)
+    data = codec.dumps(obj, default)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Колоночное представление свечей на NumPy
+Строки ответа /v5/market/kline декодируются одним вызовом в структурированный
+массив (timestamp/open/high/low/close/volume) без промежуточных словарей.
+"""
+
+import calendar
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Sequence, Union
+
+import numpy as np
+
+
+KLINE_FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+KLINE_DTYPE = np.dtype([
+    ('timestamp', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+])
+
+# Интервалы Bybit V5 и их длительность в мс (M - календарный месяц, здесь - верхняя граница)
+MINUTE_MS = 60 * 1000
+INTERVAL_MS = {
+    '1': MINUTE_MS, '3': 3 * MINUTE_MS, '5': 5 * MINUTE_MS, '15': 15 * MINUTE_MS,
+    '30': 30 * MINUTE_MS, '60': 60 * MINUTE_MS, '120': 120 * MINUTE_MS, '240': 240 * MINUTE_MS,
+    '360': 360 * MINUTE_MS, '720': 720 * MINUTE_MS,
+    'D': 1440 * MINUTE_MS, 'W': 7 * 1440 * MINUTE_MS, 'M': 31 * 1440 * MINUTE_MS,
+}
+
+# Альтернативные записи интервалов, встречающиеся в проекте
+INTERVAL_ALIASES = {
+    '1m': '1', '1min': '1', '3m': '3', '3min': '3', '5m': '5', '5min': '5',
+    '15m': '15', '15min': '15', '30m': '30', '30min': '30',
+    '1h': '60', '1hour': '60', '2h': '120', '2hour': '120', '4h': '240', '4hour': '240',
+    '6h': '360', '6hour': '360', '12h': '720', '12hour': '720',
+    '1d': 'D', '1day': 'D', 'daily': 'D', '1w': 'W', '1week': 'W', 'weekly': 'W',
+    '1M': 'M', '1month': 'M', 'monthly': 'M',
+}
+
+# Недельные свечи Bybit открываются в понедельник 00:00 UTC (5 января 1970 - понедельник)
+_WEEK_OFFSET_MS = 4 * 1440 * MINUTE_MS
+
+
+def normalize_interval(interval: str) -> str:
+    """Интервал в формате Bybit API ('4h' -> '240'); неизвестный - ValueError"""
+    interval = str(interval)
+    interval = INTERVAL_ALIASES.get(interval, interval)
+    if interval not in INTERVAL_MS:
+        raise ValueError(f"Неподдерживаемый интервал свечей: {interval}")
+    return interval
+
+
+def interval_ms(interval: str) -> int:
+    """Длительность свечи в мс"""
+    return INTERVAL_MS[normalize_interval(interval)]
+
+
+def bar_open_time(timestamp_ms: int, interval: str) -> int:
+    """Время открытия свечи, содержащей timestamp_ms (UTC)"""
+    interval = normalize_interval(interval)
+    if interval == 'M':
+        moment = datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+        return calendar.timegm((moment.year, moment.month, 1, 0, 0, 0)) * 1000
+    step = INTERVAL_MS[interval]
+    if interval == 'W':
+        return (timestamp_ms - _WEEK_OFFSET_MS) // step * step + _WEEK_OFFSET_MS
+    return timestamp_ms // step * step
+
+
+class KlineArray:
+    """Блок свечей с колонками NumPy и совместимым с list[dict] интерфейсом
+
+    Порядок строк сохраняется таким, каким его вернул источник (REST отдаёт
+    новые свечи первыми). Доступ:
+        klines.close / klines['close']  - колонка np.ndarray (без копирования)
+        klines[i]                       - словарь одной свечи (как format_klines)
+        klines[a:b]                     - KlineArray-представление без копирования
+        klines.to_dicts()               - список словарей для JSON и старого кода
+    """
+
+    __slots__ = ('_data',)
+
+    def __init__(self, data: np.ndarray = None):
+        if data is None:
+            data = np.empty(0, dtype=KLINE_DTYPE)
+        elif data.dtype != KLINE_DTYPE:
+            data = data.astype(KLINE_DTYPE)
+        self._data = data
+
+    # ---- Конструкторы ----
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence]) -> 'KlineArray':
+        """Декодирование строк API ([start, open, high, low, close, volume, turnover])"""
+        if not rows:
+            return cls()
+        # Транспонирование строк в колонки и разбор каждой колонки одним вызовом
+        columns = list(zip(*rows))
+        data = np.empty(len(rows), dtype=KLINE_DTYPE)
+        for name, column in zip(KLINE_FIELDS, columns):
+            data[name] = np.array(column, dtype=data.dtype[name])
+        return cls(data)
+
+    @classmethod
+    def from_dicts(cls, klines: Iterable[Dict]) -> 'KlineArray':
+        """Сборка из списка словарей формата format_klines"""
+        klines = list(klines)
+        data = np.empty(len(klines), dtype=KLINE_DTYPE)
+        for name in KLINE_FIELDS:
+            data[name] = [k.get(name, 0) for k in klines]
+        return cls(data)
+
+    @classmethod
+    def concat(cls, blocks: Iterable['KlineArray']) -> 'KlineArray':
+        arrays = [as_klines(block)._data for block in blocks]
+        arrays = [a for a in arrays if len(a)]
+        if not arrays:
+            return cls()
+        return cls(np.concatenate(arrays))
+
+    # ---- Колонки ----
+
+    @property
+    def data(self) -> np.ndarray:
+        """Структурированный массив KLINE_DTYPE"""
+        return self._data
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        return self._data['timestamp']
+
+    @property
+    def open(self) -> np.ndarray:
+        return self._data['open']
+
+    @property
+    def high(self) -> np.ndarray:
+        return self._data['high']
+
+    @property
+    def low(self) -> np.ndarray:
+        return self._data['low']
+
+    @property
+    def close(self) -> np.ndarray:
+        return self._data['close']
+
+    @property
+    def volume(self) -> np.ndarray:
+        return self._data['volume']
+
+    # ---- Операции ----
+
+    def sorted(self) -> 'KlineArray':
+        """Копия, упорядоченная по времени (старые первыми)"""
+        return KlineArray(np.sort(self._data, order='timestamp', kind='stable'))
+
+    def deduplicated(self) -> 'KlineArray':
+        """Уникальные по timestamp свечи по возрастанию времени (побеждает последняя)"""
+        if not len(self._data):
+            return KlineArray()
+        reversed_ts = self._data['timestamp'][::-1]
+        _, first_in_reversed = np.unique(reversed_ts, return_index=True)
+        return KlineArray(self._data[::-1][first_in_reversed])
+
+    def to_dicts(self) -> List[Dict]:
+        """Совместимое представление: список словарей как у format_klines"""
+        return [dict(zip(KLINE_FIELDS, row)) for row in self._data.tolist()]
+
+    # ---- Интерфейс последовательности ----
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __bool__(self) -> bool:
+        return len(self._data) > 0
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._data[key]
+        if isinstance(key, slice):
+            return KlineArray(self._data[key])
+        return dict(zip(KLINE_FIELDS, self._data[key].tolist()))
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.to_dicts())
+
+    def __repr__(self) -> str:
+        return f"KlineArray(len={len(self._data)})"
+
+
+def as_klines(klines: Union[KlineArray, Sequence]) -> KlineArray:
+    """Приведение свечей любого поддерживаемого вида к KlineArray
+
+    Принимает KlineArray, список словарей (format_klines / JSON кэш) или
+    список строк API. Уже готовый блок возвращается без копирования.
+    """
+    if isinstance(klines, KlineArray):
+        return klines
+    # Тот же класс, импортированный под другим именем модуля (api.* и src.api.*)
+    data = getattr(klines, 'data', None)
+    if isinstance(data, np.ndarray) and data.dtype == KLINE_DTYPE:
+        return KlineArray(data)
+    if klines is None or len(klines) == 0:
+        return KlineArray()
+    if isinstance(klines[0], dict):
+        return KlineArray.from_dicts(klines)
+    return KlineArray.from_rows(klines)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Метрики запросов к Bybit API по endpoint
+Гистограммы задержек (p50/p95/p99), размеры запросов и ответов, ожидание
+лимитов частоты, повторы и коды ошибок. Доступны через snapshot() и
+периодическую сводную строку в логе.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+
+# Границы корзин гистограммы задержек в мс (геометрический ряд 0.5 мс .. ~65 с)
+LATENCY_BUCKETS_MS = tuple(0.5 * (1.25 ** i) for i in range(54))
+
+
+class LatencyHistogram:
+    """Гистограмма с фиксированными логарифмическими корзинами
+
+    Запись O(log n) без хранения отдельных измерений; перцентили
+    оцениваются по верхней границе корзины (погрешность до 25%).
+    """
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value_ms: float):
+        self.counts[bisect.bisect_left(self.bounds, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class EndpointMetrics:
+    """Счётчики одного endpoint (изменяются под замком ApiMetrics)"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.requests = 0
+        self.errors = 0
+        self.error_codes: Counter = Counter()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.rate_limit_waits = 0
+        self.rate_limit_wait_seconds = 0.0
+        self.retries = 0
+        self.circuit_rejections = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'error_codes': dict(self.error_codes),
+            'p50_ms': round(self.latency.percentile(50), 2),
+            'p95_ms': round(self.latency.percentile(95), 2),
+            'p99_ms': round(self.latency.percentile(99), 2),
+            'mean_ms': round(self.latency.mean, 2),
+            'max_ms': round(self.latency.max, 2),
+            'total_ms': round(self.latency.total, 2),
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'avg_response_bytes': self.bytes_received // self.requests if self.requests else 0,
+            'rate_limit_waits': self.rate_limit_waits,
+            'rate_limit_wait_s': round(self.rate_limit_wait_seconds, 3),
+            'retries': self.retries,
+            'circuit_rejections': self.circuit_rejections
+        }
+
+
+class ApiMetrics:
+    """Потокобезопасный сборщик метрик по endpoint
+
+    Пример:
+        client.metrics.snapshot()['/v5/market/kline']['p95_ms']
+        client.metrics.start_periodic_log(60)
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, EndpointMetrics] = {}
+        self.started_at = time.time()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _get(self, endpoint: str) -> EndpointMetrics:
+        metrics = self._endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self._endpoints[endpoint] = EndpointMetrics()
+        return metrics
+
+    # ---- Запись ----
+
+    def record_request(self, endpoint: str, latency_ms: float, bytes_sent: int = 0,
+                       bytes_received: int = 0, error_code: Optional[Any] = None):
+        """Завершённый сетевой запрос; error_code - retCode, HTTP статус или тип исключения"""
+        with self._lock:
+            metrics = self._get(endpoint)
+            metrics.requests += 1
+            metrics.latency.record(latency_ms)
+            metrics.bytes_sent += bytes_sent
+            metrics.bytes_received += bytes_received
+            if error_code is not None:
+                metrics.errors += 1
+                metrics.error_codes[str(error_code)] += 1
+
+    def record_rate_limit_wait(self, endpoint: str, seconds: float):
+        if seconds <= 0:
+            return
+        with self._lock:
+            metrics = self._get(endpoint)
+            metrics.rate_limit_waits += 1
+            metrics.rate_limit_wait_seconds += seconds
+
+    def record_retry(self, endpoint: str):
+        with self._lock:
+            self._get(endpoint).retries += 1
+
+    def record_circuit_rejection(self, endpoint: str):
+        with self._lock:
+            self._get(endpoint).circuit_rejections += 1
+
+    # ---- Чтение ----
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Метрики всех endpoint, начиная с самых затратных по суммарному времени"""
+        with self._lock:
+            items = [(endpoint, metrics.snapshot()) for endpoint, metrics in self._endpoints.items()]
+        items.sort(key=lambda item: item[1]['total_ms'], reverse=True)
+        return dict(items)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.started_at = time.time()
+
+    def summary_line(self, top: int = 5) -> str:
+        """Одна строка: самые затратные endpoint с перцентилями, ошибками и ожиданием лимитов"""
+        snapshot = self.snapshot()
+        if not snapshot:
+            return "API метрики: запросов не было"
+        total_requests = sum(m['requests'] for m in snapshot.values())
+        total_errors = sum(m['errors'] for m in snapshot.values())
+        parts: List[str] = []
+        for endpoint, m in list(snapshot.items())[:top]:
+            part = (f"{endpoint} n={m['requests']} p50={m['p50_ms']:.0f} p95={m['p95_ms']:.0f} "
+                    f"p99={m['p99_ms']:.0f}мс")
+            if m['errors']:
+                part += f" err={m['errors']}"
+            if m['retries']:
+                part += f" retry={m['retries']}"
+            if m['rate_limit_wait_s']:
+                part += f" wait={m['rate_limit_wait_s']:.2f}с"
+            parts.append(part)
+        elapsed = time.time() - self.started_at
+        return (f"API метрики за {elapsed:.0f} с: {total_requests} запросов, {total_errors} ошибок | "
+                + " | ".join(parts))
+
+    # ---- Периодический лог ----
+
+    def start_periodic_log(self, interval: float = 60.0, top: int = 5):
+        """Сводная строка в лог каждые interval секунд (фоновый поток)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.logger.info(self.summary_line(top))
+
+        self._thread = threading.Thread(target=loop, name="ApiMetricsLog", daemon=True)
+        self._thread.start()
+
+    def stop_periodic_log(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Шлюз ордеров через WebSocket Trade API Bybit V5 (order.create / order.cancel)
+Держит открытую аутентифицированную сессию wss://.../v5/trade, сопоставляет ответы
+по reqId и автоматически переключается на REST при недоступности соединения
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional
+
+from .bybit_client import DUPLICATE_ORDER_LINK_ID, BybitAPIError, order_ref
+from .websocket_stream import BybitWebSocketBase
+
+
+class BybitTradeStream(BybitWebSocketBase):
+    """Аутентифицированная сессия Trade API с корреляцией запросов по reqId"""
+
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = True, url: Optional[str] = None,
+                 recv_window: int = 8000, clock=None, **kwargs):
+        """
+        Args:
+            api_key: API ключ
+            api_secret: API секрет
+            testnet: Использовать тестовую сеть
+            url: Переопределение адреса (например, локальный тестовый сервер)
+            recv_window: Окно X-BAPI-RECV-WINDOW в мс
+            clock: ServerClock для меток времени (по умолчанию локальное время)
+        """
+        if url is None:
+            host = "stream-testnet.bybit.com" if testnet else "stream.bybit.com"
+            url = f"wss://{host}/v5/trade"
+        super().__init__(url, **kwargs)
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.recv_window = recv_window
+        self.clock = clock
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    async def _on_open(self, ws):
+        await self._authenticate(ws, self.api_key, self.api_secret)
+        self.logger.info("WebSocket Trade API аутентифицирован")
+
+    def _on_close(self):
+        # Все ожидающие запросы завершаются ошибкой соединения, вызывающий код уйдёт в REST
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("WebSocket Trade API соединение потеряно"))
+        self._pending.clear()
+
+    def _timestamp_ms(self) -> int:
+        if self.clock is not None:
+            return self.clock.now_ms()
+        return int(time.time() * 1000)
+
+    async def request(self, op: str, args: Dict) -> Dict:
+        """Отправка операции и ожидание ответа с тем же reqId
+
+        Returns:
+            Dict: Поле data ответа
+
+        Raises:
+            ConnectionError: Соединение не установлено или потеряно
+            BybitAPIError: Сервер вернул retCode != 0
+        """
+        ws = self._ws
+        if ws is None or not self.connected.is_set():
+            raise ConnectionError("WebSocket Trade API не подключен")
+
+        req_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = future
+        try:
+            await ws.send(json.dumps({
+                'reqId': req_id,
+                'header': {
+                    'X-BAPI-TIMESTAMP': str(self._timestamp_ms()),
+                    'X-BAPI-RECV-WINDOW': str(self.recv_window),
+                },
+                'op': op,
+                'args': [args],
+            }))
+            response = await future
+        finally:
+            self._pending.pop(req_id, None)
+
+        if response.get('retCode') != 0:
+            error_msg = response.get('retMsg', 'Неизвестная ошибка API')
+            raise BybitAPIError(f"API ошибка: {error_msg}", response.get('retCode'))
+        return response.get('data') or {}
+
+    def _handle_message(self, message: Dict):
+        future = self._pending.get(message.get('reqId'))
+        if future is not None and not future.done():
+            future.set_result(message)
+
+
+class OrderGateway:
+    """Размещение и отмена ордеров через WebSocket с автоматическим переходом на REST
+
+    Методы повторяют сигнатуры и формат ответа BybitClient.place_order/cancel_order.
+    Через REST повторяется только запрос, не дошедший до биржи: если ответ
+    WebSocket не получен, ордер сначала ищется по orderLinkId (/v5/order/realtime).
+    """
+
+    # Статусы ордера, означающие, что отмена уже выполнена
+    CANCELLED_STATUSES = ('Cancelled', 'PartiallyFilledCanceled', 'Deactivated')
+
+    # Поиск ордера после таймаута: запрос может ещё обрабатываться биржей
+    LOOKUP_ATTEMPTS = 3
+    LOOKUP_DELAY = 0.3
+
+    def __init__(self, rest_client, testnet: Optional[bool] = None, url: Optional[str] = None,
+                 timeout: float = 2.0, stream: Optional[BybitTradeStream] = None):
+        """
+        Args:
+            rest_client: BybitClient для ключей, синхронизации времени и резервного REST
+            testnet: Использовать тестовую сеть (по умолчанию как у rest_client)
+            url: Переопределение адреса Trade API
+            timeout: Таймаут ответа WebSocket в секундах, после которого используется REST
+            stream: Готовая сессия Trade API (создаётся, если не передана)
+        """
+        self.rest_client = rest_client
+        self.timeout = timeout
+        self.logger = rest_client.logger
+        if testnet is None:
+            testnet = rest_client.testnet
+        self.stream = stream or BybitTradeStream(
+            rest_client.api_key, rest_client.api_secret, testnet=testnet, url=url,
+            clock=getattr(rest_client, 'clock', None)
+        )
+        self.ws_orders = 0
+        self.rest_fallbacks = 0
+
+    def start(self):
+        self.stream.start()
+
+    def stop(self):
+        self.stream.stop(timeout=1.0)
+
+    def _send_ws(self, op: str, args: Dict) -> Dict:
+        """Отправка через WebSocket
+
+        Raises:
+            ConnectionError: Соединения нет, запрос не отправлялся
+            TimeoutError: Запрос отправлен, но ответ не получен (результат неизвестен)
+        """
+        loop = self.stream._loop
+        if loop is None or not self.stream.connected.is_set():
+            raise ConnectionError("WebSocket Trade API не подключен")
+        future = asyncio.run_coroutine_threadsafe(self.stream.request(op, args), loop)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Нет ответа WebSocket Trade API на {op} за {self.timeout} с")
+        except ConnectionError as e:
+            # Соединение потеряно после отправки: биржа могла успеть принять запрос
+            raise TimeoutError(f"Ответ WebSocket Trade API на {op} не получен: {e}") from e
+
+    def _execute(self, op: str, args: Dict, rest_call: Callable[[], Dict],
+                 lookup: Callable[[], Optional[Dict]]) -> Dict:
+        """Операция через WebSocket, при недоступности - через REST
+
+        Args:
+            rest_call: Та же операция через BybitClient
+            lookup: Результат операции по состоянию ордера на бирже (None - не выполнена)
+        """
+        try:
+            result = self._send_ws(op, args)
+        except ConnectionError as e:
+            # Запрос не отправлялся - REST безопасен
+            self.rest_fallbacks += 1
+            self.logger.warning(f"{op} через WebSocket не выполнен ({e}), используем REST")
+            return rest_call()
+        except TimeoutError as e:
+            # Запрос мог быть исполнен и ещё обрабатываться: ордер ищется несколько раз
+            existing = self._lookup(op, lookup)
+            if existing is not None:
+                self.logger.warning(f"{op}: ответ WebSocket не получен ({e}), ордер найден на бирже")
+                self.rest_client.invalidate_account_cache()
+                return existing
+            self.rest_fallbacks += 1
+            self.logger.warning(f"{op}: ответ WebSocket не получен ({e}), ордер не найден, используем REST")
+            try:
+                return rest_call()
+            except BybitAPIError as rest_error:
+                if rest_error.ret_code != DUPLICATE_ORDER_LINK_ID:
+                    raise
+                # Ордер всё же размещён WebSocket запросом
+                existing = self._lookup(op, lookup)
+                if existing is None:
+                    raise
+                self.rest_client.invalidate_account_cache()
+                return existing
+        self.ws_orders += 1
+        # REST путь сбрасывает кэш балансов сам, для WebSocket делаем это явно
+        self.rest_client.invalidate_account_cache()
+        return result
+
+    def _lookup(self, op: str, lookup: Callable[[], Optional[Dict]]) -> Optional[Dict]:
+        """Результат операции на бирже с LOOKUP_ATTEMPTS попытками через LOOKUP_DELAY"""
+        for attempt in range(self.LOOKUP_ATTEMPTS):
+            if attempt:
+                time.sleep(self.LOOKUP_DELAY)
+            try:
+                existing = lookup()
+            except Exception as lookup_error:
+                self.logger.warning(f"Не удалось проверить результат {op}: {lookup_error}")
+                continue
+            if existing is not None:
+                return existing
+        return None
+
+    @staticmethod
+    def _order_ref(order: Optional[Dict]) -> Optional[Dict]:
+        """Ответ в формате order.create / order.cancel по записи ордера"""
+        return order_ref(order) if order is not None else None
+
+    def place_order(self, category: str, symbol: str, side: str, order_type: str,
+                    qty: str, price: str = None, **kwargs) -> Dict:
+        """Размещение ордера"""
+        params = {
+            'category': category,
+            'symbol': symbol,
+            'side': side,
+            'orderType': order_type,
+            'qty': qty
+        }
+        if price:
+            params['price'] = price
+        params.update(kwargs)
+        params.setdefault('orderLinkId', f"gw-{uuid.uuid4().hex[:28]}")
+        kwargs['orderLinkId'] = params['orderLinkId']
+        return self._execute(
+            'order.create', params,
+            lambda: self.rest_client.place_order(category, symbol, side, order_type, qty, price, **kwargs),
+            lambda: self._order_ref(self.rest_client.get_order(
+                category, symbol, order_link_id=params['orderLinkId']))
+        )
+
+    def cancel_order(self, category: str, symbol: str, order_id: str = None,
+                     order_link_id: str = None) -> Dict:
+        """Отмена ордера"""
+        params = {'category': category, 'symbol': symbol}
+        if order_id:
+            params['orderId'] = order_id
+        elif order_link_id:
+            params['orderLinkId'] = order_link_id
+        else:
+            raise ValueError("Необходимо указать order_id или order_link_id")
+
+        def lookup() -> Optional[Dict]:
+            order = self.rest_client.get_order(category, symbol, order_id=order_id, order_link_id=order_link_id)
+            if order is not None and order.get('orderStatus') in self.CANCELLED_STATUSES:
+                return self._order_ref(order)
+            return None
+
+        return self._execute(
+            'order.cancel', params,
+            lambda: self.rest_client.cancel_order(category, symbol, order_id=order_id, order_link_id=order_link_id),
+            lookup
+        )
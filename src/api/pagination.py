@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Постраничные итераторы истории Bybit V5 (ордера, исполнения, переводы)
+Следуют nextPageCursor, делят диапазоны длиннее 7 дней на окна (ограничение
+API на startTime/endTime) и отдают строки по одной, не накапливая историю
+в памяти. Запросы идут через _make_request клиента, поэтому ограничение
+частоты, повторы и метрики применяются к каждой странице.
+"""
+
+import time
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional, Tuple
+
+# Максимальный диапазон startTime..endTime одного запроса истории
+MAX_WINDOW_MS = 7 * 24 * 60 * 60 * 1000
+
+# endpoint -> максимальный limit страницы
+PAGE_LIMITS = {
+    '/v5/order/history': 50,
+    '/v5/execution/list': 100,
+    '/v5/asset/transfer/query-inter-transfer-list': 50,
+}
+
+
+def time_windows(start_time: Optional[int], end_time: Optional[int],
+                 window_ms: int = MAX_WINDOW_MS) -> Iterator[Tuple[Optional[int], Optional[int]]]:
+    """Окна [start, end] в мс от новых к старым, каждое не длиннее window_ms
+
+    Без start_time и end_time отдаётся одно окно (None, None): API вернёт
+    последние 7 дней.
+    """
+    if start_time is None and end_time is None:
+        yield None, None
+        return
+    if end_time is None:
+        end_time = int(time.time() * 1000)
+    if start_time is None:
+        start_time = end_time - window_ms
+    window_end = end_time
+    while window_end > start_time:
+        window_start = max(start_time, window_end - window_ms)
+        yield window_start, window_end
+        window_end = window_start - 1
+
+
+def _page_params(params: Dict, window: Tuple[Optional[int], Optional[int]], limit: int) -> Dict:
+    page_params = {k: v for k, v in params.items() if v is not None}
+    page_params['limit'] = limit
+    if window[0] is not None:
+        page_params['startTime'] = window[0]
+        page_params['endTime'] = window[1]
+    return page_params
+
+
+def iter_pages(request: Callable, endpoint: str, params: Dict, start_time: Optional[int] = None,
+               end_time: Optional[int] = None, limit: Optional[int] = None) -> Iterator[Dict]:
+    """Строки всех страниц endpoint по всем окнам времени
+
+    Args:
+        request: client._make_request
+        endpoint: Путь истории из PAGE_LIMITS
+        params: Фильтры запроса (category, symbol и т.д.; None пропускаются)
+        start_time: Начало диапазона в мс (опционально)
+        end_time: Конец диапазона в мс (опционально)
+        limit: Размер страницы (по умолчанию максимальный для endpoint)
+    """
+    limit = limit or PAGE_LIMITS.get(endpoint, 50)
+    for window in time_windows(start_time, end_time):
+        page_params = _page_params(params, window, limit)
+        seen_cursors = set()
+        while True:
+            result = request('GET', endpoint, page_params) or {}
+            rows = result.get('list') or []
+            yield from rows
+            cursor = result.get('nextPageCursor')
+            if not rows or not cursor or cursor in seen_cursors:
+                break
+            seen_cursors.add(cursor)
+            page_params = dict(page_params, cursor=cursor)
+
+
+async def aiter_pages(request: Callable, endpoint: str, params: Dict, start_time: Optional[int] = None,
+                      end_time: Optional[int] = None, limit: Optional[int] = None) -> AsyncIterator[Dict]:
+    """Асинхронный вариант iter_pages (request - корутина AsyncBybitClient._make_request)"""
+    limit = limit or PAGE_LIMITS.get(endpoint, 50)
+    for window in time_windows(start_time, end_time):
+        page_params = _page_params(params, window, limit)
+        seen_cursors = set()
+        while True:
+            result = await request('GET', endpoint, page_params) or {}
+            rows = result.get('list') or []
+            for row in rows:
+                yield row
+            cursor = result.get('nextPageCursor')
+            if not rows or not cursor or cursor in seen_cursors:
+                break
+            seen_cursors.add(cursor)
+            page_params = dict(page_params, cursor=cursor)
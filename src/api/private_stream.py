@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Приватный WebSocket поток Bybit V5 (wallet, order, execution, position)
+Поддерживает в памяти актуальный портфель и книгу открытых ордеров.
+REST используется только для начального снимка и периодической сверки.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Any
+
+from .websocket_stream import BybitWebSocketBase
+
+
+# Статусы ордеров, после которых ордер больше не считается открытым
+CLOSED_ORDER_STATUSES = ('Filled', 'Cancelled', 'Rejected', 'PartiallyFilledCanceled', 'Deactivated')
+
+
+class PortfolioCache:
+    """Потокобезопасный портфель, обновляемый приватным потоком
+
+    Хранит последний снимок UNIFIED аккаунта в формате REST wallet-balance,
+    открытые ордера, позиции и последние исполнения. Чтение не требует
+    сетевых запросов.
+    """
+
+    def __init__(self, max_executions: int = 1000):
+        self._lock = threading.Lock()
+        self._account: Optional[Dict] = None
+        self._coins: Dict[str, Dict] = {}
+        self._open_orders: Dict[str, Dict] = {}
+        self._positions: Dict[tuple, Dict] = {}
+        self.executions = deque(maxlen=max_executions)
+        self.last_update = 0.0
+        self.last_reconcile = 0.0
+
+    def is_ready(self, max_age: Optional[float] = None) -> bool:
+        """Есть ли снимок баланса (и не старше ли он max_age секунд с последней сверки/события)"""
+        with self._lock:
+            if self._account is None:
+                return False
+            if max_age is not None and time.time() - self.last_update > max_age:
+                return False
+            return True
+
+    # ---- Применение данных ----
+
+    def load_wallet_snapshot(self, wallet_result: Dict):
+        """Полная замена баланса ответом REST /v5/account/wallet-balance"""
+        accounts = (wallet_result or {}).get('list') or []
+        if not accounts:
+            return
+        account = dict(accounts[0])
+        with self._lock:
+            self._coins = {c.get('coin'): dict(c) for c in account.get('coin', []) if c.get('coin')}
+            self._account = account
+            self.last_update = time.time()
+
+    def load_open_orders_snapshot(self, orders: List[Dict]):
+        """Полная замена книги открытых ордеров (REST /v5/order/realtime)"""
+        with self._lock:
+            self._open_orders = {o['orderId']: dict(o) for o in orders if o.get('orderId')}
+            self.last_update = time.time()
+
+    def apply_wallet(self, data: List[Dict]):
+        """Событие topic wallet: обновление итогов аккаунта и изменённых монет"""
+        with self._lock:
+            for account in data:
+                if account.get('accountType', 'UNIFIED') != 'UNIFIED':
+                    continue
+                merged = dict(self._account or {})
+                merged.update({k: v for k, v in account.items() if k != 'coin'})
+                for coin in account.get('coin', []):
+                    name = coin.get('coin')
+                    if not name:
+                        continue
+                    if Decimal(str(coin.get('walletBalance') or '0')) == 0:
+                        self._coins.pop(name, None)
+                    else:
+                        self._coins[name] = dict(coin)
+                self._account = merged
+            self.last_update = time.time()
+
+    def apply_orders(self, data: List[Dict]):
+        """Событие topic order: открытые ордера добавляются, завершённые удаляются"""
+        with self._lock:
+            for order in data:
+                order_id = order.get('orderId')
+                if not order_id:
+                    continue
+                if order.get('orderStatus') in CLOSED_ORDER_STATUSES:
+                    self._open_orders.pop(order_id, None)
+                else:
+                    self._open_orders[order_id] = dict(order)
+            self.last_update = time.time()
+
+    def apply_executions(self, data: List[Dict]):
+        """Событие topic execution"""
+        with self._lock:
+            self.executions.extend(dict(e) for e in data)
+            self.last_update = time.time()
+
+    def apply_positions(self, data: List[Dict]):
+        """Событие topic position: нулевые позиции удаляются"""
+        with self._lock:
+            for position in data:
+                key = (position.get('category'), position.get('symbol'), position.get('positionIdx', 0))
+                if Decimal(str(position.get('size') or '0')) == 0:
+                    self._positions.pop(key, None)
+                else:
+                    self._positions[key] = dict(position)
+            self.last_update = time.time()
+
+    # ---- Чтение ----
+
+    def get_wallet_balance(self) -> Dict:
+        """Баланс в формате результата REST get_wallet_balance ({'list': [account]})"""
+        with self._lock:
+            if self._account is None:
+                return {}
+            account = dict(self._account)
+            account['coin'] = [dict(c) for c in self._coins.values()]
+            return {'list': [account]}
+
+    def get_flat_balance(self) -> Dict:
+        """Баланс в формате BybitClient.get_unified_balance_flat"""
+        with self._lock:
+            account = self._account or {}
+            return {
+                'total_wallet_usd': Decimal(str(account.get('totalWalletBalance') or '0')),
+                'total_available_usd': Decimal(str(account.get('totalAvailableBalance') or '0')),
+                'coins': {name: Decimal(str(c.get('walletBalance') or '0')) for name, c in self._coins.items()}
+            }
+
+    def get_open_orders(self, symbol: Optional[str] = None) -> List[Dict]:
+        """Открытые ордера (в формате списка REST get_open_orders)"""
+        with self._lock:
+            return [dict(o) for o in self._open_orders.values()
+                    if symbol is None or o.get('symbol') == symbol]
+
+    def get_positions(self, symbol: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            return [dict(p) for p in self._positions.values()
+                    if symbol is None or p.get('symbol') == symbol]
+
+
+class BybitPrivateStream(BybitWebSocketBase):
+    """Приватный поток с аутентификацией и периодической сверкой через REST
+
+    Пример:
+        stream = BybitPrivateStream(api_key, api_secret, rest_client=bybit_client)
+        stream.start()
+        balance = stream.cache.get_flat_balance()
+    """
+
+    TOPICS = ['wallet', 'order', 'execution', 'position']
+
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = True, url: Optional[str] = None,
+                 rest_client=None, reconcile_interval: float = 300.0,
+                 cache: Optional[PortfolioCache] = None, order_category: str = "spot", **kwargs):
+        """
+        Args:
+            api_key: API ключ
+            api_secret: API секрет
+            testnet: Использовать тестовую сеть
+            url: Переопределение адреса (например, локальный тестовый сервер)
+            rest_client: Синхронный BybitClient для снимка и сверки
+            reconcile_interval: Период сверки с REST в секундах
+            cache: Портфель (создаётся, если не передан)
+            order_category: Категория для снимка открытых ордеров
+        """
+        if url is None:
+            host = "stream-testnet.bybit.com" if testnet else "stream.bybit.com"
+            url = f"wss://{host}/v5/private"
+        super().__init__(url, **kwargs)
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.rest_client = rest_client
+        self.reconcile_interval = reconcile_interval
+        self.order_category = order_category
+        self.cache = cache or PortfolioCache()
+        self.topics = list(self.TOPICS)
+        self._callbacks: List[Callable[[str, Any], None]] = []
+        self._reconcile_task: Optional[asyncio.Task] = None
+
+    def add_callback(self, callback: Callable[[str, Any], None]):
+        """Регистрация обработчика (topic, data), вызываемого после обновления портфеля"""
+        self._callbacks.append(callback)
+
+    async def _on_open(self, ws):
+        await self._authenticate(ws, self.api_key, self.api_secret)
+        self.logger.info("Приватный WebSocket поток аутентифицирован")
+
+        if self.rest_client is not None:
+            self._reconcile_task = asyncio.create_task(self._reconcile_loop())
+
+    def _on_close(self):
+        if self._reconcile_task is not None:
+            self._reconcile_task.cancel()
+            self._reconcile_task = None
+
+    async def _reconcile_loop(self):
+        """Снимок после (пере)подключения и периодическая сверка с REST"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, self.reconcile)
+            await asyncio.sleep(self.reconcile_interval)
+
+    def reconcile(self) -> bool:
+        """Загрузка снимка баланса и открытых ордеров через REST"""
+        if self.rest_client is None:
+            return False
+        try:
+            wallet = self.rest_client.get_wallet_balance()
+            orders = self.rest_client.get_open_orders(category=self.order_category)
+            self.cache.load_wallet_snapshot(wallet)
+            self.cache.load_open_orders_snapshot((orders or {}).get('list', []))
+            self.cache.last_reconcile = time.time()
+            return True
+        except Exception as e:
+            self.logger.error(f"Ошибка сверки портфеля через REST: {e}")
+            return False
+
+    def _handle_message(self, message: Dict):
+        topic = message.get('topic', '')
+        data = message.get('data') or []
+        base_topic = topic.split('.', 1)[0]
+
+        if base_topic == 'wallet':
+            self.cache.apply_wallet(data)
+            # Кэшированные REST балансы устарели
+            invalidate = getattr(self.rest_client, 'invalidate_account_cache', None)
+            if invalidate is not None:
+                invalidate()
+        elif base_topic == 'order':
+            self.cache.apply_orders(data)
+        elif base_topic == 'execution':
+            self.cache.apply_executions(data)
+        elif base_topic == 'position':
+            self.cache.apply_positions(data)
+        else:
+            return
+
+        for callback in self._callbacks:
+            try:
+                callback(topic, data)
+            except Exception as e:
+                self.logger.error(f"Ошибка в обработчике приватного потока: {e}")
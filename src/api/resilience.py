@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Единый слой устойчивости запросов к Bybit API
+Классифицирует ошибки (retCode и HTTP статус) на повторяемые и фатальные,
+повторяет повторяемые с экспоненциальной задержкой со случайным разбросом
+и размыкает цепь (circuit breaker) для endpoint с высокой долей ошибок,
+чтобы вызывающий код не ждал деградировавший endpoint в каждом цикле.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+
+# retCode временных ошибок биржи: повтор через паузу обычно успешен
+RETRYABLE_RET_CODES = frozenset({
+    10000,  # Server Timeout
+    10006,  # Too many visits (лимит запросов)
+    10016,  # Server error / сервис перезапускается
+    10018,  # Превышен лимит запросов с IP
+    10429,  # Системная защита от частых запросов
+    170007,  # Spot: таймаут ответа backend
+})
+
+# retCode, при которых запрос гарантированно отклонён до исполнения
+# (повторять безопасно даже создание ордера без orderLinkId)
+REJECTED_RET_CODES = frozenset({10006, 10018, 10429})
+
+# HTTP статусы временной недоступности
+RETRYABLE_HTTP_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """Запрос не отправлен: цепь для endpoint разомкнута после серии ошибок"""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f"Endpoint {endpoint} временно недоступен, повтор через {retry_in:.0f} с")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Временная ли ошибка (повтор может быть успешным)
+
+    BybitAPIError несёт ret_code, ошибки соединения - http_status
+    (None для обрывов и таймаутов). Прочие исключения считаются фатальными.
+    """
+    ret_code = getattr(error, 'ret_code', None)
+    if ret_code is not None:
+        return ret_code in RETRYABLE_RET_CODES
+    if hasattr(error, 'http_status'):
+        status = error.http_status
+        return status is None or status in RETRYABLE_HTTP_STATUSES
+    return isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError))
+
+
+def is_rejected_before_execution(error: BaseException) -> bool:
+    """Биржа отклонила запрос, не начав его выполнять (лимиты частоты)"""
+    ret_code = getattr(error, 'ret_code', None)
+    if ret_code is not None:
+        return ret_code in REJECTED_RET_CODES
+    return getattr(error, 'http_status', None) == 429
+
+
+class RetryPolicy:
+    """Экспоненциальная задержка с полным случайным разбросом (full jitter)"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 4.0):
+        """
+        Args:
+            max_attempts: Всего попыток, включая первую
+            base_delay: Верхняя граница задержки перед первым повтором (секунды)
+            max_delay: Предельная задержка между попытками
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, retry_number: int) -> float:
+        """Пауза перед повтором retry_number (с 1): uniform(0, min(max, base * 2^(n-1)))"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (retry_number - 1))))
+
+
+class CircuitBreaker:
+    """Размыкатель цепи по доле ошибок в скользящем окне последних вызовов
+
+    closed    - запросы идут, исходы записываются в окно
+    open      - запросы отклоняются без сети в течение reset_timeout
+    half_open - пропускается один пробный запрос; успех замыкает цепь
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window: int = 20, min_calls: int = 5, failure_ratio: float = 0.5,
+                 reset_timeout: float = 30.0):
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow(self) -> float:
+        """0, если запрос можно отправить, иначе секунды до пробного запроса"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0.0
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return 0.0
+            self.rejected += 1
+            return max(remaining, 1.0)
+
+    def record_success(self):
+        with self._lock:
+            self._probe_in_flight = False
+            if self.state != self.CLOSED:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def release_probe(self):
+        """Пробный запрос прерван без результата - следующий вызов может повторить пробу"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Запись временной ошибки; True, если цепь только что разомкнулась"""
+        with self._lock:
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return True
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (self.state == self.CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.failure_ratio):
+                self._open()
+                return True
+            return False
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'recent_calls': len(self._outcomes),
+                'recent_failures': self._outcomes.count(False),
+                'times_opened': self.times_opened,
+                'rejected': self.rejected
+            }
+
+
+class ResilienceLayer:
+    """Повторы и размыкатели цепи по endpoint вокруг одной функции запроса
+
+    Пример:
+        layer = ResilienceLayer()
+        result = layer.call('/v5/market/tickers', lambda: send(...))
+
+    Неидемпотентные запросы (создание ордера без orderLinkId) повторяются
+    только если биржа заведомо их не выполнила (ошибки лимита частоты).
+    """
+
+    def __init__(self, policy: Optional[RetryPolicy] = None,
+                 breaker_factory: Callable[[], CircuitBreaker] = CircuitBreaker, metrics=None):
+        """
+        Args:
+            policy: Число попыток и задержки повторов
+            breaker_factory: Создание размыкателя для нового endpoint
+            metrics: ApiMetrics для учёта повторов и отклонённых запросов (опционально)
+        """
+        self.policy = policy or RetryPolicy()
+        self.metrics = metrics
+        self.breaker_factory = breaker_factory
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.retries = 0
+        self.fatal_errors = 0
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = self._breakers[endpoint] = self.breaker_factory()
+            return breaker
+
+    def is_open(self, endpoint: str) -> bool:
+        """Разомкнута ли цепь endpoint (без учёта пробного запроса)"""
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+        return breaker is not None and breaker.state != CircuitBreaker.CLOSED
+
+    def _check(self, endpoint: str, breaker: CircuitBreaker):
+        retry_in = breaker.allow()
+        if retry_in:
+            if self.metrics is not None:
+                self.metrics.record_circuit_rejection(endpoint)
+            raise CircuitOpenError(endpoint, retry_in)
+
+    def _on_error(self, endpoint: str, breaker: CircuitBreaker, error: Exception,
+                  attempt: int, idempotent: bool) -> Optional[float]:
+        """Учёт ошибки; пауза перед повтором или None, если ошибку нужно пробросить"""
+        if not is_retryable(error):
+            # Биржа ответила осмысленной ошибкой - endpoint исправен
+            breaker.record_success()
+            with self._lock:
+                self.fatal_errors += 1
+            return None
+        if breaker.record_failure():
+            self.logger.warning(f"Цепь {endpoint} разомкнута после серии ошибок: {error}")
+        if attempt >= self.policy.max_attempts or breaker.state != CircuitBreaker.CLOSED:
+            return None
+        if not idempotent and not is_rejected_before_execution(error):
+            return None
+        with self._lock:
+            self.retries += 1
+        if self.metrics is not None:
+            self.metrics.record_retry(endpoint)
+        delay = self.policy.delay(attempt)
+        self.logger.warning(f"Повтор {endpoint} через {delay:.2f} с "
+                            f"(попытка {attempt + 1}/{self.policy.max_attempts}): {error}")
+        return delay
+
+    def call(self, endpoint: str, fn: Callable[[], Any], idempotent: bool = True) -> Any:
+        """Синхронный вызов fn() с повторами и размыкателем цепи endpoint"""
+        breaker = self.breaker(endpoint)
+        attempt = 1
+        while True:
+            self._check(endpoint, breaker)
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._on_error(endpoint, breaker, e, attempt, idempotent)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            breaker.record_success()
+            return result
+
+    async def call_async(self, endpoint: str, coro_factory: Callable[[], Any], idempotent: bool = True) -> Any:
+        """Асинхронный вариант call() для корутин"""
+        breaker = self.breaker(endpoint)
+        attempt = 1
+        while True:
+            self._check(endpoint, breaker)
+            try:
+                result = await coro_factory()
+            except asyncio.CancelledError:
+                breaker.release_probe()
+                raise
+            except Exception as e:
+                delay = self._on_error(endpoint, breaker, e, attempt, idempotent)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            breaker.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Повторы, фатальные ошибки и состояние цепей по endpoint"""
+        with self._lock:
+            breakers = dict(self._breakers)
+            retries, fatal_errors = self.retries, self.fatal_errors
+        return {
+            'retries': retries,
+            'fatal_errors': fatal_errors,
+            'open_circuits': [e for e, b in breakers.items() if b.state != CircuitBreaker.CLOSED],
+            'endpoints': {endpoint: breaker.stats() for endpoint, breaker in breakers.items()}
+        }
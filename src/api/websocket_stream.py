@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Публичный WebSocket поток рыночных данных Bybit V5
+Подписка на topics tickers.* и kline.*.* с переподключением, повторной подпиской,
+heartbeat и хранилищем последнего состояния в памяти
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Any
+
+import websockets
+
+
+# Алиасы интервалов в формат topics Bybit (kline.{interval}.{symbol})
+KLINE_INTERVAL_ALIASES = {
+    "1m": "1", "3m": "3", "5m": "5", "15m": "15", "30m": "30",
+    "1h": "60", "2h": "120", "4h": "240", "6h": "360", "12h": "720",
+    "1d": "D", "1w": "W", "1M": "M",
+}
+
+
+def normalize_kline_interval(interval: str) -> str:
+    """Приведение интервала к формату Bybit (например, '4h' -> '240')"""
+    return KLINE_INTERVAL_ALIASES.get(interval, interval)
+
+
+class MarketDataStore:
+    """Потокобезопасное хранилище последнего состояния рынка
+
+    Тикеры хранятся как словарь symbol -> последние поля тикера (дельты сливаются
+    со снимком), свечи - как ограниченная очередь по (symbol, interval).
+    """
+
+    def __init__(self, max_klines: int = 1000):
+        self.max_klines = max_klines
+        self._lock = threading.Lock()
+        self._tickers: Dict[str, Dict] = {}
+        self._ticker_times: Dict[str, float] = {}
+        self._klines: Dict[tuple, deque] = {}
+        self._kline_times: Dict[tuple, float] = {}
+
+    def update_ticker(self, symbol: str, data: Dict, is_snapshot: bool = True):
+        """Обновление тикера снимком или дельтой"""
+        with self._lock:
+            if is_snapshot or symbol not in self._tickers:
+                self._tickers[symbol] = dict(data)
+            else:
+                self._tickers[symbol].update(data)
+            self._ticker_times[symbol] = time.time()
+
+    def get_ticker(self, symbol: str, max_age: Optional[float] = None) -> Optional[Dict]:
+        """Последний тикер символа (None, если нет данных или они старше max_age секунд)"""
+        with self._lock:
+            ticker = self._tickers.get(symbol)
+            if ticker is None:
+                return None
+            if max_age is not None and time.time() - self._ticker_times[symbol] > max_age:
+                return None
+            return dict(ticker)
+
+    def get_all_tickers(self) -> Dict[str, Dict]:
+        """Копия всех тикеров"""
+        with self._lock:
+            return {symbol: dict(ticker) for symbol, ticker in self._tickers.items()}
+
+    def set_klines(self, symbol: str, interval: str, klines: List[Dict]):
+        """Начальное заполнение свечей (например, из REST get_kline)
+
+        Args:
+            klines: Свечи в формате format_klines в любом порядке
+        """
+        key = (symbol, normalize_kline_interval(interval))
+        ordered = sorted(klines, key=lambda k: k['timestamp'])
+        with self._lock:
+            self._klines[key] = deque(ordered, maxlen=self.max_klines)
+            self._kline_times[key] = time.time()
+
+    def update_kline(self, symbol: str, interval: str, kline: Dict):
+        """Обновление последней свечи или добавление новой"""
+        key = (symbol, normalize_kline_interval(interval))
+        with self._lock:
+            candles = self._klines.setdefault(key, deque(maxlen=self.max_klines))
+            if candles and candles[-1]['timestamp'] == kline['timestamp']:
+                candles[-1] = kline
+            elif not candles or candles[-1]['timestamp'] < kline['timestamp']:
+                candles.append(kline)
+            self._kline_times[key] = time.time()
+
+    def get_klines(self, symbol: str, interval: str, limit: int = 200,
+                   max_age: Optional[float] = None) -> List[Dict]:
+        """Последние свечи в том же порядке, что и REST get_kline (новые первыми)
+
+        Пустой список, если свечей нет или они не обновлялись дольше max_age секунд.
+        """
+        key = (symbol, normalize_kline_interval(interval))
+        with self._lock:
+            candles = self._klines.get(key)
+            if not candles:
+                return []
+            if max_age is not None and time.time() - self._kline_times[key] > max_age:
+                return []
+            return list(reversed(candles))[:limit]
+
+    def has_klines(self, symbol: str, interval: str) -> bool:
+        with self._lock:
+            return bool(self._klines.get((symbol, normalize_kline_interval(interval))))
+
+
+class BybitWebSocketBase:
+    """Базовое соединение с WebSocket Bybit V5
+
+    Отвечает за подключение, heartbeat (op=ping), переподключение с экспоненциальной
+    задержкой и повторную подписку на все topics после переподключения.
+    Может работать в собственном потоке (start/stop) или в чужом event loop (run).
+    """
+
+    def __init__(self, url: str, ping_interval: float = 20.0,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 60.0,
+                 max_topics_per_request: int = 10):
+        self.url = url
+        self.ping_interval = ping_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.max_topics_per_request = max_topics_per_request
+
+        self.logger = logging.getLogger(__name__)
+
+        self.topics: List[str] = []
+        self.connected = threading.Event()
+        self.reconnect_count = 0
+        self.last_message_time = 0.0
+        # ApiJournal для записи входящих сообщений (см. BybitClient.start_recording)
+        self.journal = None
+
+        self._ws = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._req_counter = 0
+
+    # ---- Управление жизненным циклом ----
+
+    def start(self):
+        """Запуск соединения в отдельном потоке со своим event loop"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._thread_main, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def _thread_main(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self.run())
+        finally:
+            self._loop.close()
+
+    def stop(self, timeout: float = 5.0):
+        """Остановка соединения и потока"""
+        self._running = False
+        if self._loop is not None and self._ws is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._ws.close(), self._loop)
+            except RuntimeError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    async def run(self):
+        """Основной цикл: подключение, чтение сообщений, переподключение"""
+        self._running = True
+        self._loop = asyncio.get_running_loop()
+        delay = self.reconnect_delay
+        while self._running:
+            try:
+                async with websockets.connect(self.url, ping_interval=None, close_timeout=2) as ws:
+                    self._ws = ws
+                    self.last_message_time = time.time()
+                    await self._on_open(ws)
+                    await self._resubscribe(ws)
+                    self.connected.set()
+                    delay = self.reconnect_delay
+                    self.logger.info(f"WebSocket подключен: {self.url}")
+
+                    ping_task = asyncio.create_task(self._heartbeat(ws))
+                    try:
+                        async for raw in ws:
+                            self.last_message_time = time.time()
+                            self._dispatch(raw)
+                    finally:
+                        ping_task.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._running:
+                    self.logger.warning(f"WebSocket соединение потеряно ({self.url}): {e}")
+            finally:
+                self._ws = None
+                self.connected.clear()
+                self._on_close()
+
+            if not self._running:
+                break
+            self.reconnect_count += 1
+            self.logger.info(f"Переподключение к {self.url} через {delay:.1f} с")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _heartbeat(self, ws):
+        """Отправка op=ping и переподключение, если сервер перестал отвечать"""
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            if self.last_message_time and time.time() - self.last_message_time > self.ping_interval * 2:
+                self.logger.warning("Нет ответа от WebSocket сервера, переподключение")
+                await ws.close()
+                return
+            await ws.send(json.dumps({'req_id': self._next_req_id(), 'op': 'ping'}))
+
+    async def _on_open(self, ws):
+        """Хук после подключения (например, аутентификация приватного потока)"""
+
+    def _on_close(self):
+        """Хук после разрыва соединения"""
+
+    async def _authenticate(self, ws, api_key: str, api_secret: str, timeout: float = 10.0):
+        """Аутентификация приватного соединения (op=auth) с ожиданием подтверждения"""
+        expires = int((time.time() + 10) * 1000)
+        signature = hmac.new(
+            api_secret.strip().encode('utf-8'),
+            f"GET/realtime{expires}".encode('utf-8'),
+            hashlib.sha256
+        ).hexdigest()
+        await ws.send(json.dumps({
+            'req_id': self._next_req_id(),
+            'op': 'auth',
+            'args': [api_key.strip(), expires, signature]
+        }))
+        # Подтверждение должно прийти до подписок и запросов
+        while True:
+            response = json.loads(await asyncio.wait_for(ws.recv(), timeout=timeout))
+            if response.get('op') == 'auth':
+                break
+        if not response.get('success', response.get('retCode') == 0):
+            raise ConnectionError(f"Ошибка аутентификации WebSocket: {response.get('ret_msg') or response.get('retMsg')}")
+
+    def _next_req_id(self) -> str:
+        self._req_counter += 1
+        return str(self._req_counter)
+
+    # ---- Подписки ----
+
+    async def _send_op(self, ws, op: str, args: List[str]):
+        for i in range(0, len(args), self.max_topics_per_request):
+            chunk = args[i:i + self.max_topics_per_request]
+            await ws.send(json.dumps({'req_id': self._next_req_id(), 'op': op, 'args': chunk}))
+
+    async def _resubscribe(self, ws):
+        if self.topics:
+            await self._send_op(ws, 'subscribe', list(self.topics))
+
+    def subscribe(self, topics: List[str]):
+        """Подписка на topics (запоминаются для повторной подписки после переподключения)"""
+        new_topics = [t for t in topics if t not in self.topics]
+        if not new_topics:
+            return
+        self.topics.extend(new_topics)
+        self._send_threadsafe('subscribe', new_topics)
+
+    def unsubscribe(self, topics: List[str]):
+        """Отписка от topics"""
+        removed = [t for t in topics if t in self.topics]
+        if not removed:
+            return
+        self.topics = [t for t in self.topics if t not in removed]
+        self._send_threadsafe('unsubscribe', removed)
+
+    def _send_threadsafe(self, op: str, args: List[str]):
+        ws, loop = self._ws, self._loop
+        if ws is None or loop is None:
+            # Ещё не подключены - topics будут отправлены при подключении
+            return
+        coro = self._send_op(ws, op, args)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            loop.create_task(coro)
+        else:
+            asyncio.run_coroutine_threadsafe(coro, loop)
+
+    # ---- Обработка сообщений ----
+
+    def _dispatch(self, raw):
+        try:
+            message = json.loads(raw)
+        except (TypeError, ValueError):
+            self.logger.warning(f"Некорректное сообщение WebSocket: {raw!r}")
+            return
+        if self.journal is not None:
+            self.journal.record_ws(self.url, message)
+
+        op = message.get('op')
+        if op in ('pong', 'ping'):
+            return
+        if op in ('subscribe', 'unsubscribe', 'auth'):
+            if not message.get('success', True):
+                self.logger.error(f"Ошибка {op}: {message.get('ret_msg')}")
+            return
+
+        try:
+            self._handle_message(message)
+        except Exception as e:
+            self.logger.error(f"Ошибка обработки сообщения WebSocket: {e}")
+
+    def _handle_message(self, message: Dict):
+        raise NotImplementedError
+
+
+class BybitPublicStream(BybitWebSocketBase):
+    """Подписчик публичных topics tickers.* и kline.*.* с хранилищем MarketDataStore"""
+
+    def __init__(self, category: str = "spot", testnet: bool = True, url: Optional[str] = None,
+                 store: Optional[MarketDataStore] = None, **kwargs):
+        """
+        Args:
+            category: Категория (spot, linear, inverse, option)
+            testnet: Использовать тестовую сеть
+            url: Переопределение адреса (например, локальный тестовый сервер)
+            store: Хранилище состояния (создаётся, если не передано)
+        """
+        if url is None:
+            host = "stream-testnet.bybit.com" if testnet else "stream.bybit.com"
+            url = f"wss://{host}/v5/public/{category}"
+        super().__init__(url, **kwargs)
+        self.category = category
+        self.store = store or MarketDataStore()
+        self._callbacks: List[Callable[[str, Any], None]] = []
+
+    def add_callback(self, callback: Callable[[str, Any], None]):
+        """Регистрация обработчика (topic, data), вызываемого после обновления хранилища"""
+        self._callbacks.append(callback)
+
+    def subscribe_tickers(self, symbols: List[str]):
+        self.subscribe([f"tickers.{symbol}" for symbol in symbols])
+
+    def subscribe_klines(self, symbols: List[str], interval: str):
+        interval = normalize_kline_interval(interval)
+        self.subscribe([f"kline.{interval}.{symbol}" for symbol in symbols])
+
+    def _handle_message(self, message: Dict):
+        topic = message.get('topic')
+        data = message.get('data')
+        if not topic or data is None:
+            return
+
+        if topic.startswith('tickers.'):
+            symbol = topic.split('.', 1)[1]
+            self.store.update_ticker(symbol, data, message.get('type', 'snapshot') == 'snapshot')
+        elif topic.startswith('kline.'):
+            _, interval, symbol = topic.split('.', 2)
+            for candle in data:
+                self.store.update_kline(symbol, interval, {
+                    'timestamp': int(candle['start']),
+                    'open': float(candle['open']),
+                    'high': float(candle['high']),
+                    'low': float(candle['low']),
+                    'close': float(candle['close']),
+                    'volume': float(candle['volume'])
+                })
+        else:
+            return
+
+        for callback in self._callbacks:
+            try:
+                callback(topic, data)
+            except Exception as e:
+                self.logger.error(f"Ошибка в обработчике WebSocket: {e}")
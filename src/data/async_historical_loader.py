@@ -3,252 +3,292 @@
 """
 
 import asyncio
-import aiohttp
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
-import json
 import time
 from pathlib import Path
 
+from src.api.async_bybit_client import AsyncBybitClient
+from src.api.bybit_client import RateLimiter
+from src.api.klines import KlineArray, as_klines, bar_open_time, interval_ms, normalize_interval
+from src.data.candle_cache import INDEX_FILE, CandleCache
+
 
 class AsyncHistoricalDataLoader:
-    """Асинхронный загрузчик исторических данных с поддержкой больших объемов"""
+    """Асинхронный загрузчик исторических данных с поддержкой больших объемов
+    
+    Запросы идут через AsyncBybitClient.get_kline: пул соединений, ограничение
+    частоты, повторы и размыкатели цепи - общие с остальным кодом клиента.
+    """
     
     def __init__(self, api_base_url: str = "https://api-testnet.bybit.com", 
-                 data_cache_path: str = "data/historical_cache"):
+                 data_cache_path: str = "data/historical_cache",
+                 client: Optional[AsyncBybitClient] = None):
+        """
+        Args:
+            api_base_url: Адрес API для собственного клиента (если client не передан)
+            data_cache_path: Каталог кэша свечей
+            client: Общий AsyncBybitClient; без него создается клиент без ключей
+                (свечи - публичные данные), закрываемый после каждой загрузки
+        """
         self.api_base_url = api_base_url
         self.cache_path = Path(data_cache_path)
         self.cache_path.mkdir(parents=True, exist_ok=True)
+        # Свечи в memmap файлах .npy с индексом заголовков index.json
+        self.candle_cache = CandleCache(data_cache_path)
         self.logger = logging.getLogger(__name__)
         
+        # Отчет последней загрузки load_multiple_symbols: symbol -> status, candles, chunks, failed_chunks
+        self.last_load_report: Dict[str, Dict[str, Any]] = {}
+        
         # Настройки для пакетной загрузки
         self.max_concurrent_requests = 5
-        self.request_delay = 0.2  # Задержка между запросами
+        self.requests_per_second = 10.0  # Бюджет частоты собственного клиента для всех символов
         self.max_klines_per_request = 1000  # Максимум свечей за один запрос
         
+        self.client = client
+        self._owns_client = client is None
+    
+    def _get_client(self) -> AsyncBybitClient:
+        if self.client is None:
+            self.client = AsyncBybitClient(
+                '', '', base_url=self.api_base_url, max_connections=self.max_concurrent_requests,
+                rate_limiter=RateLimiter({'market': (self.requests_per_second, self.max_concurrent_requests)})
+            )
+        return self.client
+    
+    async def _release_client(self):
+        """Закрытие собственного клиента: его сессия привязана к текущему event loop"""
+        if self._owns_client and self.client is not None:
+            await self.client.close()
+            self.client = None
+        
     async def load_historical_data_bulk(self, symbol: str, interval: str, 
-                                      start_time: datetime, end_time: datetime) -> List[Dict]:
+                                      start_time: datetime, end_time: datetime) -> KlineArray:
         """
         Загрузка большого объема исторических данных с разбивкой на пакеты
         
         Args:
             symbol: Торговый символ (например, BTCUSDT)
-            interval: Интервал свечей (1, 5, 15, 60, 240, D)
+            interval: Интервал свечей Bybit (1 ... 720, D, W, M) или псевдоним (1h, 4h)
             start_time: Начальная дата
             end_time: Конечная дата
             
         Returns:
-            List[Dict]: Список исторических свечей
+            KlineArray: Исторические свечи по возрастанию времени
         """
         try:
-            # Проверяем кэш
-            cache_key = f"{symbol}_{interval}_{start_time.strftime('%Y%m%d')}_{end_time.strftime('%Y%m%d')}"
-            cached_data = self._load_from_cache(cache_key)
-            if cached_data:
-                self.logger.info(f"Загружены данные из кэша для {symbol} {interval}")
-                return cached_data
-            
-            # Разбиваем период на части для пакетной загрузки
-            time_chunks = self._split_time_range(start_time, end_time, interval)
-            
-            # Создаем семафор для ограничения количества одновременных запросов
             semaphore = asyncio.Semaphore(self.max_concurrent_requests)
-            
-            # Создаем задачи для асинхронной загрузки
-            tasks = []
-            async with aiohttp.ClientSession() as session:
-                for chunk_start, chunk_end in time_chunks:
-                    task = self._fetch_chunk_data(session, semaphore, symbol, interval, 
-                                                chunk_start, chunk_end)
-                    tasks.append(task)
-                
-                # Выполняем все задачи параллельно
-                chunk_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Объединяем результаты
-            all_klines = []
-            for result in chunk_results:
-                if isinstance(result, Exception):
-                    self.logger.error(f"Ошибка загрузки чанка: {result}")
-                    continue
-                if result:
-                    all_klines.extend(result)
-            
-            # Сортируем по времени и удаляем дубликаты
-            all_klines = self._deduplicate_klines(all_klines)
-            
-            # Сохраняем в кэш
-            self._save_to_cache(cache_key, all_klines)
-            
-            self.logger.info(f"Загружено {len(all_klines)} свечей для {symbol} {interval}")
-            return all_klines
+            klines, _ = await self._load_symbol(semaphore, symbol, interval, start_time, end_time)
+            return klines
             
         except Exception as e:
             self.logger.error(f"Ошибка загрузки исторических данных: {e}")
-            return []
+            return KlineArray()
+        finally:
+            await self._release_client()
+    
+    async def _load_symbol(self, semaphore: asyncio.Semaphore, symbol: str, interval: str,
+                           start_time: datetime, end_time: datetime) -> Tuple[KlineArray, Dict[str, int]]:
+        """Догрузка недостающих чанков символа под общим семафором
+        
+        Returns:
+            Tuple[KlineArray, Dict[str, int]]: Свечи окна и счетчики chunks/failed_chunks
+        """
+        bybit_interval = self._convert_interval_to_bybit(interval)
+        start_ms = int(start_time.timestamp() * 1000)
+        end_ms = int(end_time.timestamp() * 1000)
+        
+        # Из API запрашиваются только отрезки, которых нет в кэше
+        missing = self.candle_cache.missing_ranges(symbol, bybit_interval, start_ms, end_ms)
+        if not missing:
+            self.logger.info(f"Загружены данные из кэша для {symbol} {interval}")
+            return self.candle_cache.window(symbol, bybit_interval, start_ms, end_ms), {'chunks': 0, 'failed_chunks': 0}
+        
+        # Разбиваем недостающие отрезки на чанки ровно по max_klines_per_request свечей
+        time_chunks = []
+        for gap_start, gap_end in missing:
+            time_chunks.extend(self._split_time_range(gap_start, gap_end, bybit_interval))
+        
+        # Все чанки ставятся в очередь сразу; одновременность ограничивает семафор
+        tasks = [self._fetch_chunk_data(semaphore, symbol, bybit_interval, chunk_start, chunk_end)
+                 for chunk_start, chunk_end in time_chunks]
+        chunk_results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        # Объединяем результаты
+        chunks = []
+        failed = 0
+        for result in chunk_results:
+            if isinstance(result, Exception) or result is None:
+                if isinstance(result, Exception):
+                    self.logger.error(f"Ошибка загрузки чанка: {result}")
+                failed += 1
+                continue
+            if result:
+                chunks.append(result)
+        
+        # Отрезки отмечаются загруженными, только если все чанки получены;
+        # незакрытая последняя свеча в покрытие не входит
+        covered = []
+        if not failed:
+            closed_end = bar_open_time(int(time.time() * 1000), bybit_interval)
+            covered = [(gap_start, min(gap_end, closed_end)) for gap_start, gap_end in missing]
+        
+        # Сохраняем в кэш (слияние с уже загруженными свечами); запись файлов и
+        # индекса выполняется в пуле потоков, не блокируя загрузку других символов
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._save_to_cache, symbol, bybit_interval, KlineArray.concat(chunks), covered)
+        all_klines = self._load_from_cache(symbol, bybit_interval, start_ms, end_ms)
+        if all_klines is None:
+            all_klines = self._deduplicate_klines(KlineArray.concat(chunks))
+        
+        self.logger.info(f"Загружено {len(all_klines)} свечей для {symbol} {interval}")
+        return all_klines, {'chunks': len(time_chunks), 'failed_chunks': failed}
+    
+    async def _fetch_chunk_data(self, semaphore: asyncio.Semaphore, symbol: str, interval: str,
+                              start_ms: int, end_ms: int) -> Optional[KlineArray]:
+        """Загрузка чанка [start_ms, end_ms) (None - чанк не получен)
+        
+        API отдает не больше limit самых новых свечей диапазона: если страница
+        заполнена, а начало чанка не достигнуто, остаток дозапрашивается.
+        """
+        pages = []
+        page_end = end_ms
+        while page_end > start_ms:
+            page = await self._fetch_page(semaphore, symbol, interval, start_ms, page_end - 1)
+            if page is None:
+                return None
+            pages.append(page)
+            if len(page) < self.max_klines_per_request:
+                break
+            oldest = int(page.timestamp.min())
+            if oldest <= start_ms:
+                break
+            self.logger.debug(f"Дозапрос чанка {symbol} {interval}: {start_ms}-{oldest}")
+            page_end = oldest
+        return KlineArray.concat(pages)
     
-    async def _fetch_chunk_data(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
-                              symbol: str, interval: str, start_time: datetime, end_time: datetime) -> List[Dict]:
-        """Загрузка одного чанка данных"""
+    async def _fetch_page(self, semaphore: asyncio.Semaphore, symbol: str, interval: str,
+                          start_ms: int, end_ms: int) -> Optional[KlineArray]:
+        """Один запрос /v5/market/kline (end_ms включительно)"""
         async with semaphore:
             try:
-                # Задержка между запросами
-                await asyncio.sleep(self.request_delay)
-                
-                # Конвертируем интервал в формат Bybit
-                bybit_interval = self._convert_interval_to_bybit(interval)
-                
-                # Параметры запроса
-                params = {
-                    'category': 'spot',
-                    'symbol': symbol,
-                    'interval': bybit_interval,
-                    'start': int(start_time.timestamp() * 1000),
-                    'end': int(end_time.timestamp() * 1000),
-                    'limit': self.max_klines_per_request
-                }
-                
-                url = f"{self.api_base_url}/v5/market/kline"
-                
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get('retCode') == 0 and 'result' in data:
-                            klines_data = data['result'].get('list', [])
-                            
-                            # Форматируем данные
-                            formatted_klines = []
-                            for kline in klines_data:
-                                formatted_klines.append({
-                                    'timestamp': int(kline[0]),
-                                    'open': float(kline[1]),
-                                    'high': float(kline[2]),
-                                    'low': float(kline[3]),
-                                    'close': float(kline[4]),
-                                    'volume': float(kline[5])
-                                })
-                            
-                            return formatted_klines
-                        else:
-                            self.logger.warning(f"API вернул ошибку: {data.get('retMsg', 'Unknown error')}")
-                    else:
-                        self.logger.warning(f"HTTP ошибка: {response.status}")
-                
-                return []
-                
+                return await self._get_client().get_kline(
+                    'spot', symbol, interval, limit=self.max_klines_per_request, start=start_ms, end=end_ms)
             except Exception as e:
-                self.logger.error(f"Ошибка загрузки чанка {start_time}-{end_time}: {e}")
-                return []
+                self.logger.error(f"Ошибка загрузки чанка {start_ms}-{end_ms}: {e}")
+                return None
     
-    def _split_time_range(self, start_time: datetime, end_time: datetime, interval: str) -> List[tuple]:
-        """Разбивка временного диапазона на чанки"""
-        chunks = []
+    def _split_time_range(self, start_ms: int, end_ms: int, interval: str) -> List[Tuple[int, int]]:
+        """Разбивка [start_ms, end_ms) на чанки [start, end) по max_klines_per_request свечей
         
-        # Определяем размер чанка в зависимости от интервала
-        if interval in ['1', '5']:
-            chunk_hours = 24  # 1 день для минутных интервалов
-        elif interval in ['15', '60']:
-            chunk_hours = 168  # 1 неделя для часовых интервалов
-        else:
-            chunk_hours = 720  # 1 месяц для дневных интервалов
-        
-        current_time = start_time
-        while current_time < end_time:
-            chunk_end = min(current_time + timedelta(hours=chunk_hours), end_time)
-            chunks.append((current_time, chunk_end))
-            current_time = chunk_end
+        Границы выровнены по открытию свечи, поэтому каждый чанк укладывается
+        ровно в один запрос и весь диапазон загружается минимальным числом запросов.
+        """
+        span = interval_ms(interval) * self.max_klines_per_request
+        chunks = []
+        current = bar_open_time(int(start_ms), interval)
+        while current < end_ms:
+            chunk_end = min(current + span, int(end_ms))
+            chunks.append((current, chunk_end))
+            current = chunk_end
         
         return chunks
     
     def _convert_interval_to_bybit(self, interval: str) -> str:
-        """Конвертация интервала в формат Bybit API"""
-        interval_map = {
-            '1': '1',      # 1 минута
-            '5': '5',      # 5 минут
-            '15': '15',    # 15 минут
-            '60': '60',    # 1 час
-            '240': '240',  # 4 часа
-            '1h': '60',    # 1 час (альтернативный формат)
-            'D': 'D'       # 1 день
-        }
-        return interval_map.get(interval, '60')
+        """Конвертация интервала в формат Bybit API ('4h' -> '240'); неизвестный - ValueError"""
+        return normalize_interval(interval)
     
-    def _deduplicate_klines(self, klines: List[Dict]) -> List[Dict]:
+    def _deduplicate_klines(self, klines) -> KlineArray:
         """Удаление дубликатов и сортировка по времени"""
-        # Создаем словарь для удаления дубликатов по timestamp
-        unique_klines = {}
-        for kline in klines:
-            timestamp = kline['timestamp']
-            unique_klines[timestamp] = kline
-        
-        # Сортируем по времени
-        sorted_klines = sorted(unique_klines.values(), key=lambda x: x['timestamp'])
-        return sorted_klines
+        return as_klines(klines).deduplicated()
     
-    def _load_from_cache(self, cache_key: str) -> Optional[List[Dict]]:
-        """Загрузка данных из кэша"""
+    def _load_from_cache(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> Optional[KlineArray]:
+        """Окно из memmap кэша без копирования"""
         try:
-            cache_file = self.cache_path / f"{cache_key}.json"
-            if cache_file.exists():
-                # Проверяем возраст кэша (не старше 1 дня)
-                file_age = time.time() - cache_file.stat().st_mtime
-                if file_age < 86400:  # 24 часа
-                    with open(cache_file, 'r') as f:
-                        return json.load(f)
-            return None
+            return self.candle_cache.window(symbol, interval, start_ms, end_ms)
         except Exception as e:
             self.logger.error(f"Ошибка загрузки из кэша: {e}")
             return None
     
-    def _save_to_cache(self, cache_key: str, data: List[Dict]):
+    def _save_to_cache(self, symbol: str, interval: str, data, covered=()):
         """Сохранение данных в кэш"""
         try:
-            cache_file = self.cache_path / f"{cache_key}.json"
-            with open(cache_file, 'w') as f:
-                json.dump(data, f)
+            self.candle_cache.write(symbol, interval, data, covered)
         except Exception as e:
             self.logger.error(f"Ошибка сохранения в кэш: {e}")
     
     async def load_multiple_symbols(self, symbols: List[str], interval: str, 
-                                  days_back: int = 30) -> Dict[str, List[Dict]]:
+                                  days_back: int = 30,
+                                  progress_callback: Optional[Callable[[Dict[str, Any], int, int], None]] = None
+                                  ) -> Dict[str, KlineArray]:
         """
         Загрузка данных для нескольких символов одновременно
         
+        Чанки всех символов выполняются через один клиент под общим семафором
+        (max_concurrent_requests) и ограничением частоты клиента, поэтому
+        время загрузки определяется самой медленной очередью, а не суммой символов.
+        
         Args:
             symbols: Список торговых символов
             interval: Интервал свечей
             days_back: Количество дней назад для загрузки
+            progress_callback: progress_callback(отчет символа, завершено, всего)
             
         Returns:
-            Dict[str, List[Dict]]: Словарь с данными для каждого символа
+            Dict[str, KlineArray]: Словарь с данными для каждого символа
+            (отчеты по символам сохраняются в self.last_load_report)
         """
         end_time = datetime.now()
         start_time = end_time - timedelta(days=days_back)
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        results: Dict[str, KlineArray] = {}
+        report: Dict[str, Dict[str, Any]] = {}
+        total = len(symbols)
         
-        tasks = []
-        for symbol in symbols:
-            task = self.load_historical_data_bulk(symbol, interval, start_time, end_time)
-            tasks.append((symbol, task))
-        
-        results = {}
-        for symbol, task in tasks:
+        async def load_one(symbol: str):
+            started = time.monotonic()
+            entry = {'symbol': symbol, 'status': 'ok', 'candles': 0, 'chunks': 0, 'failed_chunks': 0, 'error': None}
             try:
-                data = await task
-                results[symbol] = data
+                klines, counters = await self._load_symbol(semaphore, symbol, interval, start_time, end_time)
+                results[symbol] = klines
+                entry.update(counters, candles=len(klines))
+                if counters['failed_chunks']:
+                    entry['status'] = 'partial' if counters['failed_chunks'] < counters['chunks'] else 'failed'
             except Exception as e:
                 self.logger.error(f"Ошибка загрузки данных для {symbol}: {e}")
-                results[symbol] = []
+                results[symbol] = KlineArray()
+                entry.update(status='failed', error=str(e))
+            entry['seconds'] = round(time.monotonic() - started, 3)
+            report[symbol] = entry
+            if progress_callback:
+                try:
+                    progress_callback(entry, len(report), total)
+                except Exception as e:
+                    self.logger.error(f"Ошибка обработчика прогресса: {e}")
+        
+        try:
+            await asyncio.gather(*(load_one(symbol) for symbol in dict.fromkeys(symbols)))
+        finally:
+            await self._release_client()
         
+        self.last_load_report = report
+        failed = [symbol for symbol, entry in report.items() if entry['status'] != 'ok']
+        if failed:
+            self.logger.warning(f"Загрузка неполная для {len(failed)} из {total} символов: {', '.join(failed[:10])}")
         return results
     
     def get_cache_info(self) -> Dict[str, Any]:
         """Получение информации о кэше"""
-        cache_files = list(self.cache_path.glob("*.json"))
+        cache_files = list(self.cache_path.glob("*.npy")) + list(self.cache_path.glob("*.json"))
         total_size = sum(f.stat().st_size for f in cache_files)
+        entries = self.candle_cache.entries()
         
         return {
             'cache_files_count': len(cache_files),
+            'series_count': len(entries),
+            'total_candles': sum(header.get('rows', 0) for header in entries.values()),
             'total_cache_size_mb': round(total_size / (1024 * 1024), 2),
             'cache_path': str(self.cache_path)
         }
@@ -259,11 +299,18 @@ class AsyncHistoricalDataLoader:
             cutoff_time = time.time() - (older_than_days * 86400)
             removed_count = 0
             
+            for header in self.candle_cache.entries().values():
+                if header.get('updated', 0) < cutoff_time:
+                    self.candle_cache.remove(header['symbol'], header['interval'])
+                    removed_count += 1
+            
+            # Файлы прежнего JSON формата кэша
             for cache_file in self.cache_path.glob("*.json"):
-                if cache_file.stat().st_mtime < cutoff_time:
+                if cache_file.name != INDEX_FILE and cache_file.stat().st_mtime < cutoff_time:
                     cache_file.unlink()
                     removed_count += 1
             
+            removed_count += self.candle_cache.cleanup_orphans()
             self.logger.info(f"Удалено {removed_count} старых файлов кэша")
             
         except Exception as e:
@@ -0,0 +1,230 @@
+"""
+Бинарный кэш свечей на диске с отображением в память (memmap)
+Один файл .npy фиксированной ширины (KLINE_DTYPE, по возрастанию времени)
+на символ и интервал и небольшой индекс index.json с заголовками:
+файл, число строк, первая/последняя свеча и загруженные отрезки.
+
+Чтение не разбирает файл: np.load(mmap_mode='r') отображает его в память,
+окно [start, end) находится бинарным поиском по колонке timestamp и
+возвращается как KlineArray-представление без копирования.
+
+Пример:
+    cache = CandleCache('data/historical_cache')
+    cache.write('BTCUSDT', '1', klines, covered=[(start_ms, end_ms)])
+    window = cache.window('BTCUSDT', '1', start_ms, end_ms)     # без копирования
+    for block in cache.iter_blocks('BTCUSDT', '1', rows=100_000):
+        ...
+"""
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.api import json_codec
+from src.api.klines import KLINE_DTYPE, KlineArray, as_klines, normalize_interval
+from src.data.kline_store import merge_ranges, subtract_ranges
+
+INDEX_FILE = 'index.json'
+
+
+class CandleCache:
+    """Каталог memmap файлов свечей с индексом заголовков
+
+    Файл данных никогда не перезаписывается на месте: новая версия пишется
+    под новым именем, после чего индекс переключается на нее. Открытые
+    читателями отображения старой версии остаются корректными (на Windows
+    файл, отображенный в память, нельзя заменить или удалить).
+    """
+
+    def __init__(self, path: str = "data/historical_cache"):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._index_mtime = None
+        self._index: Dict[str, Dict] = {}
+        self._maps: Dict[str, Tuple[str, np.ndarray]] = {}
+
+    # ---- Индекс ----
+
+    @staticmethod
+    def key(symbol: str, interval: str) -> str:
+        return f"{symbol}_{normalize_interval(interval)}"
+
+    def _index_path(self) -> Path:
+        return self.path / INDEX_FILE
+
+    def _load_index(self) -> Dict[str, Dict]:
+        """Индекс с диска (перечитывается, только если файл изменился)"""
+        index_path = self._index_path()
+        try:
+            mtime = index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return self._index
+        if mtime != self._index_mtime:
+            try:
+                self._index = json_codec.load_file(index_path)
+                self._index_mtime = mtime
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Ошибка чтения индекса кэша свечей: {e}")
+        return self._index
+
+    def header(self, symbol: str, interval: str) -> Optional[Dict]:
+        """Заголовок файла: file, rows, first_ts, last_ts, segments, updated"""
+        with self._lock:
+            return self._load_index().get(self.key(symbol, interval))
+
+    def entries(self) -> Dict[str, Dict]:
+        with self._lock:
+            return dict(self._load_index())
+
+    # ---- Чтение ----
+
+    def open(self, symbol: str, interval: str) -> KlineArray:
+        """Все свечи символа как memmap-представление (пустой блок, если файла нет)"""
+        key = self.key(symbol, interval)
+        with self._lock:
+            header = self._load_index().get(key)
+            if not header:
+                return KlineArray()
+            cached = self._maps.get(key)
+            if cached is not None and cached[0] == header['file']:
+                return KlineArray(cached[1])
+            try:
+                data = np.load(self.path / header['file'], mmap_mode='r')
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Ошибка открытия файла свечей {header['file']}: {e}")
+                return KlineArray()
+            self._maps[key] = (header['file'], data)
+            return KlineArray(data)
+
+    def window(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> KlineArray:
+        """Свечи [start_ms, end_ms) без копирования (бинарный поиск по timestamp)"""
+        klines = self.open(symbol, interval)
+        if not len(klines):
+            return klines
+        timestamps = klines.timestamp
+        lo = int(np.searchsorted(timestamps, start_ms, side='left'))
+        hi = int(np.searchsorted(timestamps, end_ms, side='left'))
+        return klines[lo:hi]
+
+    def tail(self, symbol: str, interval: str, limit: int) -> KlineArray:
+        """Последние limit свечей по возрастанию времени без копирования"""
+        klines = self.open(symbol, interval)
+        return klines[max(0, len(klines) - limit):]
+
+    def iter_blocks(self, symbol: str, interval: str, rows: int = 100_000,
+                    start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Iterator[KlineArray]:
+        """Потоковое чтение блоками по rows свечей (страницы подгружаются ОС по мере чтения)"""
+        if start_ms is None and end_ms is None:
+            klines = self.open(symbol, interval)
+        else:
+            klines = self.window(symbol, interval, start_ms if start_ms is not None else 0,
+                                 end_ms if end_ms is not None else np.iinfo(np.int64).max)
+        for offset in range(0, len(klines), rows):
+            yield klines[offset:offset + rows]
+
+    def missing_ranges(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> List[Tuple[int, int]]:
+        """Части [start_ms, end_ms), которых нет в кэше"""
+        header = self.header(symbol, interval)
+        segments = [tuple(s) for s in header.get('segments', [])] if header else []
+        return subtract_ranges(int(start_ms), int(end_ms), segments)
+
+    # ---- Запись ----
+
+    def write(self, symbol: str, interval: str, klines,
+              covered: Iterable[Tuple[int, int]] = ()) -> Dict:
+        """Слияние свечей с файлом символа и запись новой версии
+
+        Args:
+            klines: Новые свечи (в любом порядке; дубликаты заменяют старые)
+            covered: Отрезки [start, end), полностью загруженные этими свечами
+
+        Returns:
+            Dict: Новый заголовок
+        """
+        key = self.key(symbol, interval)
+        new = as_klines(klines)
+        with self._lock:
+            index = dict(self._load_index())
+            header = index.get(key) or {}
+            old_file = header.get('file')
+            parts = []
+            if old_file:
+                try:
+                    parts.append(KlineArray(np.load(self.path / old_file, mmap_mode='r')))
+                except (OSError, ValueError) as e:
+                    self.logger.warning(f"Файл свечей {old_file} не прочитан и будет перезаписан: {e}")
+                    header = {}
+            parts.append(new)
+            merged = KlineArray.concat(parts).deduplicated()
+            del parts  # Отображение старой версии закрывается до ее удаления
+
+            version = int((index.get(key) or {}).get('version', 0)) + 1
+            file_name = f"{key}.v{version}.npy"
+            tmp_path = self.path / f"{file_name}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(merged.data, dtype=KLINE_DTYPE))
+            os.replace(tmp_path, self.path / file_name)
+
+            segments = [tuple(s) for s in header.get('segments', [])]
+            segments.extend((int(start), int(end)) for start, end in covered)
+            header = {
+                'file': file_name,
+                'version': version,
+                'symbol': symbol,
+                'interval': normalize_interval(interval),
+                'rows': len(merged),
+                'first_ts': int(merged.timestamp[0]) if len(merged) else None,
+                'last_ts': int(merged.timestamp[-1]) if len(merged) else None,
+                'segments': [list(s) for s in merge_ranges(segments)],
+                'updated': time.time(),
+            }
+            index[key] = header
+            json_codec.dump_file(self._index_path(), index)
+            self._index = index
+            self._index_mtime = self._index_path().stat().st_mtime_ns
+            self._maps.pop(key, None)
+        if old_file and old_file != file_name:
+            self._remove_file(old_file)
+        return header
+
+    def remove(self, symbol: str, interval: str):
+        key = self.key(symbol, interval)
+        with self._lock:
+            index = dict(self._load_index())
+            header = index.pop(key, None)
+            if header is None:
+                return
+            json_codec.dump_file(self._index_path(), index)
+            self._index = index
+            self._index_mtime = self._index_path().stat().st_mtime_ns
+            self._maps.pop(key, None)
+        self._remove_file(header['file'])
+
+    def _remove_file(self, file_name: str):
+        """Удаление старой версии (занятый читателем файл остается до следующей очистки)"""
+        try:
+            (self.path / file_name).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.debug(f"Файл {file_name} пока занят: {e}")
+
+    def cleanup_orphans(self) -> int:
+        """Удаление версий файлов, на которые не ссылается индекс"""
+        current = {header['file'] for header in self.entries().values()}
+        removed = 0
+        for path in self.path.glob('*.npy'):
+            if path.name not in current:
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError:
+                    continue
+        return removed
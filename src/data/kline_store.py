@@ -0,0 +1,249 @@
+"""
+Инкрементальное локальное хранилище свечей с учетом пропусков
+Свечи хранятся в SQLite по ключу (category, symbol, interval) вместе со
+списком загруженных непрерывных отрезков [start, end). Запрос окна
+догружает из API только недостающие части (хвост или дыры), остальное
+отдается с диска.
+
+Пример:
+    store = KlineStore(testnet=client.testnet)
+    klines = store.recent(client, 'spot', 'BTCUSDT', '240', 200)     # как get_kline
+    window = store.window(client, 'spot', 'BTCUSDT', '60', start_ms, end_ms)
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.api.klines import KLINE_DTYPE, KlineArray, as_klines, bar_open_time, interval_ms, normalize_interval
+
+# Максимум свечей в одном запросе /v5/market/kline
+MAX_KLINES_PER_REQUEST = 1000
+
+
+def default_store_path(testnet: bool = True) -> Path:
+    """data/klines_testnet.db или data/klines_mainnet.db: свечи сетей не смешиваются"""
+    return Path(__file__).parent.parent.parent / 'data' / f"klines_{'testnet' if testnet else 'mainnet'}.db"
+
+Range = Tuple[int, int]
+
+
+def merge_ranges(ranges: List[Range]) -> List[Range]:
+    """Объединение пересекающихся и смежных отрезков [start, end)"""
+    merged: List[List[int]] = []
+    for start, end in sorted(r for r in ranges if r[1] > r[0]):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def subtract_ranges(start: int, end: int, covered: List[Range]) -> List[Range]:
+    """Части [start, end), не покрытые отрезками covered (отсортированными и объединенными)"""
+    gaps = []
+    cursor = start
+    for seg_start, seg_end in covered:
+        if seg_end <= cursor:
+            continue
+        if seg_start >= end:
+            break
+        if seg_start > cursor:
+            gaps.append((cursor, seg_start))
+        cursor = max(cursor, seg_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class KlineStore:
+    """Потокобезопасное хранилище свечей с отслеживанием загруженных отрезков
+
+    Отрезок покрытия означает, что все свечи в нем уже получены от API
+    (отсутствие свечи внутри отрезка - отсутствие торгов, а не пропуск).
+    Текущая незакрытая свеча сохраняется, но в покрытие не входит и
+    перезапрашивается при следующем обновлении.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, testnet: bool = True):
+        self.logger = logging.getLogger(__name__)
+        self.db_path = Path(db_path) if db_path else default_store_path(testnet)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+        self.stats = {'requests': 0, 'fetched': 0, 'served': 0}
+
+    def _init_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS klines (
+                    category TEXT NOT NULL,
+                    symbol TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (category, symbol, interval, ts)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS kline_segments (
+                    category TEXT NOT NULL,
+                    symbol TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    start_ms INTEGER NOT NULL,
+                    end_ms INTEGER NOT NULL,
+                    PRIMARY KEY (category, symbol, interval, start_ms)
+                )
+            """)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---- Чтение с диска ----
+
+    def segments(self, category: str, symbol: str, interval: str) -> List[Range]:
+        """Загруженные непрерывные отрезки [start, end) по возрастанию"""
+        interval = normalize_interval(interval)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT start_ms, end_ms FROM kline_segments WHERE category=? AND symbol=? AND interval=? "
+                "ORDER BY start_ms", (category, symbol, interval)).fetchall()
+        return [(start, end) for start, end in rows]
+
+    def missing_ranges(self, category: str, symbol: str, interval: str,
+                       start_ms: int, end_ms: int) -> List[Range]:
+        """Части окна [start_ms, end_ms), которых нет в хранилище"""
+        interval = normalize_interval(interval)
+        start_ms = bar_open_time(int(start_ms), interval)
+        return subtract_ranges(start_ms, int(end_ms), self.segments(category, symbol, interval))
+
+    def get(self, category: str, symbol: str, interval: str, start_ms: int, end_ms: int) -> KlineArray:
+        """Свечи окна [start_ms, end_ms) с диска по возрастанию времени (без запросов к API)"""
+        interval = normalize_interval(interval)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ts, open, high, low, close, volume FROM klines "
+                "WHERE category=? AND symbol=? AND interval=? AND ts>=? AND ts<? ORDER BY ts",
+                (category, symbol, interval, int(start_ms), int(end_ms))).fetchall()
+        self.stats['served'] += len(rows)
+        if not rows:
+            return KlineArray()
+        return KlineArray(np.array(rows, dtype=KLINE_DTYPE))
+
+    # ---- Запись ----
+
+    def put(self, category: str, symbol: str, interval: str, klines,
+            covered: Optional[Range] = None):
+        """Сохранение свечей и (опционально) отметка отрезка covered как загруженного"""
+        interval = normalize_interval(interval)
+        klines = as_klines(klines)
+        key = (category, symbol, interval)
+        with self._lock, self._conn:
+            if len(klines):
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO klines (category, symbol, interval, ts, open, high, low, close, volume) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key + row for row in klines.data.tolist()))
+            if covered is not None and covered[1] > covered[0]:
+                existing = self._conn.execute(
+                    "SELECT start_ms, end_ms FROM kline_segments WHERE category=? AND symbol=? AND interval=?",
+                    key).fetchall()
+                merged = merge_ranges([tuple(r) for r in existing] + [covered])
+                self._conn.execute(
+                    "DELETE FROM kline_segments WHERE category=? AND symbol=? AND interval=?", key)
+                self._conn.executemany(
+                    "INSERT INTO kline_segments (category, symbol, interval, start_ms, end_ms) VALUES (?, ?, ?, ?, ?)",
+                    (key + seg for seg in merged))
+
+    # ---- Догрузка из API ----
+
+    def sync(self, fetch: Callable[[int, int, int], KlineArray], category: str, symbol: str,
+             interval: str, start_ms: int, end_ms: int) -> int:
+        """Догрузка недостающих частей окна [start_ms, end_ms)
+
+        Args:
+            fetch: fetch(start_ms, end_ms_inclusive, limit) -> свечи (как get_kline: до limit
+                самых новых свечей диапазона)
+
+        Returns:
+            int: Количество полученных от API свечей
+        """
+        interval = normalize_interval(interval)
+        # Незакрытая свеча не считается загруженной - ее всегда перезапрашиваем
+        open_bar = bar_open_time(int(time.time() * 1000), interval)
+        fetched = 0
+        for gap_start, gap_end in self.missing_ranges(category, symbol, interval, start_ms, end_ms):
+            fetched += self._fill_gap(fetch, category, symbol, interval, gap_start, gap_end, open_bar)
+        return fetched
+
+    def _fill_gap(self, fetch, category: str, symbol: str, interval: str,
+                  gap_start: int, gap_end: int, open_bar: int) -> int:
+        """Заполнение одной дыры страницами от новых свечей к старым"""
+        covered_end = min(gap_end, open_bar)
+        page_end = gap_end
+        fetched = 0
+        while page_end > gap_start:
+            self.stats['requests'] += 1
+            page = as_klines(fetch(gap_start, page_end - 1, MAX_KLINES_PER_REQUEST))
+            if len(page):
+                fetched += len(page)
+                oldest = int(page.timestamp.min())
+                # Всё от oldest до конца страницы получено полностью
+                self.put(category, symbol, interval, page, covered=(oldest, covered_end))
+                if len(page) == MAX_KLINES_PER_REQUEST and oldest > gap_start:
+                    page_end = oldest
+                    continue
+                page_end = oldest
+            # Неполная или пустая страница: раньше page_end в дыре свечей нет
+            self.put(category, symbol, interval, KlineArray(),
+                     covered=(gap_start, min(page_end, covered_end)))
+            break
+        self.stats['fetched'] += fetched
+        return fetched
+
+    @staticmethod
+    def client_fetcher(client, category: str, symbol: str, interval: str) -> Callable[[int, int, int], KlineArray]:
+        """fetch для sync() поверх BybitClient.get_kline"""
+        def fetch(start_ms: int, end_ms: int, limit: int) -> KlineArray:
+            return client.get_kline(category, symbol, interval, limit=limit, start=start_ms, end=end_ms)
+        return fetch
+
+    def window(self, client, category: str, symbol: str, interval: str,
+               start_ms: int, end_ms: int) -> KlineArray:
+        """Свечи окна [start_ms, end_ms) по возрастанию; из API запрашиваются только пропуски"""
+        interval = normalize_interval(interval)
+        self.sync(self.client_fetcher(client, category, symbol, interval),
+                  category, symbol, interval, start_ms, end_ms)
+        return self.get(category, symbol, interval, start_ms, end_ms)
+
+    def recent(self, client, category: str, symbol: str, interval: str, limit: int = 200) -> KlineArray:
+        """Последние limit свечей в порядке REST get_kline (новые первыми)
+
+        Повторный вызов догружает только свечи, появившиеся после прошлого.
+        """
+        interval = normalize_interval(interval)
+        now_ms = int(time.time() * 1000)
+        end_ms = bar_open_time(now_ms, interval) + interval_ms(interval)
+        start_ms = end_ms - limit * interval_ms(interval)
+        klines = self.window(client, category, symbol, interval, start_ms, end_ms)
+        return klines[::-1][:limit]
+
+    def info(self) -> Dict[str, int]:
+        """Размер хранилища: ключей, свечей, отрезков"""
+        with self._lock:
+            keys = self._conn.execute(
+                "SELECT COUNT(*) FROM (SELECT DISTINCT category, symbol, interval FROM kline_segments)").fetchone()[0]
+            candles = self._conn.execute("SELECT COUNT(*) FROM klines").fetchone()[0]
+            segments = self._conn.execute("SELECT COUNT(*) FROM kline_segments").fetchone()[0]
+        return {'keys': keys, 'candles': candles, 'segments': segments}
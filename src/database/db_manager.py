@@ -20,6 +20,14 @@ class DatabaseManager:
     Обеспечивает детальное логирование всех операций
     """
     
+    # Колонки available_symbols, которых нет в базах, созданных ранее
+    AVAILABLE_SYMBOLS_ADDED_COLUMNS = (
+        ('min_order_amt', 'REAL'),
+        ('max_market_order_qty', 'REAL'),
+        ('base_precision', 'TEXT'),
+        ('quote_precision', 'TEXT'),
+    )
+    
     def __init__(self, db_path: Optional[str] = None):
         self.logger = logging.getLogger(__name__)
         
@@ -164,11 +172,42 @@ class DatabaseManager:
                         qty_step REAL,
                         post_only_max_order_qty REAL,
                         symbol_status TEXT,
+                        min_order_amt REAL,
+                        max_market_order_qty REAL,
+                        base_precision TEXT,
+                        quote_precision TEXT,
                         last_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
                         UNIQUE(symbol, category)
                     )
                 """)
                 
+                # Таблица исполнений (заполняется постранично из /v5/execution/list)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS executions (
+                        exec_id TEXT PRIMARY KEY,
+                        category TEXT,
+                        symbol TEXT NOT NULL,
+                        order_id TEXT,
+                        order_link_id TEXT,
+                        side TEXT,
+                        exec_price REAL,
+                        exec_qty REAL,
+                        exec_value REAL,
+                        exec_fee REAL,
+                        fee_currency TEXT,
+                        exec_type TEXT,
+                        is_maker INTEGER,
+                        exec_time INTEGER,
+                        last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                # Колонки, добавленные после создания таблицы в существующих базах
+                existing_columns = {row[1] for row in cursor.execute("PRAGMA table_info(available_symbols)")}
+                for column, column_type in self.AVAILABLE_SYMBOLS_ADDED_COLUMNS:
+                    if column not in existing_columns:
+                        cursor.execute(f"ALTER TABLE available_symbols ADD COLUMN {column} {column_type}")
+                
                 # Индексы для оптимизации запросов
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_system_logs_timestamp ON system_logs(timestamp)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades(timestamp)")
@@ -178,6 +217,7 @@ class DatabaseManager:
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_price_history_symbol ON price_history(symbol)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_price_history_timestamp ON price_history(timestamp)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_available_symbols_symbol ON available_symbols(symbol)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_executions_symbol_time ON executions(symbol, exec_time)")
                 
                 conn.commit()
                 self.logger.info("База данных инициализирована")
@@ -493,50 +533,123 @@ class DatabaseManager:
             self.logger.error(f"Ошибка при получении истории цен из базы данных: {e}")
             return []
             
+    @staticmethod
+    def _to_float(value, default=0.0):
+        """Число из поля API (пустые строки и None дают default)"""
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return default
+    
     def save_available_symbols(self, symbols_data):
-        """Сохранение доступных символов в базу данных"""
+        """Сохранение доступных символов в базу данных
+        
+        Args:
+            symbols_data: Плоские записи instruments-info (поля lotSizeFilter/priceFilter на верхнем уровне)
+        """
+        to_float = self._to_float
         try:
+            rows = [(
+                symbol_data.get('symbol', ''),
+                symbol_data.get('category', ''),
+                symbol_data.get('baseCoin', ''),
+                symbol_data.get('quoteCoin', ''),
+                int(to_float(symbol_data.get('priceScale', 0))),
+                to_float(symbol_data.get('takerFee', 0)),
+                to_float(symbol_data.get('makerFee', 0)),
+                to_float(symbol_data.get('minLeverage', 0)),
+                to_float(symbol_data.get('maxLeverage', 0)),
+                to_float(symbol_data.get('leverageStep', 0)),
+                to_float(symbol_data.get('minPrice', 0)),
+                to_float(symbol_data.get('maxPrice', 0)),
+                to_float(symbol_data.get('tickSize', 0)),
+                to_float(symbol_data.get('minOrderQty', 0)),
+                to_float(symbol_data.get('maxOrderQty', 0)),
+                to_float(symbol_data.get('qtyStep', 0)),
+                to_float(symbol_data.get('postOnlyMaxOrderQty', 0)),
+                symbol_data.get('status', ''),
+                to_float(symbol_data.get('minOrderAmt', 0)),
+                to_float(symbol_data.get('maxMarketOrderQty', 0)),
+                str(symbol_data.get('basePrecision', '')),
+                str(symbol_data.get('quotePrecision', ''))
+            ) for symbol_data in symbols_data]
+            
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 # Сначала удаляем все старые записи, так как мы всегда сохраняем актуальное состояние
                 cursor.execute("DELETE FROM available_symbols")
                 
-                # Вставляем новые данные
-                for symbol_data in symbols_data:
-                    cursor.execute("""
-                        INSERT INTO available_symbols (
-                            symbol, category, base_coin, quote_coin, price_scale,
-                            taker_fee, maker_fee, min_leverage, max_leverage, leverage_step,
-                            min_price, max_price, tick_size, min_order_qty, max_order_qty,
-                            qty_step, post_only_max_order_qty, symbol_status
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        symbol_data.get('symbol', ''),
-                        symbol_data.get('category', ''),
-                        symbol_data.get('baseCoin', ''),
-                        symbol_data.get('quoteCoin', ''),
-                        int(symbol_data.get('priceScale', 0)),
-                        float(symbol_data.get('takerFee', 0)),
-                        float(symbol_data.get('makerFee', 0)),
-                        float(symbol_data.get('minLeverage', 0)),
-                        float(symbol_data.get('maxLeverage', 0)),
-                        float(symbol_data.get('leverageStep', 0)),
-                        float(symbol_data.get('minPrice', 0)),
-                        float(symbol_data.get('maxPrice', 0)),
-                        float(symbol_data.get('tickSize', 0)),
-                        float(symbol_data.get('minOrderQty', 0)),
-                        float(symbol_data.get('maxOrderQty', 0)),
-                        float(symbol_data.get('qtyStep', 0)),
-                        float(symbol_data.get('postOnlyMaxOrderQty', 0)),
-                        symbol_data.get('status', '')
-                    ))
+                # Вставляем новые данные одним пакетом
+                cursor.executemany("""
+                    INSERT INTO available_symbols (
+                        symbol, category, base_coin, quote_coin, price_scale,
+                        taker_fee, maker_fee, min_leverage, max_leverage, leverage_step,
+                        min_price, max_price, tick_size, min_order_qty, max_order_qty,
+                        qty_step, post_only_max_order_qty, symbol_status,
+                        min_order_amt, max_market_order_qty, base_precision, quote_precision
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows)
                 conn.commit()
-                self.logger.info(f"Сохранено {len(symbols_data)} доступных символов в базу данных")
+                self.logger.info(f"Сохранено {len(rows)} доступных символов в базу данных")
                 return True
         except Exception as e:
             self.logger.error(f"Ошибка при сохранении доступных символов в базу данных: {e}")
             return False
             
+    def save_executions(self, executions, category: str = '', batch_size: int = 500) -> int:
+        """Потоковое сохранение исполнений пакетами (повторные execId пропускаются)
+        
+        Args:
+            executions: Любой итерируемый источник строк API, например BybitClient.iter_executions()
+            category: Категория, если её нет в строках
+            batch_size: Размер пакета executemany
+            
+        Returns:
+            int: Число обработанных строк
+        """
+        to_float = self._to_float
+        total = 0
+        batch = []
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            for row in executions:
+                batch.append((
+                    row.get('execId'),
+                    row.get('category', category),
+                    row.get('symbol', ''),
+                    row.get('orderId'),
+                    row.get('orderLinkId'),
+                    row.get('side'),
+                    to_float(row.get('execPrice')),
+                    to_float(row.get('execQty')),
+                    to_float(row.get('execValue')),
+                    to_float(row.get('execFee')),
+                    row.get('feeCurrency'),
+                    row.get('execType'),
+                    1 if row.get('isMaker') else 0,
+                    int(to_float(row.get('execTime')))
+                ))
+                if len(batch) >= batch_size:
+                    total += self._insert_executions(cursor, batch)
+                    conn.commit()
+                    batch = []
+            if batch:
+                total += self._insert_executions(cursor, batch)
+                conn.commit()
+        self.logger.info(f"Сохранено {total} исполнений в базу данных")
+        return total
+    
+    @staticmethod
+    def _insert_executions(cursor, rows) -> int:
+        cursor.executemany("""
+            INSERT OR IGNORE INTO executions (
+                exec_id, category, symbol, order_id, order_link_id, side,
+                exec_price, exec_qty, exec_value, exec_fee, fee_currency,
+                exec_type, is_maker, exec_time
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        return len(rows)
+    
     def get_available_symbols(self, category=None, limit=1000):
         """Получение доступных символов из базы данных"""
         try:
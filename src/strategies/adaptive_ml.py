@@ -15,6 +15,8 @@ import pickle
 import json
 import time
 
+from src.api.klines import KlineArray, as_klines
+
 try:
     from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
     from sklearn.model_selection import train_test_split
@@ -207,6 +209,8 @@ class AdaptiveMLStrategy:
         
         # Данные для обучения
         self.training_data = []
+        # Бинарный кэш свечей загрузчика истории (CandleCache, подключается тренером)
+        self.candle_cache = None
         self.model_path = Path(__file__).parent / 'models'
         self.model_path.mkdir(exist_ok=True)
         
@@ -228,6 +232,8 @@ class AdaptiveMLStrategy:
             bool: True если данные успешно загружены, иначе False
         """
         try:
+            if self.candle_cache is not None and self.load_historical_data_from_cache(symbol, timeframe, limit):
+                return True
             if hasattr(self, 'ticker_loader') and self.ticker_loader:
                 self.logger.info(f"Загрузка исторических данных для {symbol} из ticker_loader")
                 return self.load_historical_data_from_ticker_loader(symbol, timeframe, limit)
@@ -238,6 +244,18 @@ class AdaptiveMLStrategy:
             self.logger.error(f"Ошибка при подготовке исторических данных: {e}")
             return False
     
+    def load_historical_data_from_cache(self, symbol: str, timeframe: str, limit: int = 500):
+        """Обучение на последних свечах memmap кэша (представление файла без копирования)"""
+        try:
+            klines = self.candle_cache.tail(symbol, timeframe, limit)
+            if len(klines) < self.feature_window:
+                return False
+            self.logger.info(f"Загрузка исторических данных для {symbol} из кэша свечей: {len(klines)}")
+            return self.train_on_historical_data(symbol, klines)
+        except Exception as e:
+            self.logger.error(f"Ошибка загрузки из кэша свечей для {symbol}: {e}")
+            return False
+    
     def load_historical_data_from_ticker_loader(self, symbol: str, timeframe: str, limit: int = 500):
         """Загрузка исторических данных из ticker_loader"""
         try:
@@ -286,17 +304,8 @@ class AdaptiveMLStrategy:
                 self.logger.warning(f"Недостаточно данных от API для {symbol}: {len(klines)} < {self.feature_window}")
                 return False
                 
-            # Преобразуем формат данных API в стандартный формат
-            formatted_klines = []
-            for kline in klines:
-                formatted_klines.append({
-                    'open': float(kline[1]),
-                    'high': float(kline[2]),
-                    'low': float(kline[3]),
-                    'close': float(kline[4]),
-                    'volume': float(kline[5]),
-                    'timestamp': int(kline[0])
-                })
+            # Колоночное декодирование строк API без промежуточных словарей
+            formatted_klines = KlineArray.from_rows(klines)
                 
             # Обучаем модель на исторических данных
             return self.train_on_historical_data(symbol, formatted_klines)
@@ -305,11 +314,13 @@ class AdaptiveMLStrategy:
             self.logger.error(f"Ошибка загрузки через API для {symbol}: {e}")
             return False
     
-    def train_on_historical_data(self, symbol: str, klines: List[Dict]):
-        """Обучение модели на исторических данных"""
+    def train_on_historical_data(self, symbol: str, klines):
+        """Обучение модели на исторических данных (KlineArray или список словарей)"""
         try:
             if not SKLEARN_AVAILABLE or len(klines) < self.feature_window + 10:
                 return False
+            klines = as_klines(klines)
+            closes = klines.close
                 
             features = []
             labels = []
@@ -325,8 +336,8 @@ class AdaptiveMLStrategy:
                     features.append(feat)
                     
                     # Создаем метку на основе изменения цены через prediction_horizon свечей
-                    current_price = float(klines[i]['close'])
-                    future_price = float(klines[i + prediction_horizon]['close'])
+                    current_price = float(closes[i])
+                    future_price = float(closes[i + prediction_horizon])
                     change = (future_price - current_price) / current_price
                     
                     # Метки: 1 (BUY), -1 (SELL), 0 (HOLD)
@@ -367,7 +378,7 @@ class AdaptiveMLStrategy:
                 return {'signal': None, 'confidence': 0.0, 'reason': 'Ошибка извлечения признаков'}
             
             # Определение рыночного режима
-            prices = [float(k['close']) for k in klines]
+            prices = as_klines(klines).close.tolist()
             regime_info = self.regime_detector.detect_regime(prices)
             
             # Получение предсказания от ML модели
@@ -390,15 +401,14 @@ class AdaptiveMLStrategy:
             self.logger.error(f"Ошибка анализа рынка {market_data.get('symbol', 'unknown')}: {e}")
             return {'signal': None, 'confidence': 0.0, 'reason': f'Ошибка: {str(e)}'}
     
-    def extract_features(self, klines: List[Dict]) -> Optional[List[float]]:
-        """Извлечение признаков из исторических данных"""
+    def extract_features(self, klines) -> Optional[List[float]]:
+        """Извлечение признаков из исторических данных (KlineArray или список словарей)"""
         try:
-            # Базовые цены
-            opens = [float(k['open']) for k in klines]
-            highs = [float(k['high']) for k in klines]
-            lows = [float(k['low']) for k in klines]
-            closes = [float(k['close']) for k in klines]
-            volumes = [float(k['volume']) for k in klines]
+            # Базовые цены: колонки берутся из KlineArray без обхода словарей
+            klines = as_klines(klines)
+            close_column = klines.close
+            closes = close_column.tolist()
+            volumes = klines.volume.tolist()
             
             features = []
             
@@ -478,23 +488,17 @@ class AdaptiveMLStrategy:
             
             # Волатильность
             if len(closes) > 20:
-                returns = []
-                for i in range(1, len(closes)):
-                    if closes[i-1] != 0 and np.isfinite(closes[i]) and np.isfinite(closes[i-1]):
-                        ret = (closes[i] - closes[i-1]) / closes[i-1]
-                        # Ограничиваем экстремальные значения доходности
-                        ret = np.clip(ret, -0.5, 0.5)
-                        returns.append(ret)
-                    else:
-                        returns.append(0)
+                previous = close_column[:-1]
+                current = close_column[1:]
+                valid = (previous != 0) & np.isfinite(previous) & np.isfinite(current)
+                returns = np.zeros(len(current))
+                # Ограничиваем экстремальные значения доходности
+                returns[valid] = np.clip((current[valid] - previous[valid]) / previous[valid], -0.5, 0.5)
                 
-                if returns:
-                    volatility = np.std(returns[-20:]) * 100
-                    # Ограничиваем волатильность в разумных пределах
-                    volatility = np.clip(volatility, 0, 50)
-                    features.append(volatility)
-                else:
-                    features.append(0)
+                volatility = np.std(returns[-20:]) * 100
+                # Ограничиваем волатильность в разумных пределах
+                volatility = np.clip(volatility, 0, 50)
+                features.append(volatility)
             else:
                 features.append(0)
             
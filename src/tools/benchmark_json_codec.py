@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк JSON кодеков на реальных файлах состояния проекта
+Для каждого файла и каждого доступного кодека (orjson, msgspec, json) измеряет
+время разбора и компактной сериализации, а также размер компактного вывода.
+
+Запуск:
+    python src/tools/benchmark_json_codec.py
+    python src/tools/benchmark_json_codec.py --repeat 20 path/to/file.json
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.api import json_codec
+from src.tools.ticker_data_loader import TickerDataLoader
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+
+def default_files():
+    """Файлы горячих путей: тикеры, очередь сигналов, кэш свечей, состояние обучения"""
+    candidates = [
+        TickerDataLoader().get_data_file_path(),
+        PROJECT_ROOT / 'tickers_data_copy.json',
+        PROJECT_ROOT / 'signals_queue.json',
+        PROJECT_ROOT / 'signals_queue_backup.json',
+        PROJECT_ROOT / 'src' / 'strategies' / 'models' / 'adaptive_ml_training_state.json',
+        PROJECT_ROOT / 'src' / 'strategies' / 'models' / 'adaptive_ml_performance.json',
+    ]
+    cache_files = sorted((PROJECT_ROOT / 'data' / 'historical_cache').glob('*.json'))
+    candidates.extend(cache_files[:3])
+    return [path for path in candidates if path.exists()]
+
+
+def measure(fn, repeat: int) -> float:
+    """Медианное время вызова в миллисекундах"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение JSON кодеков на файлах состояния")
+    parser.add_argument('files', nargs='*', type=Path, help="JSON файлы (по умолчанию - файлы проекта)")
+    parser.add_argument('--repeat', type=int, default=10, help="Повторов на измерение")
+    args = parser.parse_args()
+
+    files = args.files or default_files()
+    if not files:
+        print("Не найдено ни одного JSON файла для измерения")
+        return
+
+    backends = json_codec.available_backends()
+    print(f"Доступные кодеки: {', '.join(backends)}; повторов: {args.repeat}")
+    print(f"{'файл':42}{'размер, КБ':>12}{'кодек':>10}{'разбор, мс':>12}{'запись, мс':>12}{'компакт, КБ':>13}")
+
+    for path in files:
+        raw = path.read_bytes()
+        for name in backends:
+            codec = json_codec.make_codec(name)
+            obj = codec.loads(raw)
+            parse_ms = measure(lambda: codec.loads(raw), args.repeat)
+            dump_ms = measure(lambda: codec.dumps(obj, str), args.repeat)
+            compact_kb = len(codec.dumps(obj, str)) / 1024
+            print(f"{path.name[:41]:42}{len(raw) / 1024:>12.1f}{name:>10}"
+                  f"{parse_ms:>12.2f}{dump_ms:>12.2f}{compact_kb:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
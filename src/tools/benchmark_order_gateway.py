@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк задержки размещения ордеров: WebSocket Trade API против REST
+Запускает локальную заглушку биржи (HTTP + WebSocket) с искусственной задержкой
+сети и сравнивает OrderGateway с BybitClient.place_order. Сеть не требуется.
+
+Запуск:
+    python src/tools/benchmark_order_gateway.py --orders 200 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+# Добавляем корневую директорию проекта в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import websockets
+from aiohttp import web
+
+from src.api.bybit_client import BybitClient, RateLimiter
+from src.api.order_gateway import OrderGateway
+
+
+class ExchangeStub:
+    """Локальная заглушка REST и WebSocket Trade API с задержкой одной стороны latency_ms"""
+
+    def __init__(self, latency_ms: float, http_port: int, ws_port: int):
+        self.latency = latency_ms / 1000
+        self.http_port = http_port
+        self.ws_port = ws_port
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.order_counter = 0
+
+    def _order_result(self, args):
+        self.order_counter += 1
+        return {'orderId': str(self.order_counter), 'orderLinkId': args.get('orderLinkId', '')}
+
+    async def _http_time(self, request):
+        await asyncio.sleep(self.latency)
+        return web.json_response({'retCode': 0, 'retMsg': 'OK', 'result': {
+            'timeSecond': str(int(time.time())), 'timeNano': str(time.time_ns())}})
+
+    async def _http_order(self, request):
+        args = json.loads(await request.text())
+        await asyncio.sleep(self.latency)
+        return web.json_response({'retCode': 0, 'retMsg': 'OK', 'result': self._order_result(args)})
+
+    async def _ws_handler(self, ws):
+        async for raw in ws:
+            message = json.loads(raw)
+            await asyncio.sleep(self.latency)
+            if message.get('op') == 'auth':
+                await ws.send(json.dumps({'op': 'auth', 'retCode': 0, 'retMsg': 'OK'}))
+            elif message.get('op') == 'ping':
+                await ws.send(json.dumps({'op': 'pong'}))
+            elif message.get('op') == 'order.create':
+                await ws.send(json.dumps({
+                    'reqId': message['reqId'], 'retCode': 0, 'retMsg': 'OK', 'op': 'order.create',
+                    'data': self._order_result(message['args'][0])
+                }))
+
+    async def _serve(self):
+        app = web.Application()
+        app.router.add_get('/v5/market/time', self._http_time)
+        app.router.add_post('/v5/order/create', self._http_order)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', self.http_port).start()
+        async with websockets.serve(self._ws_handler, '127.0.0.1', self.ws_port):
+            self.ready.set()
+            await asyncio.Future()
+
+    def start(self):
+        threading.Thread(target=lambda: self.loop.run_until_complete(self._serve()), daemon=True).start()
+        self.ready.wait(5)
+
+
+def measure(place, orders: int):
+    samples = []
+    for _ in range(orders):
+        start = time.perf_counter()
+        place(category='spot', symbol='BTCUSDT', side='Buy', order_type='Market', qty='0.001')
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'mean': statistics.mean(samples),
+        'p50': samples[len(samples) // 2],
+        'p95': samples[int(len(samples) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк OrderGateway (WebSocket) против REST")
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="Задержка заглушки на одно сообщение")
+    parser.add_argument('--http-port', type=int, default=18080)
+    parser.add_argument('--ws-port', type=int, default=18081)
+    args = parser.parse_args()
+
+    stub = ExchangeStub(args.latency_ms, args.http_port, args.ws_port)
+    stub.start()
+
+    client = BybitClient('bench-key', 'bench-secret', testnet=True)
+    client.base_url = f"http://127.0.0.1:{args.http_port}"
+    # Лимиты не должны влиять на измерение задержки
+    client.rate_limiter = RateLimiter({'market': (1e6, 1e6), 'account': (1e6, 1e6), 'order': (1e6, 1e6)})
+
+    gateway = OrderGateway(client, url=f"ws://127.0.0.1:{args.ws_port}")
+    gateway.start()
+    if not gateway.stream.connected.wait(5):
+        print("Не удалось подключиться к заглушке WebSocket")
+        return
+
+    rest = measure(client.place_order, args.orders)
+    ws = measure(gateway.place_order, args.orders)
+    gateway.stop()
+
+    print(f"Ордеров: {args.orders}, задержка заглушки: {args.latency_ms} мс")
+    print(f"{'мс':10}{'mean':>10}{'p50':>10}{'p95':>10}")
+    for name, stats in (('REST', rest), ('WebSocket', ws)):
+        print(f"{name:10}{stats['mean']:>10.2f}{stats['p50']:>10.2f}{stats['p95']:>10.2f}")
+    print(f"Переходов на REST: {gateway.rest_fallbacks}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальный сервер воспроизведения записанных ответов Bybit (HTTP + WebSocket)
+Отдаёт ответы из журнала BybitClient.start_recording с настраиваемой задержкой
+и внедрением ошибок, чтобы торговый цикл, обучение и GUI можно было гонять
+без сети и с воспроизводимым результатом (--seed).
+
+Запись журнала:
+    client = BybitClient(api_key, api_secret)
+    client.start_recording('data/journals/session.jsonl.gz')
+    stream.journal = client.journal          # сообщения WebSocket в тот же журнал
+
+Воспроизведение:
+    python src/tools/replay_server.py data/journals/session.jsonl.gz --latency-ms 20 --error-rate 0.05
+    client.base_url = "http://127.0.0.1:18090"
+    BybitPublicStream(url="ws://127.0.0.1:18091/v5/public/spot")
+"""
+
+import argparse
+import asyncio
+import copy
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+# Добавляем корневую директорию проекта в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import websockets
+from aiohttp import web
+
+from src.api import json_codec
+from src.api.journal import read_journal
+
+# Ошибки, внедряемые с вероятностью error_rate: (HTTP статус, тело ответа)
+INJECTED_ERRORS = (
+    (503, None),
+    (200, {'retCode': 10006, 'retMsg': 'Too many visits!', 'result': {}}),
+    (200, {'retCode': 10016, 'retMsg': 'Internal server error.', 'result': {}}),
+)
+
+# Ответ на запрос, которого нет в журнале
+MISSING_RESPONSE = {'retCode': 10001, 'retMsg': 'replay: нет записанного ответа', 'result': {}}
+
+
+# Поля тела POST, которые клиент генерирует заново при каждом вызове
+VOLATILE_BODY_KEYS = ('orderLinkId',)
+
+
+def canonical_query(query: str) -> str:
+    """Query string в виде build_query_string: параметры по алфавиту, без URL-кодирования"""
+    return '&'.join(f"{k}={v}" for k, v in sorted(parse_qsl(query, keep_blank_values=True)))
+
+
+def _without_volatile(value):
+    if isinstance(value, dict):
+        return {k: _without_volatile(v) for k, v in sorted(value.items()) if k not in VOLATILE_BODY_KEYS}
+    if isinstance(value, list):
+        return [_without_volatile(v) for v in value]
+    return value
+
+
+def canonical_body(body: str) -> str:
+    """Тело POST без VOLATILE_BODY_KEYS с ключами по алфавиту (не JSON - как есть)"""
+    try:
+        data = json_codec.loads(body)
+    except ValueError:
+        return body
+    return json_codec.dumps_str(_without_volatile(data))
+
+
+def echo_order_link_ids(response, body: str):
+    """Копия записанного ответа с orderLinkId из текущего запроса (ордер или пакет)"""
+    try:
+        request = json_codec.loads(body)
+    except ValueError:
+        return response
+    if not isinstance(request, dict) or not isinstance(response, dict) or \
+            not isinstance(response.get('result'), dict):
+        return response
+    response = copy.deepcopy(response)
+    result = response['result']
+    if isinstance(request.get('request'), list):
+        for item, row in zip(request['request'], result.get('list') or []):
+            if isinstance(item, dict) and isinstance(row, dict) and 'orderLinkId' in item:
+                row['orderLinkId'] = item['orderLinkId']
+    elif 'orderLinkId' in request and 'orderLinkId' in result:
+        result['orderLinkId'] = request['orderLinkId']
+    return response
+
+
+class ReplayServer:
+    """HTTP и WebSocket заглушка биржи поверх журнала ApiJournal
+
+    HTTP ответы ищутся по (метод, endpoint, параметры); тело POST сравнивается
+    без orderLinkId, который клиент генерирует заново, и в ответ подставляется
+    orderLinkId текущего запроса. При loose=True запрос без
+    точного совпадения получает запись того же (метод, endpoint), иначе MISSING_RESPONSE.
+    Несколько записей одного ключа отдаются по кругу в порядке записи.
+    Сообщения WebSocket отдаются по подписанным topics с исходными интервалами,
+    ускоренными в speed раз.
+    """
+
+    def __init__(self, journal_path: str, host: str = '127.0.0.1', http_port: int = 18090,
+                 ws_port: int = 18091, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 recorded_latency: bool = False, error_rate: float = 0.0, speed: float = 1.0,
+                 loop_ws: bool = True, seed: Optional[int] = None, loose: bool = False):
+        """
+        Args:
+            journal_path: Файл журнала (.jsonl или .jsonl.gz)
+            latency_ms: Задержка каждого ответа
+            jitter_ms: Случайная добавка к задержке (0..jitter_ms)
+            recorded_latency: Использовать записанную задержку вместо latency_ms
+            error_rate: Доля HTTP запросов, получающих внедрённую ошибку
+            speed: Ускорение потока WebSocket относительно записи
+            loop_ws: Повторять поток WebSocket с начала по его окончании
+            seed: Зерно генератора для воспроизводимых задержек и ошибок
+            loose: Отвечать записью того же endpoint с другими параметрами,
+                если точной записи нет (учитывается в stats['http_loose'])
+        """
+        self.host = host
+        self.http_port = http_port
+        self.ws_port = ws_port
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.recorded_latency = recorded_latency
+        self.error_rate = error_rate
+        self.speed = speed
+        self.loop_ws = loop_ws
+        self.loose = loose
+        self.random = random.Random(seed)
+
+        self.http_exact: Dict[Tuple[str, str, str], List[Dict]] = defaultdict(list)
+        self.http_by_endpoint: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+        self.ws_messages: Dict[str, List[Tuple[float, Dict]]] = defaultdict(list)
+        self._cursors: Dict[tuple, int] = defaultdict(int)
+
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.stats = {'http_served': 0, 'http_loose': 0, 'http_missing': 0, 'errors_injected': 0, 'ws_messages': 0}
+        self.load(journal_path)
+
+    def load(self, journal_path: str):
+        for event in read_journal(journal_path):
+            if event.get('k') == 'http':
+                query = event.get('q') or ''
+                if event.get('m') == 'GET':
+                    query = canonical_query(query)
+                else:
+                    query = canonical_body(query)
+                self.http_exact[(event['m'], event['e'], query)].append(event)
+                self.http_by_endpoint[(event['m'], event['e'])].append(event)
+            elif event.get('k') == 'ws':
+                self.ws_messages[event.get('u', '')].append((event.get('t', 0.0), event.get('b') or {}))
+
+    def _next(self, key, events: List[Dict]) -> Dict:
+        index = self._cursors[key] % len(events)
+        self._cursors[key] += 1
+        return events[index]
+
+    async def _sleep_latency(self, recorded_ms: Optional[float] = None):
+        delay = self.latency
+        if self.recorded_latency and recorded_ms is not None:
+            delay = recorded_ms / 1000
+        if self.jitter:
+            delay += self.random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    # ---- HTTP ----
+
+    async def _http_handler(self, request: web.Request) -> web.Response:
+        method = request.method
+        endpoint = request.path
+        if endpoint == '/v5/market/time':
+            # Время всегда текущее, иначе подписи клиента будут отклонены
+            await self._sleep_latency()
+            return web.json_response({'retCode': 0, 'retMsg': 'OK', 'result': {
+                'timeSecond': str(int(time.time())), 'timeNano': str(time.time_ns())}},
+                dumps=json_codec.dumps_str)
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.stats['errors_injected'] += 1
+            await self._sleep_latency()
+            status, body = self.random.choice(INJECTED_ERRORS)
+            if body is None:
+                return web.Response(status=status, text='Service Unavailable')
+            return web.json_response(body, status=status, dumps=json_codec.dumps_str)
+
+        raw_body = ''
+        if method == 'GET':
+            query = canonical_query(request.query_string)
+        else:
+            raw_body = await request.text()
+            query = canonical_body(raw_body)
+        exact_key = (method, endpoint, query)
+        events = self.http_exact.get(exact_key)
+        key = exact_key
+        loose = False
+        if not events and self.loose:
+            key = (method, endpoint)
+            events = self.http_by_endpoint.get(key)
+            loose = bool(events)
+        if not events:
+            self.stats['http_missing'] += 1
+            await self._sleep_latency()
+            return web.json_response(MISSING_RESPONSE, dumps=json_codec.dumps_str)
+
+        event = self._next(key, events)
+        self.stats['http_loose' if loose else 'http_served'] += 1
+        await self._sleep_latency(event.get('ms'))
+        body = event.get('b')
+        if raw_body:
+            body = echo_order_link_ids(body, raw_body)
+        if isinstance(body, str):
+            return web.Response(status=event.get('st') or 200, text=body)
+        return web.json_response(body, status=event.get('st') or 200, dumps=json_codec.dumps_str)
+
+    # ---- WebSocket ----
+
+    async def _stream_topics(self, ws, path: str, topics: set):
+        """Записанные сообщения подписанных topics с исходными интервалами"""
+        messages = [(t, m) for t, m in self.ws_messages.get(path, []) if m.get('topic') in topics]
+        if not messages:
+            return
+        while True:
+            previous = messages[0][0]
+            for recorded_at, message in messages:
+                gap = (recorded_at - previous) / self.speed if self.speed > 0 else 0
+                previous = recorded_at
+                if gap > 0:
+                    await asyncio.sleep(gap)
+                await ws.send(json_codec.dumps_str(message))
+                self.stats['ws_messages'] += 1
+            if not self.loop_ws:
+                return
+
+    async def _ws_handler(self, ws):
+        request = getattr(ws, 'request', None)
+        path = getattr(request, 'path', None) or getattr(ws, 'path', '/')
+        path = path.split('?', 1)[0]
+        tasks = []
+        try:
+            async for raw in ws:
+                message = json_codec.loads(raw)
+                op = message.get('op')
+                await self._sleep_latency()
+                if op == 'ping':
+                    await ws.send(json_codec.dumps_str({'op': 'pong', 'req_id': message.get('req_id')}))
+                elif op == 'auth':
+                    await ws.send(json_codec.dumps_str({'op': 'auth', 'success': True, 'retCode': 0, 'retMsg': 'OK'}))
+                elif op in ('subscribe', 'unsubscribe'):
+                    await ws.send(json_codec.dumps_str({'op': op, 'success': True, 'req_id': message.get('req_id')}))
+                    if op == 'subscribe':
+                        tasks.append(asyncio.ensure_future(self._stream_topics(ws, path, set(message.get('args', [])))))
+                elif op in ('order.create', 'order.cancel', 'order.amend'):
+                    args = (message.get('args') or [{}])[0]
+                    await ws.send(json_codec.dumps_str({
+                        'reqId': message.get('reqId'), 'retCode': 0, 'retMsg': 'OK', 'op': op,
+                        'data': {'orderId': f"replay-{self.random.getrandbits(48):012x}",
+                                 'orderLinkId': args.get('orderLinkId', '')}
+                    }))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    # ---- Жизненный цикл ----
+
+    async def serve(self):
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', self._http_handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, self.host, self.http_port).start()
+        async with websockets.serve(self._ws_handler, self.host, self.ws_port):
+            self.ready.set()
+            await asyncio.Future()
+
+    def start(self) -> bool:
+        """Запуск в фоновом потоке (для встраивания в бенчмарки)"""
+        threading.Thread(target=lambda: self.loop.run_until_complete(self.serve()), daemon=True).start()
+        return self.ready.wait(5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воспроизведение записанных ответов Bybit API")
+    parser.add_argument('journal', help="Журнал BybitClient.start_recording (.jsonl или .jsonl.gz)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--http-port', type=int, default=18090)
+    parser.add_argument('--ws-port', type=int, default=18091)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Задержка каждого ответа")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="Случайная добавка к задержке")
+    parser.add_argument('--recorded-latency', action='store_true', help="Использовать записанную задержку")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Доля HTTP ответов с ошибкой (0..1)")
+    parser.add_argument('--speed', type=float, default=1.0, help="Ускорение потока WebSocket")
+    parser.add_argument('--no-loop', action='store_true', help="Не повторять поток WebSocket")
+    parser.add_argument('--seed', type=int, default=None, help="Зерно для воспроизводимых задержек и ошибок")
+    parser.add_argument('--loose', action='store_true',
+                        help="Без точной записи отвечать записью того же endpoint с другими параметрами")
+    args = parser.parse_args()
+
+    server = ReplayServer(
+        args.journal, host=args.host, http_port=args.http_port, ws_port=args.ws_port,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, recorded_latency=args.recorded_latency,
+        error_rate=args.error_rate, speed=args.speed, loop_ws=not args.no_loop, seed=args.seed,
+        loose=args.loose
+    )
+    http_keys = sum(len(v) for v in server.http_exact.values())
+    ws_count = sum(len(v) for v in server.ws_messages.values())
+    print(f"Загружено: {http_keys} HTTP ответов, {ws_count} сообщений WebSocket")
+    print(f"HTTP: http://{args.host}:{args.http_port}  WebSocket: ws://{args.host}:{args.ws_port}/<путь записи>")
+    try:
+        server.loop.run_until_complete(server.serve())
+    except KeyboardInterrupt:
+        print(f"Остановлено. Статистика: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
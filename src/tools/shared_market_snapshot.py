@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Общий для процессов снимок рынка в отображаемом в память файле
+
+Программа тикеров публикует тикеры в колоночную таблицу фиксированного
+размера (market_snapshot.bin в каталоге данных), торговые программы и тренеры
+отображают тот же файл только для чтения. Проверка новой версии - чтение
+нескольких байт заголовка, без обращений к диску и разбора JSON.
+
+Формат файла:
+    заголовок (64 байта): magic, версия формата, seq, версия снимка,
+                          timestamp, число символов, емкость
+    symbols      capacity x S24
+    last_price, high_price, low_price, volume, price_change  capacity x float64
+
+Согласованность обеспечивает seqlock: писатель делает seq нечетным перед
+записью и четным после нее; читатель копирует таблицу и повторяет чтение,
+если seq был нечетным или изменился за время копирования.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+SNAPSHOT_FILE = 'market_snapshot.bin'
+MAGIC = b'BTMS'
+LAYOUT_VERSION = 1
+DEFAULT_CAPACITY = 8192
+SYMBOL_WIDTH = 24
+
+# magic, версия формата, seq, версия снимка, timestamp, число символов, емкость
+HEADER = struct.Struct('<4sIQQdII')
+HEADER_SIZE = 64
+SEQ_OFFSET = 8
+VERSION_OFFSET = 16
+
+# Колонка -> поле записи тикера (формат программы тикеров)
+COLUMNS = {
+    'last_price': 'lastPrice',
+    'high_price': 'highPrice',
+    'low_price': 'lowPrice',
+    'volume': 'volume',
+    'price_change': 'priceChangePercent',
+}
+
+logger = logging.getLogger(__name__)
+
+
+def default_snapshot_path(data_path=None) -> Path:
+    """market_snapshot.bin в каталоге данных программы тикеров"""
+    if data_path is None:
+        data_path = Path.home() / "AppData" / "Local" / "BybitTradingBot" / "data"
+    return Path(data_path) / SNAPSHOT_FILE
+
+
+def _file_size(capacity: int) -> int:
+    return HEADER_SIZE + capacity * (SYMBOL_WIDTH + 8 * len(COLUMNS))
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class SharedMarketSnapshot:
+    """Колоночная таблица тикеров в общем отображаемом файле
+
+    Пример (программа тикеров):
+        snapshot = SharedMarketSnapshot.create(data_path)
+        snapshot.publish(tickers, version)
+    Пример (читатель):
+        snapshot = SharedMarketSnapshot.open(data_path)
+        if snapshot and snapshot.version() != last_version:
+            table = snapshot.read()
+    """
+
+    def __init__(self, path: Path, mm: mmap.mmap, writable: bool):
+        self.path = Path(path)
+        self._mm = mm
+        self.writable = writable
+        _, _, _, _, _, _, self.capacity = HEADER.unpack_from(mm, 0)
+        self._columns = self._map_columns()
+
+    def _map_columns(self) -> Dict[str, np.ndarray]:
+        offset = HEADER_SIZE
+        columns = {'symbols': np.frombuffer(self._mm, dtype=f'S{SYMBOL_WIDTH}',
+                                            count=self.capacity, offset=offset)}
+        offset += self.capacity * SYMBOL_WIDTH
+        for name in COLUMNS:
+            columns[name] = np.frombuffer(self._mm, dtype=np.float64, count=self.capacity, offset=offset)
+            offset += self.capacity * 8
+        return columns
+
+    # ---- Открытие ----
+
+    @classmethod
+    def create(cls, data_path=None, capacity: int = DEFAULT_CAPACITY) -> 'SharedMarketSnapshot':
+        """Открытие файла для записи (существующий файл подходящего формата переиспользуется,
+        чтобы уже отобразившие его читатели продолжали получать обновления)"""
+        path = default_snapshot_path(data_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not cls._is_valid(path):
+            tmp_path = path.with_name(path.name + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.truncate(_file_size(capacity))
+                f.write(HEADER.pack(MAGIC, LAYOUT_VERSION, 0, 0, 0.0, 0, capacity))
+            os.replace(tmp_path, path)
+        with open(path, 'r+b') as f:
+            mm = mmap.mmap(f.fileno(), 0)
+        snapshot = cls(path, mm, writable=True)
+        # Прерванная запись прежнего процесса: seq снова четный
+        seq = snapshot._seq()
+        if seq % 2:
+            struct.pack_into('<Q', mm, SEQ_OFFSET, seq + 1)
+        return snapshot
+
+    @classmethod
+    def open(cls, data_path=None) -> Optional['SharedMarketSnapshot']:
+        """Отображение файла только для чтения (None, если программа тикеров его не создала)"""
+        path = default_snapshot_path(data_path)
+        if not cls._is_valid(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Не удалось отобразить {path}: {e}")
+            return None
+        return cls(path, mm, writable=False)
+
+    @staticmethod
+    def _is_valid(path: Path) -> bool:
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return False
+            magic, layout, _, _, _, _, capacity = HEADER.unpack(header)
+            return (magic == MAGIC and layout == LAYOUT_VERSION and
+                    path.stat().st_size >= _file_size(capacity))
+        except OSError:
+            return False
+
+    def close(self):
+        self._columns = {}
+        self._mm.close()
+
+    # ---- Заголовок ----
+
+    def _seq(self) -> int:
+        return struct.unpack_from('<Q', self._mm, SEQ_OFFSET)[0]
+
+    def version(self) -> int:
+        """Версия опубликованного снимка (0 - еще не публиковался)"""
+        return struct.unpack_from('<Q', self._mm, VERSION_OFFSET)[0]
+
+    # ---- Запись ----
+
+    def publish(self, tickers, version: int, timestamp: Optional[float] = None) -> int:
+        """Публикация тикеров (список записей или словарь symbol -> запись)
+
+        Returns:
+            int: Число опубликованных символов
+        """
+        if not self.writable:
+            raise PermissionError("Снимок рынка открыт только для чтения")
+        if isinstance(tickers, dict):
+            records = [dict(record, symbol=symbol) for symbol, record in tickers.items() if isinstance(record, dict)]
+        else:
+            records = [record for record in tickers or () if isinstance(record, dict) and record.get('symbol')]
+        if len(records) > self.capacity:
+            logger.warning(f"Снимок рынка вмещает {self.capacity} символов из {len(records)}")
+            records = records[:self.capacity]
+        count = len(records)
+
+        symbols = np.array([str(record['symbol']).encode()[:SYMBOL_WIDTH] for record in records],
+                           dtype=f'S{SYMBOL_WIDTH}')
+        values = {name: np.fromiter((_to_float(record.get(field)) for record in records),
+                                    dtype=np.float64, count=count)
+                  for name, field in COLUMNS.items()}
+
+        seq = self._seq()
+        struct.pack_into('<Q', self._mm, SEQ_OFFSET, seq + 1)
+        self._columns['symbols'][:count] = symbols
+        for name, column in values.items():
+            self._columns[name][:count] = column
+        HEADER.pack_into(self._mm, 0, MAGIC, LAYOUT_VERSION, seq + 1, int(version),
+                         float(timestamp if timestamp is not None else time.time()), count, self.capacity)
+        struct.pack_into('<Q', self._mm, SEQ_OFFSET, seq + 2)
+        return count
+
+    # ---- Чтение ----
+
+    def read(self, retries: int = 100) -> Optional[Dict[str, Any]]:
+        """Согласованная копия таблицы
+
+        Returns:
+            dict: version, timestamp, symbols (List[str]) и колонки COLUMNS (np.ndarray)
+                  или None, если снимок не публиковался или запись не завершается
+        """
+        for _ in range(retries):
+            seq = self._seq()
+            if seq % 2:
+                time.sleep(0.0005)
+                continue
+            _, _, _, version, timestamp, count, _ = HEADER.unpack_from(self._mm, 0)
+            symbols = self._columns['symbols'][:count].copy()
+            columns = {name: self._columns[name][:count].copy() for name in COLUMNS}
+            if self._seq() != seq:
+                continue
+            if not version:
+                return None
+            data: Dict[str, Any] = {
+                'version': version,
+                'timestamp': timestamp,
+                'symbols': [symbol.decode() for symbol in symbols],
+            }
+            data.update(columns)
+            return data
+        logger.warning("Снимок рынка не удалось прочитать согласованно")
+        return None
+
+    @staticmethod
+    def to_records(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Записи тикеров в формате программы тикеров из результата read()"""
+        columns = [(field, data[name].tolist()) for name, field in COLUMNS.items()]
+        records = []
+        for i, symbol in enumerate(data['symbols']):
+            record = {'symbol': symbol}
+            for field, values in columns:
+                record[field] = values[i]
+            records.append(record)
+        return records
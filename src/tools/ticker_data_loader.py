@@ -4,10 +4,18 @@
 Модуль для загрузки данных тикеров из файла
 """
 
-import json
 import logging
 import datetime
+import threading
+import time
+from collections.abc import Mapping
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from src.tools.shared_market_snapshot import SharedMarketSnapshot
+from src.tools.ticker_snapshot_store import DELTA_FILE, SNAPSHOT_FILE, load_snapshot
 
 
 logger = logging.getLogger(__name__)
@@ -35,10 +43,23 @@ class TickerDataLoader:
         self.tickers_data = {}
         self.historical_data = {}
         self.last_update_timestamp = None
+        self.version = None
+        # (mtime, размер) файлов снимка и дельты на момент последней загрузки
+        self._file_stamp = None
 
     def get_data_file_path(self) -> Path:
         """Возвращает путь к файлу с сохранёнными данными тикеров."""
-        return self.data_path / 'tickers_data.json'
+        return self.data_path / SNAPSHOT_FILE
+    
+    def _current_file_stamp(self):
+        stamp = []
+        for path in (self.get_data_file_path(), self.data_path / DELTA_FILE):
+            try:
+                stat = path.stat()
+                stamp.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
     
     def load_tickers_data(self):
         """
@@ -55,17 +76,20 @@ class TickerDataLoader:
                 logger.warning(f"Файл с данными тикеров не найден: {data_file}")
                 return None
             
-            with open(data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # Снимок с последней дельтой; свечи читаются из history/ при обращении
+            file_stamp = self._current_file_stamp()
+            data = load_snapshot(self.data_path)
             
             # Проверяем структуру данных
-            if not all(key in data for key in ['timestamp', 'tickers', 'historical_data']):
+            if data is None:
                 logger.error("Некорректная структура данных в файле тикеров")
                 return None
             
             self.tickers_data = data['tickers']
             self.historical_data = data['historical_data']
             self.last_update_timestamp = data['timestamp']
+            self.version = data.get('version')
+            self._file_stamp = file_stamp
             
             # Преобразуем timestamp в читаемый формат для логирования
             update_time = datetime.datetime.fromtimestamp(self.last_update_timestamp)
@@ -75,7 +99,8 @@ class TickerDataLoader:
                 'tickers': self.tickers_data,
                 'historical_data': self.historical_data,
                 'timestamp': self.last_update_timestamp,
-                'update_time': update_time
+                'update_time': update_time,
+                'version': data.get('version')
             }
             
         except Exception as e:
@@ -106,10 +131,13 @@ class TickerDataLoader:
         Args:
             symbol (str, optional): Символ тикера. Если None, возвращаются данные всех тикеров.
         
+        Данные перечитываются, если программа тикеров опубликовала новую версию
+        снимка (изменились файлы снимка или дельты).
+        
         Returns:
             dict: Исторические данные тикера или словарь исторических данных всех тикеров
         """
-        if not self.historical_data:
+        if not self.historical_data or self._current_file_stamp() != self._file_stamp:
             self.load_tickers_data()
         
         if symbol:
@@ -133,3 +161,290 @@ class TickerDataLoader:
         data_age_minutes = (current_time - self.last_update_timestamp) / 60
         
         return data_age_minutes <= max_age_minutes
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class TickerTable:
+    """Тикеры, индексированные по символу, с колоночными массивами
+    
+    Строится один раз на снимок из списка записей (формат программы тикеров)
+    или словаря symbol -> запись. Поиск записи по символу O(1); колонки
+    last_price, volume, price_change (доля за 24ч) выровнены по symbols.
+    Поддерживает `symbol in table`, `table[symbol]`, `table.get(symbol)`,
+    `len(table)` и `table.items()`, как словарь тикеров.
+    """
+    
+    # Колонка -> поля записи по приоритету (формат программы тикеров, затем Bybit API)
+    PRICE_FIELDS = ('lastPrice', 'price')
+    VOLUME_FIELDS = ('volume', 'volume24h')
+    CHANGE_FIELDS = ('priceChangePercent', 'price24hPcnt')
+    
+    def __init__(self, tickers=None):
+        self.records: Dict[str, Dict[str, Any]] = {}
+        if isinstance(tickers, dict):
+            items = ((symbol, record) for symbol, record in tickers.items() if isinstance(record, dict))
+        else:
+            items = ((record.get('symbol'), record) for record in tickers or () if isinstance(record, dict))
+        for symbol, record in items:
+            if symbol:
+                self.records[symbol] = record
+        
+        self.symbols: List[str] = list(self.records)
+        self.index: Dict[str, int] = {symbol: i for i, symbol in enumerate(self.symbols)}
+        records = self.records.values()
+        self.last_price = np.fromiter((self._field(r, self.PRICE_FIELDS) for r in records),
+                                      dtype=np.float64, count=len(self.symbols))
+        self.volume = np.fromiter((self._field(r, self.VOLUME_FIELDS) for r in records),
+                                  dtype=np.float64, count=len(self.symbols))
+        self.price_change = np.fromiter((self._field(r, self.CHANGE_FIELDS) for r in records),
+                                        dtype=np.float64, count=len(self.symbols))
+    
+    @staticmethod
+    def _field(record: Dict[str, Any], fields) -> float:
+        for field in fields:
+            value = record.get(field)
+            if value not in (None, ''):
+                return _to_float(value)
+        return 0.0
+    
+    @classmethod
+    def from_any(cls, tickers) -> 'TickerTable':
+        """Таблица из списка/словаря тикеров (готовая таблица возвращается как есть)"""
+        if isinstance(tickers, cls):
+            return tickers
+        return cls(tickers)
+    
+    def get(self, symbol: str, default=None) -> Optional[Dict[str, Any]]:
+        return self.records.get(symbol, default)
+    
+    def price(self, symbol: str) -> float:
+        """Последняя цена символа (0.0, если символа нет)"""
+        i = self.index.get(symbol)
+        return float(self.last_price[i]) if i is not None else 0.0
+    
+    def __getitem__(self, symbol: str) -> Dict[str, Any]:
+        return self.records[symbol]
+    
+    def __contains__(self, symbol) -> bool:
+        return symbol in self.records
+    
+    def __len__(self) -> int:
+        return len(self.symbols)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.symbols)
+    
+    def keys(self):
+        return self.records.keys()
+    
+    def items(self):
+        return self.records.items()
+
+
+class TickerSnapshot(NamedTuple):
+    """Неизменяемый разобранный снимок tickers_data.json
+    
+    Словари tickers и historical_data общие для всех потоков и не должны
+    изменяться читателями: новый снимок всегда создается заново.
+    """
+    tickers: Dict[str, Any]
+    historical_data: Dict[str, Any]
+    timestamp: float
+    update_time: datetime.datetime
+    version: int
+    table: TickerTable
+
+
+class _DeferredHistory(Mapping):
+    """Свечи снимка, прочитанные из файлов при первом обращении
+    
+    Снимок из общей памяти содержит только тикеры; свечи нужны редко
+    (тренерам) и читаются с диска, только когда к ним обращаются.
+    """
+    
+    def __init__(self, data_path: Path):
+        self.data_path = data_path
+        self._history = None
+    
+    def _load(self):
+        if self._history is None:
+            snapshot = load_snapshot(self.data_path)
+            self._history = snapshot['historical_data'] if snapshot else {}
+        return self._history
+    
+    def __getitem__(self, symbol):
+        return self._load()[symbol]
+    
+    def __iter__(self):
+        return iter(self._load())
+    
+    def __len__(self) -> int:
+        return len(self._load())
+
+
+class TickerSnapshotService:
+    """Общий снимок данных тикеров поверх TickerDataLoader
+    
+    Если программа тикеров публикует снимок рынка в общую память
+    (SharedMarketSnapshot), проверка новой версии - чтение заголовка без
+    обращений к диску, а тикеры копируются из колонок без разбора JSON.
+    Иначе файлы снимка и дельты перечитываются, только если изменились их
+    mtime/размер. Новый объект снимка создается только при новом номере
+    версии; пока данные не менялись, get() отдает тот же объект за O(1).
+    
+    Пример:
+        snapshot = shared_ticker_snapshots().get()
+        if snapshot:
+            price = snapshot.tickers['BTCUSDT']['lastPrice']
+    """
+    
+    # Как часто пытаться отобразить снимок рынка, пока программа тикеров его не создала
+    MARKET_RETRY_INTERVAL = 5.0
+    
+    def __init__(self, loader: Optional[TickerDataLoader] = None, min_check_interval: float = 0.5,
+                 use_shared_memory: bool = True):
+        """
+        Args:
+            loader: Загрузчик файла (по умолчанию TickerDataLoader())
+            min_check_interval: Не чаще чем раз в столько секунд проверять mtime файла
+            use_shared_memory: Читать тикеры из общего снимка рынка, если он есть
+        """
+        self.loader = loader or TickerDataLoader()
+        self.min_check_interval = min_check_interval
+        self.use_shared_memory = use_shared_memory
+        self._lock = threading.Lock()
+        self._snapshot: Optional[TickerSnapshot] = None
+        self._file_stamp = None
+        self._checked_at = 0.0
+        self._market: Optional[SharedMarketSnapshot] = None
+        self._market_checked_at = -self.MARKET_RETRY_INTERVAL
+        self.stats = {'hits': 0, 'checks': 0, 'reloads': 0, 'shared_reloads': 0}
+    
+    def _open_market(self) -> Optional[SharedMarketSnapshot]:
+        if self._market is not None or not self.use_shared_memory:
+            return self._market
+        now = time.monotonic()
+        if now - self._market_checked_at < self.MARKET_RETRY_INTERVAL:
+            return None
+        with self._lock:
+            if self._market is None and now - self._market_checked_at >= self.MARKET_RETRY_INTERVAL:
+                self._market_checked_at = now
+                self._market = SharedMarketSnapshot.open(self.loader.data_path)
+            return self._market
+    
+    def version(self) -> Optional[int]:
+        """Номер версии последних данных без построения снимка (из общей памяти, если она есть)"""
+        market = self._open_market()
+        if market is not None and market.version():
+            return market.version()
+        snapshot = self.get()
+        return snapshot.version if snapshot is not None else None
+    
+    def get(self) -> Optional[TickerSnapshot]:
+        """Текущий снимок или None, если данных нет или они некорректны"""
+        market = self._open_market()
+        if market is not None:
+            version = market.version()
+            if version:
+                snapshot = self._snapshot
+                if snapshot is not None and snapshot.version == version:
+                    self.stats['hits'] += 1
+                    return snapshot
+                return self._reload_from_market(market)
+        
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.min_check_interval:
+            self.stats['hits'] += 1
+            return snapshot
+        return self._reload_from_files()
+    
+    def _reload_from_market(self, market: SharedMarketSnapshot) -> Optional[TickerSnapshot]:
+        with self._lock:
+            data = market.read()
+            if data is None:
+                return self._snapshot
+            current = self._snapshot
+            if current is not None and current.version == data['version']:
+                return current
+            tickers = SharedMarketSnapshot.to_records(data)
+            self.stats['shared_reloads'] += 1
+            self._snapshot = TickerSnapshot(
+                tickers=tickers,
+                historical_data=_DeferredHistory(self.loader.data_path),
+                timestamp=data['timestamp'],
+                update_time=datetime.datetime.fromtimestamp(data['timestamp']),
+                version=data['version'],
+                table=TickerTable(tickers)
+            )
+            return self._snapshot
+    
+    def _reload_from_files(self) -> Optional[TickerSnapshot]:
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self.stats['checks'] += 1
+            data_file = self.loader.get_data_file_path()
+            try:
+                stat = data_file.stat()
+            except OSError:
+                return self._snapshot
+            try:
+                delta_stat = data_file.with_name(DELTA_FILE).stat()
+                delta_stamp = (delta_stat.st_mtime_ns, delta_stat.st_size)
+            except OSError:
+                delta_stamp = None
+            file_stamp = (stat.st_mtime_ns, stat.st_size, delta_stamp)
+            if file_stamp == self._file_stamp:
+                self.stats['hits'] += 1
+                return self._snapshot
+            
+            data = self.loader.load_tickers_data()
+            if data is None:
+                return self._snapshot
+            self._file_stamp = file_stamp
+            
+            current = self._snapshot
+            version = data.get('version')
+            if current is not None and version is not None and version == current.version:
+                # Файл перезаписан без изменения данных
+                return current
+            if version is None:
+                version = current.version + 1 if current is not None else 1
+            
+            self.stats['reloads'] += 1
+            self._snapshot = TickerSnapshot(
+                tickers=data['tickers'],
+                historical_data=data['historical_data'],
+                timestamp=data['timestamp'],
+                update_time=data['update_time'],
+                version=version,
+                table=TickerTable(data['tickers'])
+            )
+            return self._snapshot
+    
+    def get_tickers(self) -> TickerTable:
+        """Таблица тикеров текущего снимка (пустая, если данных нет)"""
+        snapshot = self.get()
+        return snapshot.table if snapshot is not None else TickerTable()
+
+
+_shared_services: Dict[Optional[str], TickerSnapshotService] = {}
+_shared_services_lock = threading.Lock()
+
+
+def shared_ticker_snapshots(data_path=None) -> TickerSnapshotService:
+    """Общий для процесса сервис снимков для директории данных data_path"""
+    key = str(data_path) if data_path is not None else None
+    service = _shared_services.get(key)
+    if service is not None:
+        return service
+    with _shared_services_lock:
+        service = _shared_services.get(key)
+        if service is None:
+            service = _shared_services[key] = TickerSnapshotService(TickerDataLoader(data_path))
+        return service
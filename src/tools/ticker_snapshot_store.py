@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Версионированный снимок данных тикеров для обмена между процессами
+
+Файлы в каталоге данных:
+    tickers_data.json   - полный снимок {'timestamp', 'version', 'tickers', 'history'},
+                          history: symbol -> имя файла свечей в history/
+    tickers_delta.json  - изменения тикеров относительно полного снимка base_version
+                          {'version', 'base_version', 'timestamp', 'changed', 'removed', 'history'}
+                          (накопительные: читателю нужны только снимок и последняя дельта)
+    history/{symbol}.v{N}.json - свечи символа; новый файл пишется, только если они изменились
+
+Каждый файл пишется во временный и переименовывается (os.replace), поэтому
+читатель всегда видит целый файл. Номер версии монотонно растет и
+переживает перезапуск программы тикеров.
+"""
+
+import datetime
+import hashlib
+import logging
+import os
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.api import json_codec
+
+SNAPSHOT_FILE = 'tickers_data.json'
+DELTA_FILE = 'tickers_delta.json'
+HISTORY_DIR = 'history'
+
+logger = logging.getLogger(__name__)
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _index_tickers(tickers) -> Dict[str, Dict[str, Any]]:
+    """symbol -> запись для списка записей или словаря тикеров"""
+    if isinstance(tickers, dict):
+        return {symbol: record for symbol, record in tickers.items() if isinstance(record, dict)}
+    return {record['symbol']: record for record in tickers or ()
+            if isinstance(record, dict) and record.get('symbol')}
+
+
+class HistoryFiles(Mapping):
+    """Свечи по символам, читаемые из history/ при первом обращении
+
+    Если файл снимка уже заменен и удален программой тикеров, свечи
+    читаются из файла текущей версии снимка.
+    """
+
+    # Сколько раз искать файл текущей версии, если и он успел смениться
+    MAX_RELOCATIONS = 3
+
+    def __init__(self, directory: Path, files: Dict[str, str]):
+        self.directory = Path(directory)
+        self.files = dict(files)
+        self._loaded: Dict[str, Any] = {}
+
+    def __getitem__(self, symbol: str):
+        if symbol in self._loaded:
+            return self._loaded[symbol]
+        file_name = self.files[symbol]
+        for _ in range(self.MAX_RELOCATIONS + 1):
+            try:
+                klines = json_codec.load_file(self.directory / file_name)
+                break
+            except FileNotFoundError:
+                current = current_history_files(self.directory.parent).get(symbol)
+                if not current or current == file_name:
+                    logger.warning(f"Файл свечей {symbol} {file_name} не найден")
+                    return None
+                file_name = current
+            except (OSError, ValueError) as e:
+                logger.warning(f"Не удалось прочитать свечи {symbol} из {file_name}: {e}")
+                return None
+        else:
+            logger.warning(f"Свечи {symbol} заменяются быстрее, чем читаются")
+            return None
+        self.files[symbol] = file_name
+        self._loaded[symbol] = klines
+        return klines
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.files)
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+
+def _read_json(path: Path) -> Optional[Dict]:
+    try:
+        data = json_codec.load_file(path)
+    except FileNotFoundError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def current_history_files(data_path) -> Dict[str, str]:
+    """symbol -> файл свечей текущей версии снимка (с последней дельтой)"""
+    data_path = Path(data_path)
+    try:
+        data = _read_json(data_path / SNAPSHOT_FILE) or {}
+        delta = _read_json(data_path / DELTA_FILE) or {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Не удалось прочитать снимок тикеров: {e}")
+        return {}
+    files = dict(data.get('history') or {})
+    if data.get('version') is not None and delta.get('base_version') == data.get('version'):
+        files.update(delta.get('history') or {})
+    return files
+
+
+def _apply_delta(tickers, delta: Dict) -> List[Dict[str, Any]]:
+    """Список тикеров снимка с примененной дельтой (порядок снимка, новые - в конце)"""
+    records = _index_tickers(tickers)
+    for symbol in delta.get('removed', ()):
+        records.pop(symbol, None)
+    for record in delta.get('changed', ()):
+        records[record['symbol']] = record
+    return list(records.values())
+
+
+def load_snapshot(data_path) -> Optional[Dict[str, Any]]:
+    """Согласованный снимок каталога данных (с последней дельтой)
+
+    Returns:
+        dict: timestamp, version, tickers, historical_data (Mapping symbol -> свечи)
+              или None, если файла снимка нет или его структура некорректна
+    """
+    data_path = Path(data_path)
+    data = _read_json(data_path / SNAPSHOT_FILE)
+    if data is None or not all(key in data for key in ('timestamp', 'tickers')):
+        return None
+
+    tickers = data['tickers']
+    timestamp = data['timestamp']
+    version = data.get('version')
+    if 'history' in data:
+        history = dict(data['history'])
+    elif 'historical_data' in data:
+        # Прежний формат: свечи внутри файла снимка
+        history = None
+    else:
+        return None
+
+    delta = _read_json(data_path / DELTA_FILE) if version is not None else None
+    if delta and delta.get('base_version') == version and delta.get('version', 0) > version:
+        tickers = _apply_delta(tickers, delta)
+        timestamp = delta.get('timestamp', timestamp)
+        version = delta['version']
+        if history is not None:
+            history.update(delta.get('history', {}))
+
+    return {
+        'timestamp': timestamp,
+        'version': version,
+        'tickers': tickers,
+        'historical_data': (HistoryFiles(data_path / HISTORY_DIR, history) if history is not None
+                            else data['historical_data'])
+    }
+
+
+class TickerSnapshotWriter:
+    """Атомарная версионированная запись данных тикеров программой тикеров
+
+    Пример:
+        writer = TickerSnapshotWriter(data_path, publish_deltas=True)
+        saved = writer.load()                  # при запуске: данные и состояние с диска
+        version = writer.publish(tickers, historical_data)
+    """
+
+    def __init__(self, data_path, publish_deltas: bool = False, full_every: int = 20,
+                 max_delta_ratio: float = 0.5):
+        """
+        Args:
+            data_path: Каталог данных
+            publish_deltas: Публиковать изменения тикеров в tickers_delta.json
+                вместо полной перезаписи снимка
+            full_every: Полный снимок не реже чем через столько дельт
+            max_delta_ratio: Полный снимок, если изменилось больше этой доли тикеров
+        """
+        self.data_path = Path(data_path)
+        self.history_path = self.data_path / HISTORY_DIR
+        self.history_path.mkdir(parents=True, exist_ok=True)
+        self.publish_deltas = publish_deltas
+        self.full_every = full_every
+        self.max_delta_ratio = max_delta_ratio
+        self._lock = threading.Lock()
+
+        self.version = 0
+        self._history_files: Dict[str, str] = {}
+        self._history_digests: Dict[str, bytes] = {}
+        self._base_tickers: Optional[Dict[str, Dict[str, Any]]] = None
+        self._base_version: Optional[int] = None
+        self._deltas_since_full = 0
+        self._stale_files: List[str] = []
+        self.stats = {'full_writes': 0, 'delta_writes': 0, 'history_writes': 0, 'bytes_written': 0}
+        self._read_state()
+
+    def _read_state(self):
+        """Номер версии и файлы свечей из ранее записанного снимка"""
+        try:
+            data = _read_json(self.data_path / SNAPSHOT_FILE) or {}
+            delta = _read_json(self.data_path / DELTA_FILE) or {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать предыдущий снимок тикеров: {e}")
+            return
+        self.version = max(int(data.get('version') or 0), int(delta.get('version') or 0))
+        self._history_files = dict(data.get('history') or {})
+        if delta.get('base_version') == data.get('version'):
+            self._history_files.update(delta.get('history') or {})
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Снимок с диска со всеми свечами в памяти (для программы тикеров при запуске)
+
+        Запоминает отпечатки прочитанных свечей, чтобы следующая публикация
+        не переписывала неизменившиеся файлы.
+        """
+        snapshot = load_snapshot(self.data_path)
+        if snapshot is None:
+            return None
+        historical_data = {}
+        for symbol in snapshot['historical_data']:
+            klines = snapshot['historical_data'][symbol]
+            if klines is not None:
+                historical_data[symbol] = klines
+        with self._lock:
+            for symbol, klines in historical_data.items():
+                if symbol in self._history_files:
+                    self._history_digests[symbol] = self._digest(json_codec.dumps(klines, default=str))
+        snapshot['historical_data'] = historical_data
+        return snapshot
+
+    @staticmethod
+    def _digest(data: bytes) -> bytes:
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def _write(self, path: Path, data: bytes):
+        _write_atomic(path, data)
+        self.stats['bytes_written'] += len(data)
+
+    def _write_history(self, historical_data, version: int) -> Dict[str, str]:
+        """Запись свечей изменившихся символов; возвращает symbol -> новый файл"""
+        changed = {}
+        for symbol, klines in (historical_data or {}).items():
+            data = json_codec.dumps(klines, default=str)
+            digest = self._digest(data)
+            if self._history_digests.get(symbol) == digest and symbol in self._history_files:
+                continue
+            file_name = f"{symbol}.v{version}.json"
+            self._write(self.history_path / file_name, data)
+            self.stats['history_writes'] += 1
+            previous = self._history_files.get(symbol)
+            if previous and previous != file_name:
+                self._stale_files.append(previous)
+            self._history_files[symbol] = file_name
+            self._history_digests[symbol] = digest
+            changed[symbol] = file_name
+        return changed
+
+    def _remove_stale(self, files: List[str]):
+        for file_name in files:
+            try:
+                (self.history_path / file_name).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.debug(f"Файл свечей {file_name} пока занят: {e}")
+
+    def publish(self, tickers, historical_data) -> int:
+        """Публикация тикеров и свечей новой версией
+
+        Returns:
+            int: Номер опубликованной версии
+        """
+        with self._lock:
+            # Файлы, замененные прошлой публикацией, удаляются с задержкой в одну
+            # версию: читатель старого снимка успевает дочитать свечи
+            stale, self._stale_files = self._stale_files, []
+            version = self.version + 1
+            timestamp = datetime.datetime.now().timestamp()
+            changed_history = self._write_history(historical_data, version)
+            records = _index_tickers(tickers)
+
+            if self.publish_deltas and self._base_tickers is not None and self._deltas_since_full < self.full_every:
+                changed = [record for symbol, record in records.items()
+                           if self._base_tickers.get(symbol) != record]
+                removed = [symbol for symbol in self._base_tickers if symbol not in records]
+                if len(changed) + len(removed) <= self.max_delta_ratio * max(1, len(records)):
+                    delta = {
+                        'version': version,
+                        'base_version': self._base_version,
+                        'timestamp': timestamp,
+                        'changed': changed,
+                        'removed': removed,
+                        'history': dict(self._history_files)
+                    }
+                    self._write(self.data_path / DELTA_FILE, json_codec.dumps(delta, default=str))
+                    self.stats['delta_writes'] += 1
+                    self._deltas_since_full += 1
+                    self.version = version
+                    self._remove_stale(stale)
+                    return version
+
+            snapshot = {
+                'timestamp': timestamp,
+                'version': version,
+                'tickers': tickers,
+                'history': dict(self._history_files)
+            }
+            self._write(self.data_path / SNAPSHOT_FILE, json_codec.dumps(snapshot, default=str))
+            self.stats['full_writes'] += 1
+            # Дельта относится к прежнему снимку и читателями уже игнорируется
+            try:
+                (self.data_path / DELTA_FILE).unlink()
+            except OSError:
+                pass
+            self._base_tickers = records
+            self._base_version = version
+            self._deltas_since_full = 0
+            self.version = version
+            if changed_history:
+                logger.debug(f"Обновлены свечи {len(changed_history)} символов")
+            self._remove_stale(stale)
+            return version
@@ -4,7 +4,6 @@
 Модуль для просмотра тикеров Bybit
 """
 
-import json
 import time
 import logging
 import datetime
@@ -16,6 +15,10 @@ from pathlib import Path
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
+from src.api import json_codec
+from src.tools.shared_market_snapshot import SharedMarketSnapshot
+from src.tools.ticker_snapshot_store import TickerSnapshotWriter
+
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
@@ -31,6 +34,13 @@ class TickerViewerApp:
         # Путь для сохранения данных
         self.data_path = Path.home() / "AppData" / "Local" / "BybitTradingBot" / "data"
         self.data_path.mkdir(parents=True, exist_ok=True)
+        self.snapshot_writer = TickerSnapshotWriter(self.data_path, publish_deltas=True)
+        # Снимок рынка в общей памяти для торговых программ и тренеров
+        try:
+            self.market_snapshot = SharedMarketSnapshot.create(self.data_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Снимок рынка в общей памяти недоступен: {e}")
+            self.market_snapshot = None
         
         # Данные тикеров
         self.all_tickers = []
@@ -163,19 +173,12 @@ class TickerViewerApp:
     def load_saved_data(self):
         """Загрузка сохраненных данных тикеров"""
         try:
-            data_file = self.data_path / 'tickers_data.json'
+            data = self.snapshot_writer.load()
             
-            if not data_file.exists():
+            if data is None:
                 logger.info("Файл с данными тикеров не найден")
                 return
             
-            with open(data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if not all(key in data for key in ['timestamp', 'tickers', 'historical_data']):
-                logger.error("Некорректная структура данных в файле тикеров")
-                return
-            
             self.tickers_data = data['tickers']
             self.historical_data = data['historical_data']
             last_update = datetime.datetime.fromtimestamp(data['timestamp'])
@@ -192,20 +195,13 @@ class TickerViewerApp:
     def save_tickers_data(self):
         """Сохранение данных тикеров в файл для использования основной программой"""
         try:
-            data_path = self.data_path / 'tickers_data.json'
-            
-            # Подготовка данных для сохранения
-            save_data = {
-                'timestamp': datetime.datetime.now().timestamp(),
-                'tickers': self.tickers_data,
-                'historical_data': self.historical_data
-            }
-            
-            # Сохранение данных в файл
-            with open(data_path, 'w', encoding='utf-8') as f:
-                json.dump(save_data, f, indent=2, default=str)
+            # Атомарная публикация новой версии: свечи пишутся только для изменившихся
+            # символов, тикеры - полным снимком или дельтой
+            version = self.snapshot_writer.publish(self.tickers_data, dict(self.historical_data))
+            if self.market_snapshot is not None:
+                self.market_snapshot.publish(self.tickers_data, version)
             
-            logger.info(f"Данные тикеров сохранены в {data_path}")
+            logger.info(f"Данные тикеров сохранены в {self.data_path} (версия {version})")
             return True
         except Exception as e:
             logger.error(f"Ошибка при сохранении данных тикеров: {e}")
@@ -286,7 +282,7 @@ class TickerViewerApp:
                 logger.error(f"Ошибка API: статус {response.status_code}")
                 return None
                 
-            data = response.json()
+            data = json_codec.loads(response.content)
             
             if data.get("retCode") != 0:
                 logger.error(f"Ошибка API: {data.get('retMsg')}")
@@ -450,7 +446,7 @@ class TickerViewerApp:
                 logger.error(f"Ошибка API исторических данных: статус {response.status_code}")
                 return {"symbol": symbol, "error": f"Ошибка API: статус {response.status_code}"}
                 
-            data = response.json()
+            data = json_codec.loads(response.content)
             
             if data.get("retCode") != 0:
                 logger.error(f"Ошибка API исторических данных: {data.get('retMsg')}")
@@ -7,7 +7,6 @@
 
 import sys
 import os
-import json
 import pickle
 import time
 import threading
@@ -16,6 +15,8 @@ from typing import Dict, List, Optional, Any
 from pathlib import Path
 import logging
 
+import numpy as np
+
 # Настройка логирования на DEBUG уровень
 logging.basicConfig(
     level=logging.DEBUG,
@@ -49,6 +50,13 @@ except ImportError as e:
 # Импорт API клиента
 try:
     from api.bybit_client import BybitClient
+    from api.private_stream import BybitPrivateStream
+    from api.order_gateway import OrderGateway
+    from api.instrument_registry import InstrumentRegistry
+    from api.resilience import CircuitOpenError
+    from api import json_codec
+    from database.db_manager import DatabaseManager
+    from src.tools.ticker_data_loader import TickerTable, shared_ticker_snapshots
     from config import get_api_credentials
     import config
 except ImportError as e:
@@ -88,10 +96,10 @@ class DataCollector(QThread):
     def __init__(self):
         super().__init__()
         self.running = False
-        # Используем TickerDataLoader для получения правильного пути
-        from src.tools.ticker_data_loader import TickerDataLoader
-        ticker_loader = TickerDataLoader()
-        self.ticker_data_path = ticker_loader.get_data_file_path()
+        # Общий для процесса снимок данных тикеров (файл разбирается только при изменении)
+        self.ticker_snapshots = shared_ticker_snapshots()
+        self.ticker_data_path = self.ticker_snapshots.loader.get_data_file_path()
+        self._ticker_version = None
         self.models_path = Path("C:/Users/vlastelin8/Desktop/trade/crypto/src/strategies/models")
         self.mutex = QMutex()
         
@@ -124,25 +132,23 @@ class DataCollector(QThread):
                 self.log_message.emit(f"❌ Ошибка сбора данных: {e}")
                 time.sleep(10)
     
-    def load_ticker_data(self) -> Dict:
-        """Загрузка данных тикеров только через API"""
+    def load_ticker_data(self) -> TickerTable:
+        """Данные тикеров из общего снимка (файл перечитывается только при изменении)"""
         try:
-            # Используем только TickerDataLoader для получения реальных данных через API
-            from src.tools.ticker_data_loader import TickerDataLoader
-            ticker_loader = TickerDataLoader()
-            ticker_data = ticker_loader.load_tickers_data()
-            
-            if ticker_data and 'tickers' in ticker_data:
-                # Возвращаем только данные тикеров
-                tickers = ticker_data['tickers']
-                self.log_message.emit(f"✅ Загружены реальные данные тикеров через API. Последнее обновление: {ticker_data['update_time']}")
-                return tickers
+            snapshot = self.ticker_snapshots.get()
+            
+            if snapshot is not None:
+                # Таблица тикеров снимка, индексированная по символу (общая, не изменять)
+                if snapshot.version != self._ticker_version:
+                    self._ticker_version = snapshot.version
+                    self.log_message.emit(f"✅ Загружены реальные данные тикеров через API. Последнее обновление: {snapshot.update_time}")
+                return snapshot.table
             else:
                 self.log_message.emit("❌ Не удалось получить данные тикеров через API")
-                return {}
+                return TickerTable()
         except Exception as e:
             self.log_message.emit(f"❌ Ошибка загрузки данных тикеров через API: {e}")
-            return {}
+            return TickerTable()
     
     def load_ml_data(self) -> Dict:
         """Загрузка данных нейросети"""
@@ -156,10 +162,10 @@ class DataCollector(QThread):
                     with open(performance_file, 'r', encoding='utf-8') as f:
                         content = f.read().strip()
                         if content:  # Проверяем, что файл не пустой
-                            ml_data['performance'] = json.loads(content)
+                            ml_data['performance'] = json_codec.loads(content)
                         else:
                             self.log_message.emit(f"⚠️ Файл {performance_file.name} пустой")
-                except json.JSONDecodeError as e:
+                except ValueError as e:
                     self.log_message.emit(f"⚠️ Ошибка JSON в {performance_file.name}: {e}")
             
             # Загружаем состояние обучения
@@ -169,10 +175,10 @@ class DataCollector(QThread):
                     with open(training_file, 'r', encoding='utf-8') as f:
                         content = f.read().strip()
                         if content:  # Проверяем, что файл не пустой
-                            ml_data['training_state'] = json.loads(content)
+                            ml_data['training_state'] = json_codec.loads(content)
                         else:
                             self.log_message.emit(f"⚠️ Файл {training_file.name} пустой")
-                except json.JSONDecodeError as e:
+                except ValueError as e:
                     self.log_message.emit(f"⚠️ Ошибка JSON в {training_file.name}: {e}")
             
             return ml_data
@@ -199,18 +205,10 @@ class SignalGenerator:
         signals = []
         
         try:
-            ticker_data = data.get('ticker_data', {})
+            # Таблица по символу строится один раз на проход (готовая таблица снимка не копируется)
+            ticker_data = self.get_ticker_table(data.get('ticker_data', {}))
             ml_data = data.get('ml_data', {})
             
-            # Отладочная информация о структуре данных
-            self.logger.info(f"🔍 Тип ticker_data: {type(ticker_data)}")
-            if isinstance(ticker_data, dict):
-                self.logger.info(f"🔍 Ключи ticker_data: {list(ticker_data.keys())[:5]}")  # Первые 5 ключей
-            elif isinstance(ticker_data, list):
-                self.logger.info(f"🔍 ticker_data - список из {len(ticker_data)} элементов")
-                if ticker_data:
-                    self.logger.info(f"🔍 Первый элемент: {type(ticker_data[0])}")
-            
             self.logger.info(f"🔍 Генерация сигналов: ticker_data={len(ticker_data)} символов, ml_data={len(ml_data)} записей")
             
             # Получаем список USDT пар для анализа
@@ -240,39 +238,23 @@ class SignalGenerator:
             self.logger.error(f"Ошибка генерации сигналов: {e}")
             return []
     
+    @staticmethod
+    def get_ticker_table(ticker_data) -> TickerTable:
+        """Тикеры в виде таблицы по символу (список, словарь или {'tickers': ...})"""
+        if isinstance(ticker_data, dict) and isinstance(ticker_data.get('tickers'), (list, dict)):
+            ticker_data = ticker_data['tickers']
+        return TickerTable.from_any(ticker_data)
+    
     def get_usdt_pairs(self, ticker_data) -> List[str]:
         """Получение списка USDT торговых пар с активным движением цены"""
-        pairs = []
-        active_pairs = []
-        
-        # Если ticker_data - это список словарей (как из TickerDataLoader)
-        if isinstance(ticker_data, list):
-            for ticker in ticker_data:
-                if isinstance(ticker, dict) and 'symbol' in ticker:
-                    symbol = ticker['symbol']
-                    if (symbol.endswith('USDT') and 
-                        symbol != 'USDT' and 
-                        symbol not in self.banned_symbols):
-                        pairs.append(symbol)
-                        # Проверяем активность символа (есть ли изменение цены)
-                        price_change = float(ticker.get('price24hPcnt', 0))
-                        volume = float(ticker.get('volume24h', 0))
-                        if abs(price_change) > 0.0001 or volume > 1000:  # Активные символы
-                            active_pairs.append(symbol)
-        # Если ticker_data - это словарь
-        elif isinstance(ticker_data, dict):
-            # Получаем все USDT пары из тикеров
-            tickers = ticker_data.get('tickers', ticker_data)
-            for symbol, ticker_info in tickers.items():
-                if (symbol.endswith('USDT') and 
-                    symbol != 'USDT' and 
-                    symbol not in self.banned_symbols):
-                    pairs.append(symbol)
-                    # Проверяем активность символа
-                    price_change = float(ticker_info.get('price24hPcnt', 0))
-                    volume = float(ticker_info.get('volume24h', 0))
-                    if abs(price_change) > 0.0001 or volume > 1000:  # Активные символы
-                        active_pairs.append(symbol)
+        table = self.get_ticker_table(ticker_data)
+        banned = set(self.banned_symbols)
+        pairs = [symbol for symbol in table.symbols
+                 if symbol.endswith('USDT') and symbol != 'USDT' and symbol not in banned]
+        
+        # Активные символы (есть изменение цены или объем) - по колонкам таблицы
+        active_mask = (np.abs(table.price_change) > 0.0001) | (table.volume > 1000)
+        active_pairs = [symbol for symbol in pairs if active_mask[table.index[symbol]]]
         
         # Приоритет активным символам, но добавляем популярные как резерв
         popular_pairs = [
@@ -302,29 +284,19 @@ class SignalGenerator:
     def analyze_symbol(self, symbol: str, ticker_data, ml_data: Dict, portfolio: Dict) -> Optional[TradingSignal]:
         """Анализ конкретного символа для генерации сигнала"""
         try:
-            # Получаем данные по символу
-            symbol_ticker = {}
-            
-            # Если ticker_data - это список словарей
-            if isinstance(ticker_data, list):
-                for ticker in ticker_data:
-                    if isinstance(ticker, dict) and ticker.get('symbol') == symbol:
-                        symbol_ticker = ticker
-                        break
-            # Если ticker_data - это словарь
-            elif isinstance(ticker_data, dict):
-                symbol_ticker = ticker_data.get(symbol, {})
-            if not symbol_ticker:
+            # Получаем данные по символу (O(1) по индексу таблицы)
+            table = self.get_ticker_table(ticker_data)
+            row = table.index.get(symbol)
+            if row is None:
                 return None
             
             # Получаем текущую цену
-            current_price = float(symbol_ticker.get('lastPrice', 0))
+            current_price = float(table.last_price[row])
             if current_price <= 0:
                 return None
             
-            # Получаем изменения цены (используем правильное поле от Bybit API)
-            # Исправляем поле для получения изменения цены - используем priceChangePercent
-            price_change_24h = float(symbol_ticker.get('priceChangePercent', 0))
+            # Получаем изменения цены (priceChangePercent программы тикеров или price24hPcnt API)
+            price_change_24h = float(table.price_change[row])
             
             # Получаем данные ML для символа
             ml_performance = ml_data.get('performance', {}).get(symbol, {})
@@ -426,7 +398,15 @@ class TradingEngine(QThread):
         self.trading_enabled = trading_enabled  # Флаг включения торговли
         self.signals_queue = []
         self.portfolio = {}
+        self.portfolio_stream = None  # Приватный WebSocket поток с актуальным балансом
+        self.order_gateway = None  # Отправка ордеров через WebSocket Trade API с переходом на REST
         self.logger = logging.getLogger(__name__)
+        # Общий для процесса снимок данных тикеров (файл разбирается только при изменении)
+        self.ticker_snapshots = shared_ticker_snapshots()
+        self._ticker_version = None
+        
+        # Параметры инструментов (qtyStep, minOrderQty, minOrderAmt) из памяти без запросов к API
+        self.instrument_registry = self.create_instrument_registry()
         
         # Централизованный список проблемных символов для исключения из торговли
         self.banned_symbols = [
@@ -467,6 +447,12 @@ class TradingEngine(QThread):
         # Инициализируем генератор сигналов
         signal_generator = SignalGenerator(self.logger, self.banned_symbols)
         
+        self.start_instrument_registry()
+        self.start_portfolio_stream()
+        self.start_order_gateway()
+        # Сводка задержек и ошибок API по endpoint раз в минуту
+        self.bybit_client.metrics.start_periodic_log(60)
+        
         while self.running:
             try:
                 # Обновляем портфолио
@@ -499,11 +485,16 @@ class TradingEngine(QThread):
                 signals_processed = 0
                 max_signals_per_iteration = 10
                 
+                batch = []
                 while self.signals_queue and signals_processed < max_signals_per_iteration:
-                    signal = self.signals_queue.pop(0)
-                    self.process_signal(signal)
+                    batch.append(self.signals_queue.pop(0))
                     signals_processed += 1
                 
+                if len(batch) > 1:
+                    self.process_signals_batch(batch)
+                elif batch:
+                    self.process_signal(batch[0])
+                
                 if signals_processed > 0:
                     self.log_message.emit(f"🔄 Обработано {signals_processed} сигналов, осталось в очереди: {len(self.signals_queue)}")
                 
@@ -516,8 +507,97 @@ class TradingEngine(QThread):
                 self.log_message.emit(f"❌ Ошибка в торговом цикле: {e}")
                 time.sleep(5)
         
+        self.stop_portfolio_stream()
+        self.stop_order_gateway()
+        self.stop_instrument_registry()
+        self.bybit_client.metrics.stop_periodic_log()
         self.status_changed.emit("🔴 Торговля остановлена")
     
+    def create_instrument_registry(self):
+        """Реестр инструментов с быстрым стартом из таблицы available_symbols"""
+        try:
+            try:
+                db_manager = DatabaseManager()
+            except Exception as e:
+                db_manager = None
+                self.logger.warning(f"БД недоступна, реестр инструментов работает только в памяти: {e}")
+            registry = InstrumentRegistry(self.bybit_client, db_manager=db_manager)
+            registry.load_from_db()
+            return registry
+        except Exception as e:
+            self.logger.error(f"Ошибка создания реестра инструментов: {e}")
+            return None
+    
+    def start_instrument_registry(self):
+        """Пакетная загрузка инструментов (если БД пуста) и запуск фонового обновления"""
+        registry = self.instrument_registry
+        if registry is None:
+            return
+        if not registry.is_loaded():
+            self.log_message.emit("📥 Загрузка параметров инструментов spot/linear...")
+            registry.refresh()
+        registry.start()
+        self.log_message.emit(f"✅ Реестр инструментов: {registry.stats()['instruments']} инструментов в памяти")
+    
+    def stop_instrument_registry(self):
+        if self.instrument_registry is not None:
+            self.instrument_registry.stop()
+    
+    def start_portfolio_stream(self):
+        """Запуск приватного WebSocket потока; REST остаётся для снимка и сверки"""
+        if self.portfolio_stream is not None:
+            return
+        try:
+            self.portfolio_stream = BybitPrivateStream(
+                self.bybit_client.api_key,
+                self.bybit_client.api_secret,
+                testnet=self.bybit_client.testnet,
+                rest_client=self.bybit_client
+            )
+            self.portfolio_stream.start()
+            self.log_message.emit("✅ Приватный WebSocket поток портфеля запущен")
+        except Exception as e:
+            self.portfolio_stream = None
+            self.log_message.emit(f"⚠️ Приватный WebSocket поток недоступен, баланс запрашивается через REST: {e}")
+    
+    def stop_portfolio_stream(self):
+        """Остановка приватного WebSocket потока"""
+        if self.portfolio_stream is not None:
+            self.portfolio_stream.stop(timeout=1.0)
+            self.portfolio_stream = None
+    
+    def start_order_gateway(self):
+        """Запуск сессии WebSocket Trade API для размещения ордеров"""
+        if self.order_gateway is not None:
+            return
+        try:
+            self.order_gateway = OrderGateway(self.bybit_client)
+            self.order_gateway.start()
+            self.log_message.emit("✅ WebSocket Trade API для ордеров запущен")
+        except Exception as e:
+            self.order_gateway = None
+            self.log_message.emit(f"⚠️ WebSocket Trade API недоступен, ордера отправляются через REST: {e}")
+    
+    def stop_order_gateway(self):
+        """Остановка сессии WebSocket Trade API"""
+        if self.order_gateway is not None:
+            self.order_gateway.stop()
+            self.order_gateway = None
+    
+    def place_order(self, **kwargs) -> dict:
+        """Размещение ордера через WebSocket Trade API (при недоступности - через REST)"""
+        gateway = self.order_gateway
+        if gateway is not None:
+            return gateway.place_order(**kwargs)
+        return self.bybit_client.place_order(**kwargs)
+    
+    def get_balance_flat(self) -> dict:
+        """Баланс из живого кэша портфеля, а при его отсутствии - через REST"""
+        stream = self.portfolio_stream
+        if stream is not None and stream.connected.is_set() and stream.cache.is_ready():
+            return stream.cache.get_flat_balance()
+        return self.bybit_client.get_unified_balance_flat()
+    
     def get_significant_positions(self) -> int:
         """
         Подсчет открытых позиций с игнорированием микроскопических остатков (< $5 USDT)
@@ -537,15 +617,16 @@ class TradingEngine(QThread):
                 symbol = f"{coin}USDT"
                 price = 0
                 
-                if ticker_data and symbol in ticker_data:
-                    price = float(ticker_data[symbol].get('lastPrice', 0))
+                if ticker_data:
+                    price = ticker_data.price(symbol)
                 
                 # Если цена не найдена в ticker_data, пытаемся получить через API
                 if price <= 0:
                     try:
+                        # get_tickers возвращает содержимое result: {'category': ..., 'list': [...]}
                         ticker_info = self.bybit_client.get_tickers(category='spot', symbol=symbol)
-                        if ticker_info and 'result' in ticker_info and 'list' in ticker_info['result']:
-                            ticker_list = ticker_info['result']['list']
+                        if ticker_info and 'list' in ticker_info:
+                            ticker_list = ticker_info['list']
                             if ticker_list:
                                 price = float(ticker_list[0].get('lastPrice', 0))
                     except Exception as e:
@@ -618,25 +699,23 @@ class TradingEngine(QThread):
         except Exception as e:
             self.log_message.emit(f"❌ Ошибка обновления стоимости позиций: {e}")
 
-    def load_ticker_data(self) -> Dict:
-        """Загрузка данных тикеров через API"""
+    def load_ticker_data(self) -> TickerTable:
+        """Данные тикеров из общего снимка (файл перечитывается только при изменении)"""
         try:
-            # Используем TickerDataLoader для получения реальных данных через API
-            from src.tools.ticker_data_loader import TickerDataLoader
-            ticker_loader = TickerDataLoader()
-            ticker_data = ticker_loader.load_tickers_data()
-            
-            if ticker_data and 'tickers' in ticker_data:
-                # Возвращаем только данные тикеров
-                tickers = ticker_data['tickers']
-                self.log_message.emit(f"✅ Загружены реальные данные тикеров через API. Последнее обновление: {ticker_data['update_time']}")
-                return tickers
+            snapshot = self.ticker_snapshots.get()
+            
+            if snapshot is not None:
+                # Таблица тикеров снимка, индексированная по символу (общая, не изменять)
+                if snapshot.version != self._ticker_version:
+                    self._ticker_version = snapshot.version
+                    self.log_message.emit(f"✅ Загружены реальные данные тикеров через API. Последнее обновление: {snapshot.update_time}")
+                return snapshot.table
             else:
                 self.log_message.emit("❌ Не удалось получить данные тикеров через API")
-                return {}
+                return TickerTable()
         except Exception as e:
             self.log_message.emit(f"❌ Ошибка загрузки данных тикеров через API: {e}")
-            return {}
+            return TickerTable()
     
     def load_ml_data(self) -> Dict:
         """Загрузка ML данных"""
@@ -650,7 +729,7 @@ class TradingEngine(QThread):
                 with open(perf_file, 'r', encoding='utf-8') as f:
                     content = f.read().strip()
                     if content:
-                        ml_data['performance'] = json.loads(content)
+                        ml_data['performance'] = json_codec.loads(content)
             
             # Загружаем состояние обучения ML
             state_file = models_path / "adaptive_ml_training_state.json"
@@ -658,7 +737,7 @@ class TradingEngine(QThread):
                 with open(state_file, 'r', encoding='utf-8') as f:
                     content = f.read().strip()
                     if content:
-                        ml_data['training_state'] = json.loads(content)
+                        ml_data['training_state'] = json_codec.loads(content)
             
             return ml_data
         except Exception as e:
@@ -666,109 +745,17 @@ class TradingEngine(QThread):
         return {}
     
     def get_instrument_info(self, symbol: str) -> Dict:
-        """Получение информации об инструменте через API"""
-        try:
-            # Используем API endpoint /v5/market/instruments-info
-            response = self.bybit_client.get_instruments_info(
-                category='spot',
-                symbol=symbol
-            )
-            
-            self.log_message.emit(f"🔍 API ответ для {symbol}: {response}")
-            
-            # Проверяем, что response - это список инструментов
-            if response and isinstance(response, list) and len(response) > 0:
-                instrument = response[0]
-                
-                self.log_message.emit(f"🔍 Инструмент {symbol}: {instrument} (тип: {type(instrument)})")
-                
-                # Проверяем, что instrument - это словарь
-                if isinstance(instrument, dict):
-                    lot_size_filter = instrument.get('lotSizeFilter', {})
-                    
-                    # Извлекаем минимальные и максимальные значения
-                    min_order_qty = float(lot_size_filter.get('minOrderQty', 0))
-                    min_order_amt = float(lot_size_filter.get('minOrderAmt', 5))  # По умолчанию 5 USDT
-                    max_order_qty = float(lot_size_filter.get('maxOrderQty', 0))  # Максимальное количество
-                    max_market_order_qty = float(lot_size_filter.get('maxMarketOrderQty', 0))  # Максимальное количество для рыночных ордеров
-                    qty_step = float(lot_size_filter.get('qtyStep', lot_size_filter.get('minOrderQty', 0.00001)))
-                    
-                    # Если qtyStep равен 0, используем minOrderQty как шаг
-                    if qty_step == 0:
-                        qty_step = min_order_qty if min_order_qty > 0 else 0.00001
-                    
-                    # Используем maxMarketOrderQty для рыночных ордеров, если оно меньше maxOrderQty
-                    # Это решает проблему с нереалистично большими значениями maxOrderQty
-                    effective_max_qty = max_order_qty
-                    if max_market_order_qty > 0 and (max_order_qty == 0 or max_market_order_qty < max_order_qty):
-                        effective_max_qty = max_market_order_qty
-                        self.log_message.emit(f"📊 {symbol}: Используем maxMarketOrderQty={max_market_order_qty} вместо maxOrderQty={max_order_qty}")
-                    
-                    self.log_message.emit(f"📊 {symbol}: minOrderQty={min_order_qty}, minOrderAmt={min_order_amt}, maxOrderQty={max_order_qty}, maxMarketOrderQty={max_market_order_qty}, effectiveMaxQty={effective_max_qty}, qtyStep={qty_step}")
-                    
-                    return {
-                        'symbol': symbol,
-                        'minOrderQty': min_order_qty,
-                        'minOrderAmt': min_order_amt,
-                        'maxOrderQty': effective_max_qty,  # Используем эффективное максимальное количество
-                        'qtyStep': qty_step,
-                        'basePrecision': lot_size_filter.get('basePrecision', '0.00001'),
-                        'quotePrecision': lot_size_filter.get('quotePrecision', '0.0000001')
-                    }
-                else:
-                    self.log_message.emit(f"⚠️ Неожиданная структура данных инструмента {symbol}: {type(instrument)}")
-            else:
-                # Возможно, response имеет стандартную структуру API
-                if response and isinstance(response, dict) and response.get('retCode') == 0:
-                    result = response.get('result', {})
-                    instruments_list = result.get('list', [])
-                    
-                    self.log_message.emit(f"🔍 Список инструментов для {symbol}: {instruments_list}")
-                    
-                    if instruments_list and len(instruments_list) > 0:
-                        instrument = instruments_list[0]
-                        
-                        self.log_message.emit(f"🔍 Инструмент {symbol}: {instrument} (тип: {type(instrument)})")
-                        
-                        # Проверяем, что instrument - это словарь
-                        if isinstance(instrument, dict):
-                            lot_size_filter = instrument.get('lotSizeFilter', {})
-                            
-                            # Извлекаем минимальные и максимальные значения
-                            min_order_qty = float(lot_size_filter.get('minOrderQty', 0))
-                            min_order_amt = float(lot_size_filter.get('minOrderAmt', 5))  # По умолчанию 5 USDT
-                            max_order_qty = float(lot_size_filter.get('maxOrderQty', 0))  # Максимальное количество
-                            max_market_order_qty = float(lot_size_filter.get('maxMarketOrderQty', 0))  # Максимальное количество для рыночных ордеров
-                            qty_step = float(lot_size_filter.get('qtyStep', 0.0))
-                            
-                            # Используем maxMarketOrderQty для рыночных ордеров, если оно меньше maxOrderQty
-                            # Это решает проблему с нереалистично большими значениями maxOrderQty
-                            effective_max_qty = max_order_qty
-                            if max_market_order_qty > 0 and (max_order_qty == 0 or max_market_order_qty < max_order_qty):
-                                effective_max_qty = max_market_order_qty
-                                self.log_message.emit(f"📊 {symbol}: Используем maxMarketOrderQty={max_market_order_qty} вместо maxOrderQty={max_order_qty}")
-                            
-                            self.log_message.emit(f"📊 {symbol}: minOrderQty={min_order_qty}, minOrderAmt={min_order_amt}, maxOrderQty={max_order_qty}, maxMarketOrderQty={max_market_order_qty}, effectiveMaxQty={effective_max_qty}, qtyStep={qty_step}")
-                            
-                            return {
-                                'symbol': symbol,
-                                'minOrderQty': min_order_qty,
-                                'minOrderAmt': min_order_amt,
-                                'maxOrderQty': effective_max_qty,  # Используем эффективное максимальное количество
-                                'qtyStep': qty_step,
-                                'basePrecision': lot_size_filter.get('basePrecision', '0.00001'),
-                                'quotePrecision': lot_size_filter.get('quotePrecision', '0.0000001')
-                            }
-                        else:
-                            self.log_message.emit(f"⚠️ Неожиданная структура данных инструмента {symbol}: {type(instrument)}")
-                    else:
-                        self.log_message.emit(f"⚠️ Инструмент {symbol} не найден в ответе API")
-                else:
-                    error_msg = response.get('retMsg', 'Неизвестная ошибка') if isinstance(response, dict) else 'Неожиданный формат ответа'
-                    self.log_message.emit(f"❌ Ошибка получения информации об инструменте {symbol}: {error_msg}")
-                
-        except Exception as e:
-            self.log_message.emit(f"❌ Ошибка запроса информации об инструменте {symbol}: {e}")
+        """Получение информации об инструменте из реестра (без запросов к API)"""
+        registry = self.instrument_registry
+        if registry is not None:
+            rules = registry.get_order_rules(symbol, category='spot')
+            if rules is not None:
+                return rules
+            # Возможно, символ появился после последнего обновления реестра
+            registry.request_refresh()
+            self.log_message.emit(f"⚠️ Инструмент {symbol} отсутствует в реестре, используем значения по умолчанию")
+        else:
+            self.log_message.emit(f"⚠️ Реестр инструментов недоступен, для {symbol} используем значения по умолчанию")
         
         # Возвращаем значения по умолчанию в случае ошибки
         return {
@@ -906,115 +893,94 @@ class TradingEngine(QThread):
             self.mutex.unlock()
     
     def update_portfolio(self):
-        """Обновление портфолио с улучшенной обработкой ошибок"""
-        max_retries = 3
-        retry_delay = 2
-        
-        for attempt in range(max_retries):
-            try:
-                self.log_message.emit(f"📊 Обновление портфолио (попытка {attempt + 1}/{max_retries})")
-                
-                # Получаем данные о балансе
-                balance_data = self.bybit_client.get_unified_balance_flat()
-                
-                if not balance_data:
-                    self.log_message.emit("⚠️ Получен пустой ответ при запросе баланса")
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay)
-                        continue
-                    return
-                
-                # Проверяем структуру данных
-                if not isinstance(balance_data, dict):
-                    self.log_message.emit(f"⚠️ Неожиданная структура данных баланса: {type(balance_data)}")
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay)
-                        continue
-                    return
-                
-                # Проверяем, что balance_data содержит ключ 'coins'
-                if 'coins' not in balance_data:
-                    self.log_message.emit(f"⚠️ Отсутствует ключ 'coins' в данных баланса: {balance_data}")
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay)
-                        continue
-                    return
-                
-                # Обрабатываем данные о монетах
-                coins_data = balance_data['coins']
-                
-                self.log_message.emit(f"🔍 Обработка данных монет: {coins_data}")
-                
-                # Проверяем, есть ли данные для обработки
-                if not coins_data:
-                    self.log_message.emit("⚠️ Получены пустые данные о монетах, сохраняем текущий портфолио")
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay)
-                        continue
-                    return
-                
-                # Создаем временный портфолио для новых данных
-                temp_portfolio = {}
-                
-                if isinstance(coins_data, dict):
-                    # Если coins - это словарь с парами coin_name: balance
-                    for coin_name, balance in coins_data.items():
+        """Обновление портфолио с улучшенной обработкой ошибок
+
+        Временные ошибки API повторяются в BybitClient (resilience), поэтому
+        здесь выполняется одна попытка: неудача не задерживает торговый цикл.
+        """
+        try:
+            self.log_message.emit("📊 Обновление портфолио")
+            
+            # Получаем данные о балансе
+            balance_data = self.get_balance_flat()
+            
+            if not balance_data:
+                self.log_message.emit("⚠️ Получен пустой ответ при запросе баланса")
+                return
+            
+            # Проверяем структуру данных
+            if not isinstance(balance_data, dict):
+                self.log_message.emit(f"⚠️ Неожиданная структура данных баланса: {type(balance_data)}")
+                return
+            
+            # Проверяем, что balance_data содержит ключ 'coins'
+            if 'coins' not in balance_data:
+                self.log_message.emit(f"⚠️ Отсутствует ключ 'coins' в данных баланса: {balance_data}")
+                return
+            
+            # Обрабатываем данные о монетах
+            coins_data = balance_data['coins']
+            
+            self.log_message.emit(f"🔍 Обработка данных монет: {coins_data}")
+            
+            # Проверяем, есть ли данные для обработки
+            if not coins_data:
+                self.log_message.emit("⚠️ Получены пустые данные о монетах, сохраняем текущий портфолио")
+                return
+            
+            # Создаем временный портфолио для новых данных
+            temp_portfolio = {}
+            
+            if isinstance(coins_data, dict):
+                # Если coins - это словарь с парами coin_name: balance
+                for coin_name, balance in coins_data.items():
+                    try:
+                        # Преобразуем Decimal в float
+                        balance_float = float(balance) if balance else 0
+                        if balance_float > 0:
+                            temp_portfolio[coin_name] = balance_float
+                            self.log_message.emit(f"💰 Обработана монета {coin_name}: {balance_float}")
+                    except (ValueError, TypeError) as e:
+                        self.log_message.emit(f"⚠️ Ошибка обработки монеты {coin_name}: {e}")
+            elif isinstance(coins_data, list):
+                # Если coins - это список
+                for coin_info in coins_data:
+                    if isinstance(coin_info, dict):
+                        coin_name = coin_info.get('coin', '')
+                        balance = coin_info.get('walletBalance', 0)
                         try:
-                            # Преобразуем Decimal в float
                             balance_float = float(balance) if balance else 0
-                            if balance_float > 0:
+                            if balance_float > 0 and coin_name:
                                 temp_portfolio[coin_name] = balance_float
                                 self.log_message.emit(f"💰 Обработана монета {coin_name}: {balance_float}")
                         except (ValueError, TypeError) as e:
                             self.log_message.emit(f"⚠️ Ошибка обработки монеты {coin_name}: {e}")
-                elif isinstance(coins_data, list):
-                    # Если coins - это список
-                    for coin_info in coins_data:
-                        if isinstance(coin_info, dict):
-                            coin_name = coin_info.get('coin', '')
-                            balance = coin_info.get('walletBalance', 0)
-                            try:
-                                balance_float = float(balance) if balance else 0
-                                if balance_float > 0 and coin_name:
-                                    temp_portfolio[coin_name] = balance_float
-                                    self.log_message.emit(f"💰 Обработана монета {coin_name}: {balance_float}")
-                            except (ValueError, TypeError) as e:
-                                self.log_message.emit(f"⚠️ Ошибка обработки монеты {coin_name}: {e}")
-                
-                # Обновляем портфолио только если получили валидные данные
-                if temp_portfolio:
-                    # Сохраняем предыдущий баланс USDT для сравнения
-                    old_usdt_balance = self.portfolio.get('USDT', 0)
-                    
-                    self.portfolio = temp_portfolio
-                    self.log_message.emit(f"✅ Портфолио успешно обновлено новыми данными")
-                    
-                    # Обновляем стоимость позиций в USDT
-                    self.update_position_values()
-                    
-                    # Отправляем Telegram уведомление об изменении баланса
-                    new_usdt_balance = self.portfolio.get('USDT', 0)
-                    if self.telegram_notifier and abs(new_usdt_balance - old_usdt_balance) > 0.01:
-                        self.telegram_notifier.notify_balance_change(old_usdt_balance, new_usdt_balance)
-                else:
-                    self.log_message.emit("⚠️ Не получено валидных данных о балансе, сохраняем текущий портфолио")
+            
+            # Обновляем портфолио только если получили валидные данные
+            if temp_portfolio:
+                # Сохраняем предыдущий баланс USDT для сравнения
+                old_usdt_balance = self.portfolio.get('USDT', 0)
                 
-                # Логируем успешное обновление
-                total_coins = len(self.portfolio)
-                total_usdt = self.portfolio.get('USDT', 0)
-                self.log_message.emit(f"✅ Портфолио обновлено: {total_coins} монет, USDT: ${total_usdt:.2f}")
-                return  # Успешно обновили, выходим
+                self.portfolio = temp_portfolio
+                self.log_message.emit(f"✅ Портфолио успешно обновлено новыми данными")
                 
-            except Exception as e:
-                error_msg = f"❌ Ошибка обновления портфолио (попытка {attempt + 1}): {e}"
-                self.log_message.emit(error_msg)
+                # Обновляем стоимость позиций в USDT
+                self.update_position_values()
                 
-                if attempt < max_retries - 1:
-                    self.log_message.emit(f"⏳ Повторная попытка через {retry_delay} секунд...")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # Увеличиваем задержку для следующей попытки
-                else:
-                    self.log_message.emit("❌ Все попытки обновления портфолио исчерпаны")
+                # Отправляем Telegram уведомление об изменении баланса
+                new_usdt_balance = self.portfolio.get('USDT', 0)
+                if self.telegram_notifier and abs(new_usdt_balance - old_usdt_balance) > 0.01:
+                    self.telegram_notifier.notify_balance_change(old_usdt_balance, new_usdt_balance)
+            else:
+                self.log_message.emit("⚠️ Не получено валидных данных о балансе, сохраняем текущий портфолио")
+            
+            # Логируем успешное обновление
+            total_coins = len(self.portfolio)
+            total_usdt = self.portfolio.get('USDT', 0)
+            self.log_message.emit(f"✅ Портфолио обновлено: {total_coins} монет, USDT: ${total_usdt:.2f}")
+            
+        except Exception as e:
+            self.log_message.emit(f"❌ Ошибка обновления портфолио: {e}")
     
     def cleanup_failed_signals(self):
         """Удаление провалившихся сигналов из очереди"""
@@ -1036,20 +1002,19 @@ class TradingEngine(QThread):
         """Загрузка очереди сигналов из файла"""
         try:
             if self.signals_file.exists():
-                with open(self.signals_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for signal_data in data:
-                        signal = TradingSignal(
-                            symbol=signal_data['symbol'],
-                            signal=signal_data['signal'],
-                            confidence=signal_data['confidence'],
-                            price=signal_data.get('price', 0.0),
-                            reason=signal_data['reason']
-                        )
-                        signal.status = signal_data.get('status', 'PENDING')
-                        signal.execution_attempts = signal_data.get('execution_attempts', 0)
-                        self.signals_queue.append(signal)
-                    self.log_message.emit(f"📥 Загружено {len(self.signals_queue)} сигналов из файла")
+                data = json_codec.load_file(self.signals_file)
+                for signal_data in data:
+                    signal = TradingSignal(
+                        symbol=signal_data['symbol'],
+                        signal=signal_data['signal'],
+                        confidence=signal_data['confidence'],
+                        price=signal_data.get('price', 0.0),
+                        reason=signal_data['reason']
+                    )
+                    signal.status = signal_data.get('status', 'PENDING')
+                    signal.execution_attempts = signal_data.get('execution_attempts', 0)
+                    self.signals_queue.append(signal)
+                self.log_message.emit(f"📥 Загружено {len(self.signals_queue)} сигналов из файла")
         except Exception as e:
             self.log_message.emit(f"⚠️ Ошибка загрузки очереди сигналов: {e}")
 
@@ -1068,8 +1033,7 @@ class TradingEngine(QThread):
                     'status': signal.status,
                     'execution_attempts': signal.execution_attempts
                 })
-            with open(self.signals_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            json_codec.dump_file(self.signals_file, data)
         except Exception as e:
             self.log_message.emit(f"⚠️ Ошибка сохранения очереди сигналов: {e}")
 
@@ -1083,34 +1047,72 @@ class TradingEngine(QThread):
         except Exception as e:
             self.log_message.emit(f"⚠️ Ошибка очистки очереди сигналов: {e}")
 
+    def _begin_signal_attempt(self, signal: TradingSignal) -> bool:
+        """Проверка готовности сигнала и начало новой попытки исполнения"""
+        # Проверяем статус сигнала
+        if signal.status == "EXECUTED":
+            return False  # Сигнал уже исполнен
+        
+        if signal.status == "FAILED":
+            return False  # Сигнал провален, не обрабатываем
+        
+        # Проверяем количество попыток
+        if signal.execution_attempts >= signal.max_attempts:
+            signal.status = "FAILED"
+            self.log_message.emit(f"❌ Сигнал {signal.signal} для {signal.symbol} отклонен после {signal.max_attempts} попыток")
+            return False
+        
+        # Проверяем, включена ли торговля
+        if not self.trading_enabled:
+            self.log_message.emit(f"⏸️ Торговля отключена. Сигнал {signal.signal} для {signal.symbol} игнорируется.")
+            return False
+        
+        # Увеличиваем счетчик попыток
+        signal.execution_attempts += 1
+        signal.last_attempt_time = datetime.now()
+        signal.status = "EXECUTING"
+        
+        self.log_message.emit(f"🔍 Обработка сигнала {signal.signal} для {signal.symbol} (попытка {signal.execution_attempts}/{signal.max_attempts}, уверенность: {signal.confidence:.2f})")
+        return True
+    
+    def _finish_signal_attempt(self, signal: TradingSignal, success: bool):
+        """Обновление статуса сигнала по результату попытки"""
+        if success:
+            signal.status = "EXECUTED"
+            self.log_message.emit(f"✅ Сигнал {signal.signal} для {signal.symbol} успешно исполнен")
+        else:
+            signal.status = "PENDING"  # Возвращаем в ожидание для повторной попытки
+            self.log_message.emit(f"⚠️ Сигнал {signal.signal} для {signal.symbol} не исполнен (попытка {signal.execution_attempts}/{signal.max_attempts})")
+    
+    def _defer_signal(self, signal: TradingSignal, error: Exception):
+        """Ордер не отправлялся (цепь разомкнута) - попытка не засчитывается
+
+        Сигнал уже снят с очереди торговым циклом, поэтому возвращается
+        в её конец и сохраняется до следующего цикла.
+        """
+        signal.execution_attempts -= 1
+        signal.status = "PENDING"
+        self.mutex.lock()
+        try:
+            if not any(queued is signal for queued in self.signals_queue):
+                self.signals_queue.append(signal)
+            self.save_signals_queue()
+        finally:
+            self.mutex.unlock()
+        self.log_message.emit(f"⏸️ Сигнал {signal.signal} для {signal.symbol} отложен: {error}")
+    
     def process_signal(self, signal: TradingSignal):
-        """Обработка торгового сигнала с механизмом повторных попыток"""
+        """Обработка торгового сигнала с механизмом повторных попыток
+
+        Временные ошибки API повторяются внутри BybitClient, поэтому попытка
+        сигнала расходуется только на исход, который повтор запроса не исправит.
+        Если цепь endpoint ордеров разомкнута, ордер не отправляется и
+        попытка не засчитывается - сигнал возвращается в очередь до следующего цикла.
+        """
         try:
-            # Проверяем статус сигнала
-            if signal.status == "EXECUTED":
-                return  # Сигнал уже исполнен
-            
-            if signal.status == "FAILED":
-                return  # Сигнал провален, не обрабатываем
-            
-            # Проверяем количество попыток
-            if signal.execution_attempts >= signal.max_attempts:
-                signal.status = "FAILED"
-                self.log_message.emit(f"❌ Сигнал {signal.signal} для {signal.symbol} отклонен после {signal.max_attempts} попыток")
+            if not self._begin_signal_attempt(signal):
                 return
             
-            # Проверяем, включена ли торговля
-            if not self.trading_enabled:
-                self.log_message.emit(f"⏸️ Торговля отключена. Сигнал {signal.signal} для {signal.symbol} игнорируется.")
-                return
-            
-            # Увеличиваем счетчик попыток
-            signal.execution_attempts += 1
-            signal.last_attempt_time = datetime.now()
-            signal.status = "EXECUTING"
-            
-            self.log_message.emit(f"🔍 Обработка сигнала {signal.signal} для {signal.symbol} (попытка {signal.execution_attempts}/{signal.max_attempts}, уверенность: {signal.confidence:.2f})")
-            
             success = False
             if signal.signal == 'BUY':
                 success = self.execute_buy_order(signal)
@@ -1118,20 +1120,141 @@ class TradingEngine(QThread):
                 success = self.execute_sell_order(signal)
             
             # Обновляем статус на основе результата
-            if success:
-                signal.status = "EXECUTED"
-                self.log_message.emit(f"✅ Сигнал {signal.signal} для {signal.symbol} успешно исполнен")
-                self.save_signals_queue()  # Сохраняем изменения в файл
-            else:
-                signal.status = "PENDING"  # Возвращаем в ожидание для повторной попытки
-                self.log_message.emit(f"⚠️ Сигнал {signal.signal} для {signal.symbol} не исполнен (попытка {signal.execution_attempts}/{signal.max_attempts})")
-                self.save_signals_queue()  # Сохраняем изменения в файл
+            self._finish_signal_attempt(signal, success)
+            self.save_signals_queue()  # Сохраняем изменения в файл
                 
+        except CircuitOpenError as e:
+            self._defer_signal(signal, e)
         except Exception as e:
             signal.status = "PENDING"  # Возвращаем в ожидание при ошибке
             self.log_message.emit(f"❌ Ошибка обработки сигнала {signal.symbol}: {e}")
             self.save_signals_queue()  # Сохраняем изменения в файл
     
+    def process_signals_batch(self, signals: List[TradingSignal]):
+        """Пакетная обработка готовых сигналов одним запросом create-batch
+
+        Для каждого сигнала выполняются те же проверки и расчет количества, что
+        и в process_signal; баланс USDT и лимит позиций учитывают ордера,
+        уже включенные в пакет. Результат каждого ордера сопоставляется со
+        своим сигналом по позиции в пакете, портфолио обновляется один раз.
+        Повторные сигналы по символу, уже попавшему в пакет, обрабатываются
+        после него через process_signal.
+        """
+        prepared = []  # (signal, order, side)
+        deferred = []
+        symbols = set()
+        reserved_usdt = 0.0
+        pending_positions = 0
+        
+        for signal in signals:
+            if signal.symbol in symbols:
+                deferred.append(signal)
+                continue
+            try:
+                if not self._begin_signal_attempt(signal):
+                    continue
+                symbols.add(signal.symbol)
+                if signal.signal == 'BUY':
+                    order = self.prepare_buy_order(signal, reserved_usdt, pending_positions)
+                    side = 'Buy'
+                elif signal.signal == 'SELL':
+                    order = self.prepare_sell_order(signal)
+                    side = 'Sell'
+                else:
+                    order = None
+                if order is None:
+                    self._finish_signal_attempt(signal, False)
+                    continue
+                if side == 'Buy':
+                    reserved_usdt += order['amount_usdt']
+                    if self.position_values_usdt.get(signal.symbol, 0) < 5.0:
+                        pending_positions += 1
+                prepared.append((signal, order, side))
+            except CircuitOpenError as e:
+                self._defer_signal(signal, e)
+            except Exception as e:
+                signal.status = "PENDING"
+                self.log_message.emit(f"❌ Ошибка подготовки ордера {signal.symbol}: {e}")
+        
+        if prepared:
+            outcomes = None
+            try:
+                if len(prepared) == 1:
+                    signal, order, side = prepared[0]
+                    order_result = self.place_order(
+                        category='spot',
+                        symbol=signal.symbol,
+                        side=side,
+                        order_type='Market',
+                        qty=order['qty_str']
+                    )
+                    outcomes = [self.order_outcome(order_result)]
+                else:
+                    self.log_message.emit(f"📦 Пакетная отправка {len(prepared)} ордеров")
+                    outcomes = self.bybit_client.place_batch_orders('spot', [{
+                        'symbol': signal.symbol,
+                        'side': side,
+                        'orderType': 'Market',
+                        'qty': order['qty_str']
+                    } for signal, order, side in prepared])
+            except CircuitOpenError as e:
+                for signal, _, _ in prepared:
+                    self._defer_signal(signal, e)
+            except Exception as e:
+                self.log_message.emit(f"❌ Ошибка пакетной отправки ордеров: {e}")
+                if self.telegram_notifier:
+                    self.telegram_notifier.notify_error(f"Ошибка пакетной отправки ордеров: {e}")
+                for signal, _, _ in prepared:
+                    signal.status = "PENDING"
+            
+            if outcomes is not None:
+                executed = 0
+                for (signal, order, side), outcome in zip(prepared, outcomes):
+                    try:
+                        if side == 'Buy':
+                            success = self.complete_buy_order(signal, order, outcome, refresh_portfolio=False)
+                        else:
+                            success = self.complete_sell_order(signal, order, outcome, refresh_portfolio=False)
+                    except Exception as e:
+                        self.log_message.emit(f"⚠️ Ошибка учета результата ордера {signal.symbol}: {e}")
+                        success = outcome['success']
+                    self._finish_signal_attempt(signal, success)
+                    executed += success
+                
+                if executed:
+                    # Одно обновление портфолио на весь пакет
+                    self.update_portfolio()
+        
+        self.save_signals_queue()
+        
+        for signal in deferred:
+            self.process_signal(signal)
+    
+    @staticmethod
+    def order_outcome(order_result: Optional[Dict]) -> Dict:
+        """Результат одиночного ордера в формате элемента place_batch_orders
+
+        Принимает как поле result ответа (BybitClient, OrderGateway), так и
+        полный ответ API с retCode.
+        """
+        if not order_result:
+            return {'success': False, 'orderId': '', 'code': None, 'msg': 'Нет ответа от API'}
+        if 'retCode' in order_result:
+            order_id = (order_result.get('result') or {}).get('orderId', '')
+            return {
+                'success': order_result.get('retCode') == 0 and bool(order_id),
+                'orderId': order_id,
+                'code': order_result.get('retCode'),
+                'msg': order_result.get('retMsg', 'Неизвестная ошибка')
+            }
+        order_id = order_result.get('orderId', '')
+        return {
+            'success': bool(order_id),
+            'orderId': order_id,
+            'code': 0 if order_id else None,
+            'msg': 'OK' if order_id else 'Неизвестная ошибка'
+        }
+    
     def format_quantity_for_api(self, qty: float, qty_step: float) -> str:
         """
         Форматирует количество для API без использования научной нотации
@@ -1191,153 +1314,210 @@ class TradingEngine(QThread):
             
             return formatted
     
-    def execute_buy_order(self, signal: TradingSignal):
-        """Выполнение ордера на покупку"""
-        try:
-            # Детальное логирование начального состояния
-            self.log_message.emit(f"🔍 Начинаем покупку {signal.symbol}. Цена: ${signal.price:.6f}, Уверенность: {signal.confidence:.2f}")
-            
-            # Фильтрация проблемных символов через централизованный список
-            if signal.symbol in self.banned_symbols:
-                self.log_message.emit(f"⚠️ Символ {signal.symbol} в списке исключений, пропускаем торговлю")
-                return False
-            
-            # Проверяем количество открытых позиций (игнорируем микроскопические остатки < $5)
-            open_positions = self.get_significant_positions()
-            
-            self.log_message.emit(f"📊 Открытых позиций: {open_positions}/{self.max_open_positions}")
-            
-            if open_positions >= self.max_open_positions:
-                self.log_message.emit(f"⚠️ Достигнуто максимальное количество открытых позиций ({self.max_open_positions}). Пропускаем покупку {signal.symbol}")
-                return False
+    def prepare_buy_order(self, signal: TradingSignal, reserved_usdt: float = 0.0,
+                          pending_positions: int = 0) -> Optional[Dict]:
+        """Проверки и расчет количества для рыночной покупки без отправки ордера
+        
+        Args:
+            signal: Сигнал на покупку
+            reserved_usdt: USDT, уже зарезервированные ордерами текущего пакета
+            pending_positions: Новые позиции, открываемые ордерами текущего пакета
             
-            # Проверяем 24-часовой кулдаун для данного символа
-            current_time = time.time()
-            if signal.symbol in self.last_buy_times:
-                time_since_last_buy = current_time - self.last_buy_times[signal.symbol]
-                hours_since_last_buy = time_since_last_buy / 3600
-                self.log_message.emit(f"⏰ {signal.symbol}: Время с последней покупки: {hours_since_last_buy:.1f} часов (кулдаун: 24 часа)")
-                
-                if time_since_last_buy < self.buy_cooldown:
-                    remaining_time = self.buy_cooldown - time_since_last_buy
-                    remaining_hours = remaining_time / 3600
-                    self.log_message.emit(f"⏳ 24-часовой кулдаун для {signal.symbol}: осталось {remaining_hours:.1f} часов")
-                    return False
-            else:
-                self.log_message.emit(f"⏰ {signal.symbol}: Первая покупка для этого символа")
+        Returns:
+            Optional[Dict]: qty, qty_str (для API), amount_usdt и time, либо None,
+                если покупка невозможна
+        """
+        # Детальное логирование начального состояния
+        self.log_message.emit(f"🔍 Начинаем покупку {signal.symbol}. Цена: ${signal.price:.6f}, Уверенность: {signal.confidence:.2f}")
+        
+        # Фильтрация проблемных символов через централизованный список
+        if signal.symbol in self.banned_symbols:
+            self.log_message.emit(f"⚠️ Символ {signal.symbol} в списке исключений, пропускаем торговлю")
+            return None
+        
+        # Проверяем количество открытых позиций (игнорируем микроскопические остатки < $5)
+        open_positions = self.get_significant_positions() + pending_positions
+        
+        self.log_message.emit(f"📊 Открытых позиций: {open_positions}/{self.max_open_positions}")
+        
+        if open_positions >= self.max_open_positions:
+            self.log_message.emit(f"⚠️ Достигнуто максимальное количество открытых позиций ({self.max_open_positions}). Пропускаем покупку {signal.symbol}")
+            return None
+        
+        # Проверяем 24-часовой кулдаун для данного символа
+        current_time = time.time()
+        if signal.symbol in self.last_buy_times:
+            time_since_last_buy = current_time - self.last_buy_times[signal.symbol]
+            hours_since_last_buy = time_since_last_buy / 3600
+            self.log_message.emit(f"⏰ {signal.symbol}: Время с последней покупки: {hours_since_last_buy:.1f} часов (кулдаун: 24 часа)")
+            
+            if time_since_last_buy < self.buy_cooldown:
+                remaining_time = self.buy_cooldown - time_since_last_buy
+                remaining_hours = remaining_time / 3600
+                self.log_message.emit(f"⏳ 24-часовой кулдаун для {signal.symbol}: осталось {remaining_hours:.1f} часов")
+                return None
+        else:
+            self.log_message.emit(f"⏰ {signal.symbol}: Первая покупка для этого символа")
+        
+        # Проверяем баланс USDT
+        usdt_balance = self.portfolio.get('USDT', 0) - reserved_usdt
+        self.log_message.emit(f"💰 Баланс USDT: ${usdt_balance:.2f}")
+        
+        # Получаем актуальную информацию об инструменте через API
+        instrument_info = self.get_instrument_info(signal.symbol)
+        min_trade_amount = float(instrument_info['minOrderAmt'])
+        min_order_qty = instrument_info['minOrderQty']
+        qty_step = instrument_info['qtyStep']
+        
+        # Детальное логирование параметров инструмента
+        self.log_message.emit(f"📋 {signal.symbol} - minOrderAmt: ${min_trade_amount:.2f}, minOrderQty: {min_order_qty}, qtyStep: {qty_step}")
+        
+        # ВАЖНО: Bybit API требует минимум $5 для API торговли (с января 2025)
+        # Но для BTCUSDT minOrderAmt уже равен 5 USDT согласно API ответу
+        api_min_order_value = 5.0  # $5 минимум для API торговли
+        
+        # Список проблемных символов, требующих больших буферов
+        problematic_symbols = ['BBSOLUSDT', 'BABYDOGEUSDT']
+        
+        # Рассчитываем динамический буфер в зависимости от qtyStep и символа
+        if signal.symbol in problematic_symbols:
+            buffer_multiplier = 1.50  # 50% буфер для проблемных символов
+            self.log_message.emit(f"🔍 {signal.symbol}: Применяется увеличенный буфер 50% для проблемного символа")
+        elif qty_step < 1e-6:  # Очень маленький шаг количества
+            buffer_multiplier = 1.25  # 25% буфер для монет с очень малым qtyStep
+            self.log_message.emit(f"🔍 {signal.symbol}: qtyStep={qty_step} < 1e-6, применяется буфер 25%")
+        elif qty_step < 1e-4:  # Маленький шаг количества
+            buffer_multiplier = 1.15  # 15% буфер для монет с малым qtyStep
+            self.log_message.emit(f"🔍 {signal.symbol}: qtyStep={qty_step} < 1e-4, применяется буфер 15%")
+        else:
+            buffer_multiplier = 1.05  # 5% буфер для обычных монет
+            self.log_message.emit(f"🔍 {signal.symbol}: Стандартный буфер 5%")
+        
+        # Устанавливаем эффективную минимальную сумму на основе реальных данных API
+        if signal.symbol == 'BTCUSDT':
+            # Для BTCUSDT используем minOrderAmt из API (5 USDT) с буфером
+            base_min_amount = max(min_trade_amount, api_min_order_value)
+            effective_min_amount = base_min_amount * buffer_multiplier
+            max_trade_amount = max(effective_min_amount * 20, 100.0)  # До $100 для BTCUSDT
+            self.log_message.emit(f"💎 BTCUSDT: base_min=${base_min_amount:.2f}, effective_min=${effective_min_amount:.2f}, max=${max_trade_amount:.2f}")
+        elif signal.symbol == 'BBSOLUSDT':
+            # Специальная обработка для BBSOLUSDT - используем только API минимум
+            self.log_message.emit(f"🔍 BBSOLUSDT: minOrderAmt={min_trade_amount}, API_min={api_min_order_value}")
+            base_min_amount = max(min_trade_amount, api_min_order_value)  # Убираем принудительный минимум $10
+            effective_min_amount = base_min_amount * buffer_multiplier  # Используем динамический буфер
+            max_trade_amount = max(effective_min_amount * 4, 20.0)  # Максимум $20
+            self.log_message.emit(f"🔍 BBSOLUSDT: base_min=${base_min_amount:.2f}, effective_min=${effective_min_amount:.2f}, max=${max_trade_amount:.2f}, buffer={buffer_multiplier:.2f}")
+        elif signal.symbol in ['ETHUSDT', 'BNBUSDT', 'LINKUSDT']:
+            # Для других дорогих активов используем более высокий минимум с буфером
+            base_min_amount = max(min_trade_amount, api_min_order_value, 20.0)  # Уменьшено с $50 до $20
+            effective_min_amount = base_min_amount * buffer_multiplier
+            max_trade_amount = max(effective_min_amount * 4, 80.0)  # Уменьшено с $200 до $80
+            self.log_message.emit(f"💎 {signal.symbol}: base_min=${base_min_amount:.2f}, effective_min=${effective_min_amount:.2f}, max=${max_trade_amount:.2f}")
+        else:
+            # Для всех остальных символов используем API минимум $5 с буфером
+            base_min_amount = max(min_trade_amount, api_min_order_value)
+            effective_min_amount = base_min_amount * buffer_multiplier
+            max_trade_amount = max(effective_min_amount * 10, 20.0)  # Уменьшено с $50 до $20 для надежности
+            self.log_message.emit(f"💰 {signal.symbol}: base_min=${base_min_amount:.2f}, effective_min=${effective_min_amount:.2f}, max=${max_trade_amount:.2f}")
+        
+        if usdt_balance < effective_min_amount:
+            self.log_message.emit(f"⚠️ Недостаточно USDT для покупки {signal.symbol}: ${usdt_balance:.2f} (минимум ${effective_min_amount:.2f})")
+            return None
+        
+        # Ограничиваем максимальную аллокацию на одну монету до 50% от баланса
+        max_allocation_per_coin = usdt_balance * 0.5  # 50% от баланса
+        
+        # Проверяем текущую стоимость позиции по данной монете
+        current_position_value = self.position_values_usdt.get(signal.symbol, 0)
+        self.log_message.emit(f"📊 {signal.symbol}: Текущая позиция ${current_position_value:.2f}, макс. аллокация ${max_allocation_per_coin:.2f}")
+        
+        # Рассчитываем сумму для покупки (используем MAX_POSITION_PERCENT из конфига, но не менее минимума и не более максимума)
+        base_trade_amount = usdt_balance * self.risk_per_trade
+        trade_amount = max(min(base_trade_amount, max_trade_amount), effective_min_amount)
+        
+        # Проверяем, не превысит ли новая покупка лимит в 50% баланса на одну монету
+        if current_position_value + trade_amount > max_allocation_per_coin:
+            # Корректируем сумму покупки, чтобы не превысить лимит
+            available_allocation = max_allocation_per_coin - current_position_value
+            if available_allocation < effective_min_amount:
+                self.log_message.emit(f"⚠️ {signal.symbol}: Превышен лимит 50% баланса на монету. "
+                                    f"Текущая позиция: ${current_position_value:.2f}, доступно: ${available_allocation:.2f}, "
+                                    f"минимум для покупки: ${effective_min_amount:.2f}")
+                return None
+            trade_amount = available_allocation
+            self.log_message.emit(f"📉 {signal.symbol}: Сумма покупки скорректирована до ${trade_amount:.2f} "
+                                f"для соблюдения лимита 50% баланса")
+        
+        self.log_message.emit(f"💵 Расчет суммы торговли: базовая=${base_trade_amount:.2f} (баланс×{self.risk_per_trade:.3f})")
+        
+        # Дополнительная проверка: если trade_amount превышает половину баланса, ограничиваем его
+        if trade_amount > max_allocation_per_coin:
+            trade_amount = max_allocation_per_coin
+            self.log_message.emit(f"⚠️ {signal.symbol}: Сумма торговли ограничена 50% баланса: ${trade_amount:.2f}")
+        
+        # Логируем расчеты для диагностики
+        self.log_message.emit(f"🔍 {signal.symbol}: Расчет торговли - баланс=${usdt_balance:.2f}, риск={self.risk_per_trade:.3f}, "
+                            f"базовая_сумма=${base_trade_amount:.2f}, макс_на_монету=${max_allocation_per_coin:.2f}, "
+                            f"эффективный_мин=${effective_min_amount:.2f}, макс_торговля=${max_trade_amount:.2f}, "
+                            f"итоговая_сумма=${trade_amount:.2f}")
+        self.log_message.emit(f"💰 Расчет для {signal.symbol}: баланс=${usdt_balance:.2f}, риск={self.risk_per_trade*100:.1f}%, макс_аллокация=${max_allocation_per_coin:.2f}, итого=${trade_amount:.2f}")
+        
+        # Рассчитываем количество для покупки
+        qty = trade_amount / signal.price
+        
+        # Получаем параметры из API
+        min_order_qty = instrument_info['minOrderQty']
+        max_order_qty = instrument_info['maxOrderQty']  # Эффективное максимальное количество (уже учитывает maxMarketOrderQty)
+        qty_step = instrument_info['qtyStep']
+        
+        # Правильно округляем количество согласно qtyStep
+        if qty_step > 0:
+            import math
+            from decimal import Decimal
+            
+            # Правильно определяем количество десятичных знаков в qty_step
+            # включая научную нотацию (например, 1e-05)
+            decimal_step = Decimal(str(qty_step))
+            step_str = format(decimal_step, 'f')
+            step_str = step_str.rstrip('0').rstrip('.')
             
-            # Проверяем баланс USDT
-            usdt_balance = self.portfolio.get('USDT', 0)
-            self.log_message.emit(f"💰 Баланс USDT: ${usdt_balance:.2f}")
-            
-            # Получаем актуальную информацию об инструменте через API
-            instrument_info = self.get_instrument_info(signal.symbol)
-            min_trade_amount = float(instrument_info['minOrderAmt'])
-            min_order_qty = instrument_info['minOrderQty']
-            qty_step = instrument_info['qtyStep']
-            
-            # Детальное логирование параметров инструмента
-            self.log_message.emit(f"📋 {signal.symbol} - minOrderAmt: ${min_trade_amount:.2f}, minOrderQty: {min_order_qty}, qtyStep: {qty_step}")
-            
-            # ВАЖНО: Bybit API требует минимум $5 для API торговли (с января 2025)
-            # Но для BTCUSDT minOrderAmt уже равен 5 USDT согласно API ответу
-            api_min_order_value = 5.0  # $5 минимум для API торговли
-            
-            # Список проблемных символов, требующих больших буферов
-            problematic_symbols = ['BBSOLUSDT', 'BABYDOGEUSDT']
-            
-            # Рассчитываем динамический буфер в зависимости от qtyStep и символа
-            if signal.symbol in problematic_symbols:
-                buffer_multiplier = 1.50  # 50% буфер для проблемных символов
-                self.log_message.emit(f"🔍 {signal.symbol}: Применяется увеличенный буфер 50% для проблемного символа")
-            elif qty_step < 1e-6:  # Очень маленький шаг количества
-                buffer_multiplier = 1.25  # 25% буфер для монет с очень малым qtyStep
-                self.log_message.emit(f"🔍 {signal.symbol}: qtyStep={qty_step} < 1e-6, применяется буфер 25%")
-            elif qty_step < 1e-4:  # Маленький шаг количества
-                buffer_multiplier = 1.15  # 15% буфер для монет с малым qtyStep
-                self.log_message.emit(f"🔍 {signal.symbol}: qtyStep={qty_step} < 1e-4, применяется буфер 15%")
-            else:
-                buffer_multiplier = 1.05  # 5% буфер для обычных монет
-                self.log_message.emit(f"🔍 {signal.symbol}: Стандартный буфер 5%")
-            
-            # Устанавливаем эффективную минимальную сумму на основе реальных данных API
-            if signal.symbol == 'BTCUSDT':
-                # Для BTCUSDT используем minOrderAmt из API (5 USDT) с буфером
-                base_min_amount = max(min_trade_amount, api_min_order_value)
-                effective_min_amount = base_min_amount * buffer_multiplier
-                max_trade_amount = max(effective_min_amount * 20, 100.0)  # До $100 для BTCUSDT
-                self.log_message.emit(f"💎 BTCUSDT: base_min=${base_min_amount:.2f}, effective_min=${effective_min_amount:.2f}, max=${max_trade_amount:.2f}")
-            elif signal.symbol == 'BBSOLUSDT':
-                # Специальная обработка для BBSOLUSDT - используем только API минимум
-                self.log_message.emit(f"🔍 BBSOLUSDT: minOrderAmt={min_trade_amount}, API_min={api_min_order_value}")
-                base_min_amount = max(min_trade_amount, api_min_order_value)  # Убираем принудительный минимум $10
-                effective_min_amount = base_min_amount * buffer_multiplier  # Используем динамический буфер
-                max_trade_amount = max(effective_min_amount * 4, 20.0)  # Максимум $20
-                self.log_message.emit(f"🔍 BBSOLUSDT: base_min=${base_min_amount:.2f}, effective_min=${effective_min_amount:.2f}, max=${max_trade_amount:.2f}, buffer={buffer_multiplier:.2f}")
-            elif signal.symbol in ['ETHUSDT', 'BNBUSDT', 'LINKUSDT']:
-                # Для других дорогих активов используем более высокий минимум с буфером
-                base_min_amount = max(min_trade_amount, api_min_order_value, 20.0)  # Уменьшено с $50 до $20
-                effective_min_amount = base_min_amount * buffer_multiplier
-                max_trade_amount = max(effective_min_amount * 4, 80.0)  # Уменьшено с $200 до $80
-                self.log_message.emit(f"💎 {signal.symbol}: base_min=${base_min_amount:.2f}, effective_min=${effective_min_amount:.2f}, max=${max_trade_amount:.2f}")
+            if '.' in step_str:
+                precision_decimals = len(step_str.split('.')[1])
             else:
-                # Для всех остальных символов используем API минимум $5 с буфером
-                base_min_amount = max(min_trade_amount, api_min_order_value)
-                effective_min_amount = base_min_amount * buffer_multiplier
-                max_trade_amount = max(effective_min_amount * 10, 20.0)  # Уменьшено с $50 до $20 для надежности
-                self.log_message.emit(f"💰 {signal.symbol}: base_min=${base_min_amount:.2f}, effective_min=${effective_min_amount:.2f}, max=${max_trade_amount:.2f}")
-            
-            if usdt_balance < effective_min_amount:
-                self.log_message.emit(f"⚠️ Недостаточно USDT для покупки {signal.symbol}: ${usdt_balance:.2f} (минимум ${effective_min_amount:.2f})")
-                return False
+                precision_decimals = 0
             
-            # Ограничиваем максимальную аллокацию на одну монету до 50% от баланса
-            max_allocation_per_coin = usdt_balance * 0.5  # 50% от баланса
-            
-            # Проверяем текущую стоимость позиции по данной монете
-            current_position_value = self.position_values_usdt.get(signal.symbol, 0)
-            self.log_message.emit(f"📊 {signal.symbol}: Текущая позиция ${current_position_value:.2f}, макс. аллокация ${max_allocation_per_coin:.2f}")
-            
-            # Рассчитываем сумму для покупки (используем MAX_POSITION_PERCENT из конфига, но не менее минимума и не более максимума)
-            base_trade_amount = usdt_balance * self.risk_per_trade
-            trade_amount = max(min(base_trade_amount, max_trade_amount), effective_min_amount)
-            
-            # Проверяем, не превысит ли новая покупка лимит в 50% баланса на одну монету
-            if current_position_value + trade_amount > max_allocation_per_coin:
-                # Корректируем сумму покупки, чтобы не превысить лимит
-                available_allocation = max_allocation_per_coin - current_position_value
-                if available_allocation < effective_min_amount:
-                    self.log_message.emit(f"⚠️ {signal.symbol}: Превышен лимит 50% баланса на монету. "
-                                        f"Текущая позиция: ${current_position_value:.2f}, доступно: ${available_allocation:.2f}, "
-                                        f"минимум для покупки: ${effective_min_amount:.2f}")
-                    return False
-                trade_amount = available_allocation
-                self.log_message.emit(f"📉 {signal.symbol}: Сумма покупки скорректирована до ${trade_amount:.2f} "
-                                    f"для соблюдения лимита 50% баланса")
-            
-            self.log_message.emit(f"💵 Расчет суммы торговли: базовая=${base_trade_amount:.2f} (баланс×{self.risk_per_trade:.3f})")
-            
-            # Дополнительная проверка: если trade_amount превышает половину баланса, ограничиваем его
-            if trade_amount > max_allocation_per_coin:
-                trade_amount = max_allocation_per_coin
-                self.log_message.emit(f"⚠️ {signal.symbol}: Сумма торговли ограничена 50% баланса: ${trade_amount:.2f}")
-            
-            # Логируем расчеты для диагностики
-            self.log_message.emit(f"🔍 {signal.symbol}: Расчет торговли - баланс=${usdt_balance:.2f}, риск={self.risk_per_trade:.3f}, "
-                                f"базовая_сумма=${base_trade_amount:.2f}, макс_на_монету=${max_allocation_per_coin:.2f}, "
-                                f"эффективный_мин=${effective_min_amount:.2f}, макс_торговля=${max_trade_amount:.2f}, "
-                                f"итоговая_сумма=${trade_amount:.2f}")
-            self.log_message.emit(f"💰 Расчет для {signal.symbol}: баланс=${usdt_balance:.2f}, риск={self.risk_per_trade*100:.1f}%, макс_аллокация=${max_allocation_per_coin:.2f}, итого=${trade_amount:.2f}")
-            
-            # Рассчитываем количество для покупки
-            qty = trade_amount / signal.price
-            
-            # Получаем параметры из API
-            min_order_qty = instrument_info['minOrderQty']
-            max_order_qty = instrument_info['maxOrderQty']  # Эффективное максимальное количество (уже учитывает maxMarketOrderQty)
-            qty_step = instrument_info['qtyStep']
-            
-            # Правильно округляем количество согласно qtyStep
+            # Округляем с правильной точностью
+            qty = math.floor(qty / qty_step) * qty_step
+            qty = round(qty, precision_decimals)
+        
+        # Дополнительная проверка для токенов с очень низкой ценой
+        # Ограничиваем количество разумным пределом для предотвращения чрезмерно больших ордеров
+        # Специальная обработка для BABYDOGEUSDT - рассчитываем лимит исходя из минимальной суммы
+        if signal.symbol == 'BABYDOGEUSDT':
+            # Для BABYDOGEUSDT рассчитываем максимальное количество исходя из разумной суммы ($50)
+            max_reasonable_amount = 50.0  # Максимум $50 для BABYDOGEUSDT
+            reasonable_max_qty = max_reasonable_amount / signal.price
+            self.log_message.emit(f"🔍 BABYDOGEUSDT: рассчитываем лимит исходя из ${max_reasonable_amount}: {reasonable_max_qty:.0f} токенов")
+        else:
+            reasonable_max_qty = 1e8  # 100 миллионов токенов - разумный предел для других мелких токенов
+        
+        if qty > reasonable_max_qty:
+            self.log_message.emit(f"⚠️ Количество {qty:.0f} превышает разумный предел {reasonable_max_qty:.0f} для {signal.symbol}")
+            qty = reasonable_max_qty
+            self.log_message.emit(f"⚠️ Количество ограничено разумным пределом: {qty:.0f}")
+            # Пересчитываем сумму после ограничения количества
+            trade_usdt = qty * signal.price
+            self.log_message.emit(f"💰 Итоговая сумма после ограничения: ${trade_usdt:.6f}")
+        
+        # Проверяем максимальное количество от API (после применения разумного предела)
+        if max_order_qty > 0 and qty > max_order_qty:
+            self.log_message.emit(f"⚠️ Количество превышает максимальное для {signal.symbol}: {qty:.8f} > {max_order_qty:.8f}")
+            qty = max_order_qty
+            self.log_message.emit(f"⚠️ Количество скорректировано до максимального: {qty:.8f}")
+        
+        # Проверяем, что количество не меньше минимального
+        if qty < min_order_qty:
+            # Увеличиваем количество до минимального, округленного по qtyStep
             if qty_step > 0:
                 import math
                 from decimal import Decimal
@@ -1354,204 +1534,125 @@ class TradingEngine(QThread):
                     precision_decimals = 0
                 
                 # Округляем с правильной точностью
-                qty = math.floor(qty / qty_step) * qty_step
+                qty = math.ceil(min_order_qty / qty_step) * qty_step
                 qty = round(qty, precision_decimals)
+            else:
+                qty = min_order_qty
+            self.log_message.emit(f"⚠️ Количество увеличено до минимального: {qty:.8f}")
             
-            # Дополнительная проверка для токенов с очень низкой ценой
-            # Ограничиваем количество разумным пределом для предотвращения чрезмерно больших ордеров
-            # Специальная обработка для BABYDOGEUSDT - рассчитываем лимит исходя из минимальной суммы
-            if signal.symbol == 'BABYDOGEUSDT':
-                # Для BABYDOGEUSDT рассчитываем максимальное количество исходя из разумной суммы ($50)
-                max_reasonable_amount = 50.0  # Максимум $50 для BABYDOGEUSDT
-                reasonable_max_qty = max_reasonable_amount / signal.price
-                self.log_message.emit(f"🔍 BABYDOGEUSDT: рассчитываем лимит исходя из ${max_reasonable_amount}: {reasonable_max_qty:.0f} токенов")
+            # Повторно проверяем максимальное количество после корректировки
+            if max_order_qty > 0 and qty > max_order_qty:
+                self.log_message.emit(f"❌ Невозможно выполнить ордер для {signal.symbol}: минимальное количество {min_order_qty:.8f} превышает максимальное {max_order_qty:.8f}")
+                return None
+        
+        # Пересчитываем сумму сделки после корректировки количества
+        trade_usdt = qty * signal.price
+        
+        # Проверяем эффективный минимум: max(minOrderQty * price, minOrderAmt)
+        effective_min_check = max(min_order_qty * signal.price, effective_min_amount)
+        
+        # Если пересчитанная сумма меньше эффективного минимума, корректируем
+        if trade_usdt < effective_min_check:
+            # Увеличиваем количество для достижения минимальной стоимости
+            qty_needed = effective_min_check / signal.price
+            if qty_step > 0:
+                import math
+                import decimal
+                
+                # Определяем количество десятичных знаков в qty_step
+                qty_step_str = f"{qty_step:.10f}".rstrip('0').rstrip('.')
+                if '.' in qty_step_str:
+                    precision_decimals = len(qty_step_str.split('.')[1])
+                else:
+                    precision_decimals = 0
+                
+                # Округляем с правильной точностью
+                qty = math.ceil(qty_needed / qty_step) * qty_step
+                qty = round(qty, precision_decimals)
             else:
-                reasonable_max_qty = 1e8  # 100 миллионов токенов - разумный предел для других мелких токенов
+                qty = qty_needed
+            trade_usdt = qty * signal.price
+            self.log_message.emit(f"⚠️ Количество скорректировано для эффективного минимума: {qty:.8f}")
             
+            # Повторная проверка разумного предела после корректировки
             if qty > reasonable_max_qty:
-                self.log_message.emit(f"⚠️ Количество {qty:.0f} превышает разумный предел {reasonable_max_qty:.0f} для {signal.symbol}")
+                self.log_message.emit(f"⚠️ После корректировки количество {qty:.0f} превышает разумный предел {reasonable_max_qty:.0f} для {signal.symbol}")
                 qty = reasonable_max_qty
-                self.log_message.emit(f"⚠️ Количество ограничено разумным пределом: {qty:.0f}")
-                # Пересчитываем сумму после ограничения количества
                 trade_usdt = qty * signal.price
-                self.log_message.emit(f"💰 Итоговая сумма после ограничения: ${trade_usdt:.6f}")
+                self.log_message.emit(f"⚠️ Количество ограничено разумным пределом: {qty:.0f}, итоговая сумма: ${trade_usdt:.2f}")
+        
+        # Финальная проверка баланса
+        if trade_usdt > usdt_balance:
+            # Корректируем количество под доступный баланс
+            max_affordable_qty = usdt_balance / signal.price
             
-            # Проверяем максимальное количество от API (после применения разумного предела)
-            if max_order_qty > 0 and qty > max_order_qty:
-                self.log_message.emit(f"⚠️ Количество превышает максимальное для {signal.symbol}: {qty:.8f} > {max_order_qty:.8f}")
-                qty = max_order_qty
-                self.log_message.emit(f"⚠️ Количество скорректировано до максимального: {qty:.8f}")
-            
-            # Проверяем, что количество не меньше минимального
-            if qty < min_order_qty:
-                # Увеличиваем количество до минимального, округленного по qtyStep
-                if qty_step > 0:
-                    import math
-                    from decimal import Decimal
-                    
-                    # Правильно определяем количество десятичных знаков в qty_step
-                    # включая научную нотацию (например, 1e-05)
-                    decimal_step = Decimal(str(qty_step))
-                    step_str = format(decimal_step, 'f')
-                    step_str = step_str.rstrip('0').rstrip('.')
-                    
-                    if '.' in step_str:
-                        precision_decimals = len(step_str.split('.')[1])
-                    else:
-                        precision_decimals = 0
-                    
-                    # Округляем с правильной точностью
-                    qty = math.ceil(min_order_qty / qty_step) * qty_step
-                    qty = round(qty, precision_decimals)
+            # Округляем вниз согласно qtyStep
+            if qty_step > 0:
+                import math
+                import decimal
+                
+                # Определяем количество десятичных знаков в qty_step
+                qty_step_str = f"{qty_step:.10f}".rstrip('0').rstrip('.')
+                if '.' in qty_step_str:
+                    precision_decimals = len(qty_step_str.split('.')[1])
                 else:
-                    qty = min_order_qty
-                self.log_message.emit(f"⚠️ Количество увеличено до минимального: {qty:.8f}")
+                    precision_decimals = 0
                 
-                # Повторно проверяем максимальное количество после корректировки
-                if max_order_qty > 0 and qty > max_order_qty:
-                    self.log_message.emit(f"❌ Невозможно выполнить ордер для {signal.symbol}: минимальное количество {min_order_qty:.8f} превышает максимальное {max_order_qty:.8f}")
-                    return False
+                # Округляем вниз с правильной точностью
+                max_affordable_qty = math.floor(max_affordable_qty / qty_step) * qty_step
+                max_affordable_qty = round(max_affordable_qty, precision_decimals)
+            
+            # Проверяем, что скорректированное количество не меньше минимального
+            if max_affordable_qty < min_order_qty:
+                self.log_message.emit(f"⚠️ Недостаточно USDT: требуется ${trade_usdt:.2f}, доступно ${usdt_balance:.2f}. Даже минимальное количество {min_order_qty:.8f} требует ${min_order_qty * signal.price:.2f}")
+                return None
             
-            # Пересчитываем сумму сделки после корректировки количества
+            # Обновляем количество и сумму
+            qty = max_affordable_qty
             trade_usdt = qty * signal.price
+            self.log_message.emit(f"⚠️ Количество скорректировано под доступный баланс: {qty:.8f} (${trade_usdt:.2f})")
             
-            # Проверяем эффективный минимум: max(minOrderQty * price, minOrderAmt)
-            effective_min_check = max(min_order_qty * signal.price, effective_min_amount)
+            # Проверяем, что скорректированная сумма не меньше эффективного минимума
+            if trade_usdt < effective_min_amount:
+                self.log_message.emit(f"⚠️ После корректировки под баланс сумма ${trade_usdt:.2f} меньше минимальной ${effective_min_amount:.2f}")
+                return None
+        
+        self.log_message.emit(f"💰 ПОКУПКА {signal.symbol}: ${trade_usdt:.2f} USDT ({qty:.6f} {signal.symbol.replace('USDT', '')})")
+        self.log_message.emit(f"   Цена: ${signal.price:.6f}, Итоговая стоимость: ${trade_usdt:.2f}, Эффективный минимум: ${effective_min_amount:.2f}")
+        self.log_message.emit(f"   Причина: {signal.reason}")
+        
+        # Количество в формате API
+        formatted_qty = self.format_quantity_for_api(qty, qty_step)
+        
+        # Детальное логирование для диагностики (особенно для BBSOLUSDT)
+        self.log_message.emit(f"🔢 Детали ордера {signal.symbol}:")
+        self.log_message.emit(f"   minOrderQty: {min_order_qty}, maxOrderQty: {max_order_qty}")
+        self.log_message.emit(f"   qtyStep: {qty_step}, minOrderAmt: {min_trade_amount}")
+        self.log_message.emit(f"   Цена: ${signal.price:.8f}, Количество: {qty:.8f}")
+        self.log_message.emit(f"   Форматированное количество: {formatted_qty}")
+        self.log_message.emit(f"   Итоговая стоимость: ${trade_usdt:.2f}")
+        
+        return {'qty': qty, 'qty_str': formatted_qty, 'amount_usdt': trade_usdt, 'time': current_time}
+    
+    def execute_buy_order(self, signal: TradingSignal):
+        """Выполнение ордера на покупку"""
+        try:
+            order = self.prepare_buy_order(signal)
+            if order is None:
+                return False
             
-            # Если пересчитанная сумма меньше эффективного минимума, корректируем
-            if trade_usdt < effective_min_check:
-                # Увеличиваем количество для достижения минимальной стоимости
-                qty_needed = effective_min_check / signal.price
-                if qty_step > 0:
-                    import math
-                    import decimal
-                    
-                    # Определяем количество десятичных знаков в qty_step
-                    qty_step_str = f"{qty_step:.10f}".rstrip('0').rstrip('.')
-                    if '.' in qty_step_str:
-                        precision_decimals = len(qty_step_str.split('.')[1])
-                    else:
-                        precision_decimals = 0
-                    
-                    # Округляем с правильной точностью
-                    qty = math.ceil(qty_needed / qty_step) * qty_step
-                    qty = round(qty, precision_decimals)
-                else:
-                    qty = qty_needed
-                trade_usdt = qty * signal.price
-                self.log_message.emit(f"⚠️ Количество скорректировано для эффективного минимума: {qty:.8f}")
-                
-                # Повторная проверка разумного предела после корректировки
-                if qty > reasonable_max_qty:
-                    self.log_message.emit(f"⚠️ После корректировки количество {qty:.0f} превышает разумный предел {reasonable_max_qty:.0f} для {signal.symbol}")
-                    qty = reasonable_max_qty
-                    trade_usdt = qty * signal.price
-                    self.log_message.emit(f"⚠️ Количество ограничено разумным пределом: {qty:.0f}, итоговая сумма: ${trade_usdt:.2f}")
-            
-            # Финальная проверка баланса
-            if trade_usdt > usdt_balance:
-                # Корректируем количество под доступный баланс
-                max_affordable_qty = usdt_balance / signal.price
-                
-                # Округляем вниз согласно qtyStep
-                if qty_step > 0:
-                    import math
-                    import decimal
-                    
-                    # Определяем количество десятичных знаков в qty_step
-                    qty_step_str = f"{qty_step:.10f}".rstrip('0').rstrip('.')
-                    if '.' in qty_step_str:
-                        precision_decimals = len(qty_step_str.split('.')[1])
-                    else:
-                        precision_decimals = 0
-                    
-                    # Округляем вниз с правильной точностью
-                    max_affordable_qty = math.floor(max_affordable_qty / qty_step) * qty_step
-                    max_affordable_qty = round(max_affordable_qty, precision_decimals)
-                
-                # Проверяем, что скорректированное количество не меньше минимального
-                if max_affordable_qty < min_order_qty:
-                    self.log_message.emit(f"⚠️ Недостаточно USDT: требуется ${trade_usdt:.2f}, доступно ${usdt_balance:.2f}. Даже минимальное количество {min_order_qty:.8f} требует ${min_order_qty * signal.price:.2f}")
-                    return False
-                
-                # Обновляем количество и сумму
-                qty = max_affordable_qty
-                trade_usdt = qty * signal.price
-                self.log_message.emit(f"⚠️ Количество скорректировано под доступный баланс: {qty:.8f} (${trade_usdt:.2f})")
-                
-                # Проверяем, что скорректированная сумма не меньше эффективного минимума
-                if trade_usdt < effective_min_amount:
-                    self.log_message.emit(f"⚠️ После корректировки под баланс сумма ${trade_usdt:.2f} меньше минимальной ${effective_min_amount:.2f}")
-                    return False
-            
-            self.log_message.emit(f"💰 ПОКУПКА {signal.symbol}: ${trade_usdt:.2f} USDT ({qty:.6f} {signal.symbol.replace('USDT', '')})")
-            self.log_message.emit(f"   Цена: ${signal.price:.6f}, Итоговая стоимость: ${trade_usdt:.2f}, Эффективный минимум: ${effective_min_amount:.2f}")
-            self.log_message.emit(f"   Причина: {signal.reason}")
-            
-            # Выполняем реальный ордер
-            formatted_qty = self.format_quantity_for_api(qty, qty_step)
-            
-            # Детальное логирование для диагностики (особенно для BBSOLUSDT)
-            self.log_message.emit(f"🔢 Детали ордера {signal.symbol}:")
-            self.log_message.emit(f"   minOrderQty: {min_order_qty}, maxOrderQty: {max_order_qty}")
-            self.log_message.emit(f"   qtyStep: {qty_step}, minOrderAmt: {min_trade_amount}")
-            self.log_message.emit(f"   Цена: ${signal.price:.8f}, Количество: {qty:.8f}")
-            self.log_message.emit(f"   Форматированное количество: {formatted_qty}")
-            self.log_message.emit(f"   Итоговая стоимость: ${trade_usdt:.2f}")
-            
-            order_result = self.bybit_client.place_order(
+            order_result = self.place_order(
                 category='spot',
                 symbol=signal.symbol,
                 side='Buy',
                 order_type='Market',
-                qty=formatted_qty
+                qty=order['qty_str']
             )
+            return self.complete_buy_order(signal, order, self.order_outcome(order_result))
             
-            # Проверяем успешность ордера по retCode и наличию orderId
-            if (order_result and 
-                order_result.get('retCode') == 0 and 
-                order_result.get('result', {}).get('orderId')):
-                
-                order_id = order_result.get('result', {}).get('orderId')
-                self.log_message.emit(f"✅ Ордер на покупку {signal.symbol} успешно размещен (ID: {order_id})")
-                
-                # Обновляем время последней покупки для данного символа
-                self.last_buy_times[signal.symbol] = current_time
-                
-                # Записываем время начала удержания позиции
-                self.holding_start_times[signal.symbol] = current_time
-                
-                # Немедленно обновляем портфолио после успешной покупки
-                self.update_portfolio()
-                
-                # Отправляем Telegram уведомление о покупке
-                if self.telegram_notifier:
-                    self.telegram_notifier.notify_trade_executed(
-                        'BUY', signal.symbol, qty, signal.price, trade_usdt
-                    )
-                
-                # Эмитируем событие выполненной сделки
-                trade_info = {
-                    'symbol': signal.symbol,
-                    'side': 'BUY',
-                    'amount': trade_usdt,
-                    'qty': qty,
-                    'price': signal.price,
-                    'confidence': signal.confidence,
-                    'reason': signal.reason,
-                    'order_id': order_result.get('result', {}).get('orderId'),
-                    'timestamp': datetime.now().isoformat()
-                }
-                self.trade_executed.emit(trade_info)
-                return True
-            else:
-                error_msg = order_result.get('retMsg', 'Неизвестная ошибка') if order_result else 'Нет ответа от API'
-                self.log_message.emit(f"❌ Ошибка размещения ордера на покупку {signal.symbol}: {error_msg}")
-                # Telegram notification for buy order error
-                if self.telegram_notifier:
-                    self.telegram_notifier.notify_error(f"Ошибка покупки {signal.symbol}: {error_msg}")
-                return False
-            
+        except CircuitOpenError:
+            # Ордер не отправлялся - решение о повторе принимает process_signal
+            raise
         except Exception as e:
             self.log_message.emit(f"❌ Ошибка выполнения покупки {signal.symbol}: {e}")
             # Telegram notification for buy order exception
@@ -1559,149 +1660,173 @@ class TradingEngine(QThread):
                 self.telegram_notifier.notify_error(f"Ошибка выполнения покупки {signal.symbol}: {e}")
             return False
     
-    def execute_sell_order(self, signal: TradingSignal):
-        """Выполнение ордера на продажу"""
-        try:
-            base_asset = signal.symbol.replace('USDT', '')
-            asset_balance = self.portfolio.get(base_asset, 0)
+    def complete_buy_order(self, signal: TradingSignal, order: Dict, outcome: Dict,
+                           refresh_portfolio: bool = True) -> bool:
+        """Учет результата ордера на покупку (order - из prepare_buy_order, outcome - из order_outcome)"""
+        current_time = order['time']
+        qty = order['qty']
+        trade_usdt = order['amount_usdt']
+        
+        # Проверяем успешность ордера по коду результата и наличию orderId
+        if outcome['success']:
+            order_id = outcome['orderId']
+            self.log_message.emit(f"✅ Ордер на покупку {signal.symbol} успешно размещен (ID: {order_id})")
+            
+            # Обновляем время последней покупки для данного символа
+            self.last_buy_times[signal.symbol] = current_time
+            
+            # Записываем время начала удержания позиции
+            self.holding_start_times[signal.symbol] = current_time
+            
+            # Немедленно обновляем портфолио после успешной покупки
+            if refresh_portfolio:
+                self.update_portfolio()
             
-            # Детальное логирование начального состояния
-            self.log_message.emit(f"🔍 Начинаем продажу {signal.symbol}. Баланс {base_asset}: {asset_balance:.8f}")
+            # Отправляем Telegram уведомление о покупке
+            if self.telegram_notifier:
+                self.telegram_notifier.notify_trade_executed(
+                    'BUY', signal.symbol, qty, signal.price, trade_usdt
+                )
             
-            if asset_balance <= 0:
-                self.log_message.emit(f"⚠️ Недостаточно {base_asset} для продажи: {asset_balance}")
-                return False
+            # Эмитируем событие выполненной сделки
+            trade_info = {
+                'symbol': signal.symbol,
+                'side': 'BUY',
+                'amount': trade_usdt,
+                'qty': qty,
+                'price': signal.price,
+                'confidence': signal.confidence,
+                'reason': signal.reason,
+                'order_id': order_id,
+                'timestamp': datetime.now().isoformat()
+            }
+            self.trade_executed.emit(trade_info)
+            return True
+        
+        error_msg = outcome['msg']
+        self.log_message.emit(f"❌ Ошибка размещения ордера на покупку {signal.symbol}: {error_msg}")
+        # Telegram notification for buy order error
+        if self.telegram_notifier:
+            self.telegram_notifier.notify_error(f"Ошибка покупки {signal.symbol}: {error_msg}")
+        return False
+    
+    def prepare_sell_order(self, signal: TradingSignal) -> Optional[Dict]:
+        """Проверки и расчет количества для рыночной продажи без отправки ордера
+        
+        Returns:
+            Optional[Dict]: qty, qty_str (для API) и amount_usdt, либо None,
+                если продажа невозможна
+        """
+        base_asset = signal.symbol.replace('USDT', '')
+        asset_balance = self.portfolio.get(base_asset, 0)
+        
+        # Детальное логирование начального состояния
+        self.log_message.emit(f"🔍 Начинаем продажу {signal.symbol}. Баланс {base_asset}: {asset_balance:.8f}")
+        
+        if asset_balance <= 0:
+            self.log_message.emit(f"⚠️ Недостаточно {base_asset} для продажи: {asset_balance}")
+            return None
+        
+        # Получаем информацию об инструменте для правильного округления
+        instrument_info = self.get_instrument_info(signal.symbol)
+        min_order_qty = instrument_info['minOrderQty']
+        qty_step = instrument_info['qtyStep']
+        min_order_amt = instrument_info['minOrderAmt']
+        
+        # Детальное логирование параметров инструмента
+        self.log_message.emit(f"📋 {signal.symbol} - minOrderQty: {min_order_qty}, qtyStep: {qty_step}, minOrderAmt: ${min_order_amt}")
+        
+        # Продаем 50% от имеющегося количества
+        sell_amount = asset_balance * 0.5
+        
+        self.log_message.emit(f"💰 Планируем продать 50% от {asset_balance:.8f} = {sell_amount:.8f} {base_asset}")
+        
+        # Правильно округляем количество согласно qtyStep
+        if qty_step > 0:
+            import math
+            from decimal import Decimal
             
-            # Получаем информацию об инструменте для правильного округления
-            instrument_info = self.get_instrument_info(signal.symbol)
-            min_order_qty = instrument_info['minOrderQty']
-            qty_step = instrument_info['qtyStep']
-            min_order_amt = instrument_info['minOrderAmt']
+            # Правильно определяем количество десятичных знаков в qty_step
+            # включая научную нотацию (например, 1e-05)
+            decimal_step = Decimal(str(qty_step))
+            step_str = format(decimal_step, 'f')
+            step_str = step_str.rstrip('0').rstrip('.')
             
-            # Детальное логирование параметров инструмента
-            self.log_message.emit(f"📋 {signal.symbol} - minOrderQty: {min_order_qty}, qtyStep: {qty_step}, minOrderAmt: ${min_order_amt}")
+            if '.' in step_str:
+                precision_decimals = len(step_str.split('.')[1])
+            else:
+                precision_decimals = 0
             
-            # Продаем 50% от имеющегося количества
-            sell_amount = asset_balance * 0.5
+            self.log_message.emit(f"🔢 Округление: qtyStep={qty_step}, precision_decimals={precision_decimals}")
             
-            self.log_message.emit(f"💰 Планируем продать 50% от {asset_balance:.8f} = {sell_amount:.8f} {base_asset}")
+            # Округляем с правильной точностью
+            original_sell_amount = sell_amount
+            sell_amount = math.floor(sell_amount / qty_step) * qty_step
+            sell_amount = round(sell_amount, precision_decimals)
             
-            # Правильно округляем количество согласно qtyStep
+            self.log_message.emit(f"🔢 Округлено с {original_sell_amount:.8f} до {sell_amount:.8f}")
+        
+        # Проверяем, что количество не меньше минимального
+        if sell_amount < min_order_qty:
+            self.log_message.emit(f"⚠️ Количество для продажи 50% ({sell_amount:.8f}) меньше минимального {min_order_qty:.8f}")
+            # Пробуем продать полный объем
+            sell_amount = asset_balance
+            
+            self.log_message.emit(f"🔄 Пробуем продать полный объем: {sell_amount:.8f}")
+            
+            # Правильно округляем полный объем согласно qtyStep
             if qty_step > 0:
-                import math
-                from decimal import Decimal
-                
-                # Правильно определяем количество десятичных знаков в qty_step
-                # включая научную нотацию (например, 1e-05)
-                decimal_step = Decimal(str(qty_step))
-                step_str = format(decimal_step, 'f')
-                step_str = step_str.rstrip('0').rstrip('.')
-                
-                if '.' in step_str:
-                    precision_decimals = len(step_str.split('.')[1])
-                else:
-                    precision_decimals = 0
-                
-                self.log_message.emit(f"🔢 Округление: qtyStep={qty_step}, precision_decimals={precision_decimals}")
-                
-                # Округляем с правильной точностью
-                original_sell_amount = sell_amount
+                original_full_amount = sell_amount
                 sell_amount = math.floor(sell_amount / qty_step) * qty_step
                 sell_amount = round(sell_amount, precision_decimals)
                 
-                self.log_message.emit(f"🔢 Округлено с {original_sell_amount:.8f} до {sell_amount:.8f}")
-            
-            # Проверяем, что количество не меньше минимального
-            if sell_amount < min_order_qty:
-                self.log_message.emit(f"⚠️ Количество для продажи 50% ({sell_amount:.8f}) меньше минимального {min_order_qty:.8f}")
-                # Пробуем продать полный объем
-                sell_amount = asset_balance
-                
-                self.log_message.emit(f"🔄 Пробуем продать полный объем: {sell_amount:.8f}")
-                
-                # Правильно округляем полный объем согласно qtyStep
-                if qty_step > 0:
-                    original_full_amount = sell_amount
-                    sell_amount = math.floor(sell_amount / qty_step) * qty_step
-                    sell_amount = round(sell_amount, precision_decimals)
-                    
-                    self.log_message.emit(f"🔢 Полный объем округлен с {original_full_amount:.8f} до {sell_amount:.8f}")
-                
-                if sell_amount >= min_order_qty:
-                    self.log_message.emit(f"✅ Продаем полный объем: {sell_amount:.8f} {base_asset}")
-                else:
-                    self.log_message.emit(f"❌ Даже полный объем {sell_amount:.8f} меньше минимального {min_order_qty:.8f}")
-                    return False
-            
-            # Проверяем минимальную стоимость ордера
-            # Временно снижаем минимум для тестирования с $5.00 до $2.00
-            temp_min_sell_amount = min(min_order_amt, 2.0)
-            estimated_usdt = sell_amount * signal.price
+                self.log_message.emit(f"🔢 Полный объем округлен с {original_full_amount:.8f} до {sell_amount:.8f}")
             
-            self.log_message.emit(f"💵 Расчетная стоимость продажи: {sell_amount:.8f} × ${signal.price:.6f} = ${estimated_usdt:.2f}")
-            
-            if estimated_usdt < temp_min_sell_amount:
-                self.log_message.emit(f"⚠️ Стоимость продажи ${estimated_usdt:.2f} меньше минимальной ${temp_min_sell_amount:.2f}")
+            if sell_amount >= min_order_qty:
+                self.log_message.emit(f"✅ Продаем полный объем: {sell_amount:.8f} {base_asset}")
+            else:
+                self.log_message.emit(f"❌ Даже полный объем {sell_amount:.8f} меньше минимального {min_order_qty:.8f}")
+                return None
+        
+        # Проверяем минимальную стоимость ордера
+        # Временно снижаем минимум для тестирования с $5.00 до $2.00
+        temp_min_sell_amount = min(min_order_amt, 2.0)
+        estimated_usdt = sell_amount * signal.price
+        
+        self.log_message.emit(f"💵 Расчетная стоимость продажи: {sell_amount:.8f} × ${signal.price:.6f} = ${estimated_usdt:.2f}")
+        
+        if estimated_usdt < temp_min_sell_amount:
+            self.log_message.emit(f"⚠️ Стоимость продажи ${estimated_usdt:.2f} меньше минимальной ${temp_min_sell_amount:.2f}")
+            return None
+        
+        self.log_message.emit(f"💸 ПРОДАЖА {signal.symbol}: {sell_amount:.8f} {base_asset} ≈ ${estimated_usdt:.2f}")
+        self.log_message.emit(f"   Цена: ${signal.price:.6f}, Причина: {signal.reason}")
+        
+        # Количество в формате API
+        formatted_qty = self.format_quantity_for_api(sell_amount, qty_step)
+        self.log_message.emit(f"🔢 Отправляем количество в API: {formatted_qty} (исходное: {sell_amount})")
+        
+        return {'qty': sell_amount, 'qty_str': formatted_qty, 'amount_usdt': estimated_usdt}
+    
+    def execute_sell_order(self, signal: TradingSignal):
+        """Выполнение ордера на продажу"""
+        try:
+            order = self.prepare_sell_order(signal)
+            if order is None:
                 return False
             
-            self.log_message.emit(f"💸 ПРОДАЖА {signal.symbol}: {sell_amount:.8f} {base_asset} ≈ ${estimated_usdt:.2f}")
-            self.log_message.emit(f"   Цена: ${signal.price:.6f}, Причина: {signal.reason}")
-            
-            # Выполняем реальный ордер
-            formatted_qty = self.format_quantity_for_api(sell_amount, qty_step)
-            self.log_message.emit(f"🔢 Отправляем количество в API: {formatted_qty} (исходное: {sell_amount})")
-            
-            order_result = self.bybit_client.place_order(
+            order_result = self.place_order(
                 category='spot',
                 symbol=signal.symbol,
                 side='Sell',
                 order_type='Market',
-                qty=formatted_qty
+                qty=order['qty_str']
             )
+            return self.complete_sell_order(signal, order, self.order_outcome(order_result))
             
-            # Проверяем успешность ордера по retCode и наличию orderId
-            if (order_result and 
-                order_result.get('retCode') == 0 and 
-                order_result.get('result', {}).get('orderId')):
-                
-                order_id = order_result.get('result', {}).get('orderId')
-                self.log_message.emit(f"✅ Ордер на продажу {signal.symbol} успешно размещен (ID: {order_id})")
-                
-                # Очищаем время удержания позиции после успешной продажи
-                if signal.symbol in self.holding_start_times:
-                    del self.holding_start_times[signal.symbol]
-                
-                # Немедленно обновляем портфолио после успешной продажи
-                self.update_portfolio()
-                
-                # Отправляем Telegram уведомление о продаже
-                if self.telegram_notifier:
-                    self.telegram_notifier.notify_trade_executed(
-                        'SELL', signal.symbol, sell_amount, signal.price, estimated_usdt
-                    )
-                
-                # Эмитируем событие выполненной сделки
-                trade_info = {
-                    'symbol': signal.symbol,
-                    'side': 'SELL',
-                    'amount': sell_amount,
-                    'price': signal.price,
-                    'confidence': signal.confidence,
-                    'reason': signal.reason,
-                    'estimated_usdt': estimated_usdt,
-                    'order_id': order_result.get('result', {}).get('orderId'),
-                    'timestamp': datetime.now().isoformat()
-                }
-                self.trade_executed.emit(trade_info)
-                return True
-            else:
-                error_msg = order_result.get('retMsg', 'Неизвестная ошибка') if order_result else 'Нет ответа от API'
-                self.log_message.emit(f"❌ Ошибка размещения ордера на продажу {signal.symbol}: {error_msg}")
-                # Telegram notification for sell order error
-                if self.telegram_notifier:
-                    self.telegram_notifier.notify_error(f"Ошибка продажи {signal.symbol}: {error_msg}")
-                return False
-            
+        except CircuitOpenError:
+            # Ордер не отправлялся - решение о повторе принимает process_signal
+            raise
         except Exception as e:
             self.log_message.emit(f"❌ Ошибка выполнения продажи {signal.symbol}: {e}")
             # Telegram notification for sell order exception
@@ -1709,8 +1834,59 @@ class TradingEngine(QThread):
                 self.telegram_notifier.notify_error(f"Ошибка выполнения продажи {signal.symbol}: {e}")
             return False
     
+    def complete_sell_order(self, signal: TradingSignal, order: Dict, outcome: Dict,
+                            refresh_portfolio: bool = True) -> bool:
+        """Учет результата ордера на продажу (order - из prepare_sell_order, outcome - из order_outcome)"""
+        sell_amount = order['qty']
+        estimated_usdt = order['amount_usdt']
+        
+        # Проверяем успешность ордера по коду результата и наличию orderId
+        if outcome['success']:
+            order_id = outcome['orderId']
+            self.log_message.emit(f"✅ Ордер на продажу {signal.symbol} успешно размещен (ID: {order_id})")
+            
+            # Очищаем время удержания позиции после успешной продажи
+            if signal.symbol in self.holding_start_times:
+                del self.holding_start_times[signal.symbol]
+            
+            # Немедленно обновляем портфолио после успешной продажи
+            if refresh_portfolio:
+                self.update_portfolio()
+            
+            # Отправляем Telegram уведомление о продаже
+            if self.telegram_notifier:
+                self.telegram_notifier.notify_trade_executed(
+                    'SELL', signal.symbol, sell_amount, signal.price, estimated_usdt
+                )
+            
+            # Эмитируем событие выполненной сделки
+            trade_info = {
+                'symbol': signal.symbol,
+                'side': 'SELL',
+                'amount': sell_amount,
+                'price': signal.price,
+                'confidence': signal.confidence,
+                'reason': signal.reason,
+                'estimated_usdt': estimated_usdt,
+                'order_id': order_id,
+                'timestamp': datetime.now().isoformat()
+            }
+            self.trade_executed.emit(trade_info)
+            return True
+        
+        error_msg = outcome['msg']
+        self.log_message.emit(f"❌ Ошибка размещения ордера на продажу {signal.symbol}: {error_msg}")
+        # Telegram notification for sell order error
+        if self.telegram_notifier:
+            self.telegram_notifier.notify_error(f"Ошибка продажи {signal.symbol}: {error_msg}")
+        return False
+    
     def stop(self):
-        """Остановка торгового движка"""
+        """Остановка торгового движка
+
+        Потоки и сессии закрывает run() после выхода из цикла: ордер,
+        размещаемый в этот момент, не теряет шлюз посреди вызова.
+        """
         self.running = False
     
     def check_smart_exit_conditions(self):
@@ -1735,10 +1911,7 @@ class TradingEngine(QThread):
                         continue
                     
                     symbol = f"{coin}USDT"
-                    if symbol not in ticker_data:
-                        continue
-                    
-                    current_price = float(ticker_data[symbol].get('price', 0))
+                    current_price = ticker_data.price(symbol)
                     if current_price <= 0:
                         continue
                     
@@ -1795,8 +1968,8 @@ class TradingEngine(QThread):
                             # Ищем цену монеты
                             symbol = f"{coin}USDT"
                             price = 0
-                            if ticker_data and symbol in ticker_data:
-                                price = float(ticker_data[symbol].get('price', 0))
+                            if ticker_data:
+                                price = ticker_data.price(symbol)
                             
                             value_usdt = amount * price
                             total_value_usdt += value_usdt
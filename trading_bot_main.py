@@ -83,16 +83,18 @@ except ImportError:
 # Импорт наших модулей
 try:
     from api.bybit_client import BybitClient
+    from api.klines import interval_ms
+    from api.websocket_stream import BybitPublicStream
+    from api.private_stream import BybitPrivateStream
     from strategies.adaptive_ml import AdaptiveMLStrategy
     from src.database.db_manager import DatabaseManager
+    from src.data.kline_store import KlineStore
     
     if GUI_AVAILABLE:
         from gui.portfolio_tab import PortfolioTab
         from gui.strategies_tab import StrategiesTab
         from strategy.strategy_engine import StrategyEngine
     
-    from tools.ticker_data_loader import TickerDataLoader
-    
     print("✅ Все модули загружены успешно")
     
 except ImportError as e:
@@ -123,6 +125,9 @@ class TradingWorker(QThread):
         
         # Инициализация компонентов
         self.bybit_client = None
+        self.market_stream = None  # WebSocket поток свечей вместо REST опроса каждый цикл
+        self.kline_store = None  # Локальное хранилище свечей с догрузкой только недостающих
+        self.portfolio_stream = None  # Приватный WebSocket поток баланса и ордеров
         self.ml_strategy = None
         self.db_manager = None
         self.config_manager = None
@@ -192,6 +197,35 @@ class TradingWorker(QThread):
                 testnet=self.testnet
             )
             init_time = (time.time() - start_time) * 1000
+            # Сводка задержек и ошибок API по endpoint раз в минуту
+            self.bybit_client.metrics.start_periodic_log(60)
+            
+            # Локальное хранилище свечей: каждый цикл догружаются только новые свечи
+            try:
+                self.kline_store = KlineStore(testnet=self.testnet)
+            except Exception as store_error:
+                self.kline_store = None
+                self.log_message.emit(f"⚠️ Хранилище свечей недоступно, используем REST: {store_error}")
+            
+            # Публичный WebSocket поток: свечи обновляются в памяти, REST нужен только для начальной загрузки
+            try:
+                self.market_stream = BybitPublicStream(category='spot', testnet=self.testnet)
+                self.market_stream.start()
+                self.log_message.emit("✅ WebSocket поток рыночных данных запущен")
+            except Exception as ws_error:
+                self.market_stream = None
+                self.log_message.emit(f"⚠️ WebSocket поток недоступен, используем REST: {ws_error}")
+            
+            # Приватный поток: баланс и открытые ордера в памяти, REST только для снимка и сверки
+            try:
+                self.portfolio_stream = BybitPrivateStream(
+                    self.api_key, self.api_secret, testnet=self.testnet, rest_client=self.bybit_client
+                )
+                self.portfolio_stream.start()
+                self.log_message.emit("✅ Приватный WebSocket поток портфеля запущен")
+            except Exception as ws_error:
+                self.portfolio_stream = None
+                self.log_message.emit(f"⚠️ Приватный WebSocket поток недоступен, используем REST: {ws_error}")
             
             # self.db_manager.log_entry({
             #     'level': 'INFO',
@@ -381,12 +415,28 @@ class TradingWorker(QThread):
             #     'session_id': getattr(self, 'current_session_id', None)
             # }) # Временно закомментировано - блокирует выполнение
     
+    def _portfolio_cache_ready(self) -> bool:
+        stream = self.portfolio_stream
+        return stream is not None and stream.connected.is_set() and stream.cache.is_ready()
+    
+    def _get_wallet_balance(self) -> dict:
+        """Баланс из живого кэша портфеля, а при его отсутствии - через REST"""
+        if self._portfolio_cache_ready():
+            return self.portfolio_stream.cache.get_wallet_balance()
+        return self.bybit_client.get_wallet_balance()
+    
+    def _get_open_orders(self) -> dict:
+        """Открытые спотовые ордера из кэша портфеля, а при его отсутствии - через REST"""
+        if self._portfolio_cache_ready():
+            return {'list': self.portfolio_stream.cache.get_open_orders()}
+        return self.bybit_client.get_open_orders(category="spot")
+    
     def _update_balance(self, session_id: str) -> Optional[dict]:
         """Обновление информации о балансе"""
         try:
             start_time = time.time()
             # Получаем реальные данные через API
-            balance_response = self.bybit_client.get_wallet_balance()
+            balance_response = self._get_wallet_balance()
             exec_time = (time.time() - start_time) * 1000
             
             # Логируем полный ответ для отладки
@@ -456,7 +506,7 @@ class TradingWorker(QThread):
             # Для спотовой торговли получаем открытые ордера вместо позиций
             try:
                 # Получаем открытые ордера через API
-                orders_response = self.bybit_client.get_open_orders(category="spot")
+                orders_response = self._get_open_orders()
                 
                 # Проверяем, что получили корректный ответ
                 if orders_response and 'list' in orders_response:
@@ -637,36 +687,52 @@ class TradingWorker(QThread):
             # Переходим к следующему символу
             self._process_symbols_async(remaining_symbols, session_id, cycle_start)
     
+    def _get_stream_klines(self, symbol: str, limit: int = 200) -> Optional[List[dict]]:
+        """Свечи из WebSocket потока
+
+        Интервал - тот, на который REST запрос 4h был заменен для символа (кэш
+        интервалов клиента). None, если символ ещё не загружен в поток или поток
+        не обновлял его свечи дольше двух интервалов.
+        """
+        if self.market_stream is None or not self.market_stream.connected.is_set():
+            return None
+        interval = self.bybit_client.interval_capabilities.resolved('spot', symbol, '240') or '240'
+        max_age = 2 * interval_ms(interval) / 1000
+        return self.market_stream.store.get_klines(symbol, interval, limit, max_age=max_age) or None
+    
+    def _seed_stream_klines(self, symbol: str, interval: str, klines: List[dict]):
+        """Начальная загрузка свечей в поток и подписка на обновления"""
+        if self.market_stream is None or not klines:
+            return
+        self.market_stream.store.set_klines(symbol, interval, klines)
+        self.market_stream.subscribe_klines([symbol], interval)
+    
+    def _fetch_klines(self, symbol: str, interval: str, limit: int = 200):
+        """Свечи через локальное хранилище (догружается только хвост), при его отсутствии - REST
+
+        Неподдерживаемый для символа интервал заменяется через кэш интервалов клиента.
+
+        Returns:
+            tuple: (свечи, фактический интервал)
+        """
+        def fetch(kline_interval: str):
+            if self.kline_store is not None:
+                return self.kline_store.recent(self.bybit_client, 'spot', symbol, kline_interval, limit)
+            return self.bybit_client.get_kline(category='spot', symbol=symbol, interval=kline_interval, limit=limit)
+
+        return self.bybit_client.fetch_with_interval_fallback('spot', symbol, interval, fetch)
+    
     def _get_symbol_klines(self, symbol: str) -> Optional[List[dict]]:
         """Получение исторических данных для символа"""
         try:
-            # Получение исторических данных с обработкой ошибки Invalid period
-            try:
-                klines = self.bybit_client.get_kline(
-                    category='spot',
-                    symbol=symbol,
-                    interval='4h',
-                    limit=200
-                )
-                return klines
-            except Exception as kline_error:
-                if "Invalid period" in str(kline_error):
-                    self.logger.warning(f"Символ {symbol}: ошибка периода, пробуем альтернативный интервал")
-                    # Пробуем альтернативный интервал
-                    try:
-                        klines = self.bybit_client.get_kline(
-                            category='spot',
-                            symbol=symbol,
-                            interval='60',  # Альтернативный формат для 1h
-                            limit=200
-                        )
-                        return klines
-                    except Exception as alt_error:
-                        self.logger.error(f"Не удалось получить данные для {symbol} с альтернативным интервалом: {alt_error}")
-                        return None
-                else:
-                    self.logger.error(f"Ошибка получения данных для {symbol}: {kline_error}")
-                    return None
+            # Если символ уже отслеживается WebSocket потоком, REST запрос не нужен
+            stream_klines = self._get_stream_klines(symbol)
+            if stream_klines:
+                return stream_klines
+            
+            klines, interval = self._fetch_klines(symbol, '4h', 200)
+            self._seed_stream_klines(symbol, interval, klines)
+            return klines
         except Exception as e:
             self.logger.error(f"Ошибка получения klines для {symbol}: {e}")
             return None
@@ -676,9 +742,8 @@ class TradingWorker(QThread):
         try:
             # Сначала пробуем загрузить символы из программы тикеров
             try:
-                from src.tools.ticker_data_loader import TickerDataLoader
-                ticker_loader = TickerDataLoader()
-                ticker_data = ticker_loader.load_tickers_data()
+                from src.tools.ticker_data_loader import shared_ticker_snapshots
+                ticker_data = shared_ticker_snapshots().get_tickers()
                 
                 if ticker_data:
                     # Получаем символы из данных тикеров
@@ -766,31 +831,8 @@ class TradingWorker(QThread):
             # Используем QTimer для неблокирующего выполнения
             def analyze_async():
                 try:
-                    # Получение исторических данных с обработкой ошибки Invalid period
-                    try:
-                        klines = self.bybit_client.get_kline(
-                            category='spot',
-                            symbol=symbol,
-                            interval='4h',
-                            limit=200
-                        )
-                    except Exception as kline_error:
-                        if "Invalid period" in str(kline_error):
-                            self.logger.warning(f"Символ {symbol}: ошибка периода, пробуем альтернативный интервал")
-                            # Пробуем альтернативный интервал
-                            try:
-                                klines = self.bybit_client.get_kline(
-                                    category='spot',
-                                    symbol=symbol,
-                                    interval='60',  # Альтернативный формат для 1h
-                                    limit=200
-                                )
-                            except Exception as alt_error:
-                                self.logger.error(f"Не удалось получить данные для {symbol} с альтернативным интервалом: {alt_error}")
-                                return None
-                        else:
-                            self.logger.error(f"Ошибка получения данных для {symbol}: {kline_error}")
-                            return None
+                    # Свечи из WebSocket потока, при их отсутствии - хранилище или REST
+                    klines = self._get_symbol_klines(symbol)
                     
                     if not klines or len(klines) < 10:  # Проверка минимального количества свечей для анализа
                         self.logger.warning(f"Недостаточно данных для анализа символа {symbol}: получено {len(klines) if klines else 0} свечей")
@@ -850,7 +892,7 @@ class TradingWorker(QThread):
         """Проверка дневных лимитов торговли"""
         try:
             # Получение текущего баланса
-            balance_response = self.bybit_client.get_wallet_balance()
+            balance_response = self._get_wallet_balance()
             if not balance_response or not balance_response.get('list'):
                 return False
             
@@ -899,7 +941,7 @@ class TradingWorker(QThread):
                 base_currency = symbol.replace('USDT', '') if symbol.endswith('USDT') else symbol.replace('USD', '')
                 
                 # Получаем баланс базовой валюты
-                balance_resp = self.bybit_client.get_wallet_balance()
+                balance_resp = self._get_wallet_balance()
                 base_currency_balance = 0.0
                 
                 if balance_resp:
@@ -926,7 +968,7 @@ class TradingWorker(QThread):
                 self.logger.info(f"Баланс {base_currency}: {base_currency_balance} - достаточно для продажи")
             
             # Расчет размера позиции
-            balance_resp = self.bybit_client.get_wallet_balance()
+            balance_resp = self._get_wallet_balance()
             if not balance_resp:
                 return None
             
@@ -1069,6 +1111,15 @@ class TradingWorker(QThread):
             # self.trading_enabled = False  # УБРАНО: не отключаем торговлю при остановке потока
             self.logger.info("Остановка торгового потока запрошена")
             
+            if self.market_stream is not None:
+                self.market_stream.stop(timeout=1.0)
+                self.market_stream = None
+            if self.portfolio_stream is not None:
+                self.portfolio_stream.stop(timeout=1.0)
+                self.portfolio_stream = None
+            if self.bybit_client is not None:
+                self.bybit_client.metrics.stop_periodic_log()
+            
             # Отправляем сигнал об остановке только если торговля была отключена
             if not self.trading_enabled:
                 self.status_updated.emit("Отключено")
@@ -3132,22 +3183,19 @@ class TradingBotMainWindow(QMainWindow):
             timestamp: Опциональный параметр времени обновления (для совместимости с сигналами)
         """
         try:
-            # Создаем загрузчик данных тикеров
-            ticker_loader = TickerDataLoader()
+            # Общий снимок данных тикеров (файл разбирается только при изменении)
+            from src.tools.ticker_data_loader import shared_ticker_snapshots
+            snapshot = shared_ticker_snapshots().get()
             
-            # Проверяем существование файла с данными тикеров
-            import os
-            data_path = os.path.join(os.path.expanduser("~"), "AppData", "Local", "BybitTradingBot", "data", "tickers_data.json")
-            
-            if not os.path.exists(data_path):
-                self.add_log_message("⚠️ Файл с данными тикеров не найден. Запустите программу просмотра тикеров.")
+            # Нет ни общего снимка рынка, ни файла программы тикеров
+            if snapshot is None:
+                self.add_log_message("⚠️ Данные тикеров не найдены. Запустите программу просмотра тикеров.")
                 if hasattr(self, 'last_ticker_update_label'):
                     self.last_ticker_update_label.setText("Нет данных (программа тикеров не запущена)")
                     self.last_ticker_update_label.setStyleSheet("font-weight: bold; color: #e74c3c;")
                 return False
             
-            # Загружаем данные
-            ticker_data = ticker_loader.load_tickers_data()
+            ticker_data = snapshot._asdict()
             
             if ticker_data and 'tickers' in ticker_data:
                 # Проверяем тип данных тикеров
@@ -3169,11 +3217,10 @@ class TradingBotMainWindow(QMainWindow):
                 # Проверяем актуальность данных (не старше 5 минут)
                 current_time = datetime.now()
                 time_diff = current_time - update_time
+                update_time_str = update_time.strftime("%d.%m.%Y %H:%M:%S")
                 
                 # Обновляем отображение в интерфейсе
                 if hasattr(self, 'last_ticker_update_label'):
-                    update_time_str = update_time.strftime("%d.%m.%Y %H:%M:%S")
-                    
                     if time_diff.total_seconds() > 300:  # Старше 5 минут
                         self.last_ticker_update_label.setText(f"Устаревшие данные: {update_time_str}")
                         self.last_ticker_update_label.setStyleSheet("font-weight: bold; color: #e74c3c;")
@@ -4158,28 +4205,13 @@ class TradingBotMainWindow(QMainWindow):
         
         try:
             # Получаем данные для графика с указанием категории 'spot'
-            try:
-                response = self.bybit_client.get_klines(category='spot', symbol=symbol, interval=interval, limit=100)
-            except Exception as kline_error:
-                if "Invalid period" in str(kline_error):
-                    self.logger.warning(f"Символ {symbol}: ошибка периода, пробуем альтернативный интервал")
-                    # Преобразуем интервал в поддерживаемый формат
-                    interval_map_fallback = {
-                        "4h": "240",
-                        "4h": "240",
-                        "1d": "D",
-                        "1w": "W",
-                        "1M": "M"
-                    }
-                    fallback_interval = interval_map_fallback.get(interval, "15")
-                    self.add_log_message(f"ℹ️ Используем альтернативный интервал: {fallback_interval}")
-                    response = self.bybit_client.get_klines(category='spot', symbol=symbol, interval=fallback_interval, limit=100)
-                else:
-                    raise kline_error
+            # (неподдерживаемый интервал клиент заменяет сам)
+            response = self.bybit_client.get_klines(category='spot', symbol=symbol, interval=interval, limit=100)
             
             # Извлекаем список свечей из структуры ответа API
-            if 'result' in response and 'list' in response['result']:
-                klines = response['result']['list']
+            # (get_klines возвращает поле result ответа)
+            if 'list' in response:
+                klines = response['list']
                 # Строим график
                 self.plot_ticker_chart(symbol, interval, klines)
             else:
@@ -4252,27 +4284,21 @@ class TradingBotMainWindow(QMainWindow):
             def execute_buy_async():
                 try:
                     # Загружаем данные тикеров из программы тикеров
-                    from src.tools.ticker_data_loader import TickerDataLoader
-                    ticker_loader = TickerDataLoader()
-                    tickers_data = ticker_loader.load_tickers_data()
+                    from src.tools.ticker_data_loader import TickerTable, shared_ticker_snapshots
+                    tickers = TickerTable.from_any(shared_ticker_snapshots().get_tickers())
                     
-                    if not tickers_data:
+                    if not len(tickers):
                         self.add_log_message("❌ Нет данных по тикерам для покупки")
                         return
                     
-                    # Находим самый дешевый тикер по цене
+                    # Находим самый дешевый тикер по колонке цен (некорректная цена - 0.0)
                     lowest_symbol = None
                     lowest_price = float('inf')
                     
-                    for symbol, data in tickers_data.items():
-                        if symbol.endswith('USDT'):
-                            try:
-                                price = float(data.get('lastPrice', 0))
-                                if 0 < price < lowest_price:
-                                    lowest_price = price
-                                    lowest_symbol = symbol
-                            except (ValueError, TypeError):
-                                continue
+                    for symbol, price in zip(tickers.symbols, tickers.last_price.tolist()):
+                        if symbol.endswith('USDT') and 0 < price < lowest_price:
+                            lowest_price = price
+                            lowest_symbol = symbol
                     
                     if not lowest_symbol:
                         self.add_log_message("❌ Не найден подходящий тикер для покупки")
@@ -13,8 +13,6 @@ import threading
 from datetime import datetime
 from typing import Dict, List, Optional
 from pathlib import Path
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
 
 # Добавляем путь к модулям проекта
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -22,7 +20,10 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 try:
     from src.strategies.adaptive_ml import AdaptiveMLStrategy
     from src.api.bybit_client import BybitClient
-    from src.tools.ticker_data_loader import TickerDataLoader
+    from src.api.klines import as_klines
+    from src.tools.ticker_data_loader import TickerDataLoader, shared_ticker_snapshots
+    from src.data.candle_cache import CandleCache
+    from src.data.kline_store import KlineStore
     from config import get_api_credentials, get_ml_config
 except ImportError as e:
     print(f"Ошибка импорта модулей: {e}")
@@ -30,25 +31,51 @@ except ImportError as e:
     sys.exit(1)
 
 
-class TickerDataWatcher(FileSystemEventHandler):
-    """Класс для мониторинга изменений в файле tickers_data.json"""
+class TickerDataWatcher:
+    """Отслеживание новых версий данных тикеров
     
-    def __init__(self, trainer):
+    Версия читается из заголовка снимка рынка в общей памяти (или, если
+    программа тикеров его не публикует, из файлов снимка) раз в poll_interval.
+    """
+    
+    def __init__(self, trainer, snapshots, poll_interval: float = 1.0):
         self.trainer = trainer
+        self.snapshots = snapshots
+        self.poll_interval = poll_interval
         self.last_modified = 0
-        
-    def on_modified(self, event):
-        if event.is_directory:
-            return
+        self.last_version = snapshots.version()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="TickerDataWatcher", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.poll_interval + 1)
+            self._thread = None
+    
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                version = self.snapshots.version()
+            except Exception as e:
+                print(f"⚠️ Ошибка чтения версии данных тикеров: {e}")
+                continue
+            if version is None or version == self.last_version:
+                continue
+            self.last_version = version
             
-        if event.src_path.endswith('tickers_data.json'):
-            # Проверяем, чтобы не обрабатывать одно и то же изменение несколько раз
+            # Проверяем, чтобы не обрабатывать обновления чаще чем раз в 5 секунд
             current_time = time.time()
-            if current_time - self.last_modified < 5:  # Игнорируем изменения чаще чем раз в 5 секунд
-                return
+            if current_time - self.last_modified < 5:
+                continue
                 
             self.last_modified = current_time
-            print(f"🔄 Обнаружено обновление данных тикеров: {datetime.now().strftime('%H:%M:%S')}")
+            print(f"🔄 Обнаружено обновление данных тикеров (версия {version}): {datetime.now().strftime('%H:%M:%S')}")
             
             # Запускаем автоматическое обучение в отдельном потоке
             threading.Thread(target=self.trainer.auto_retrain, daemon=True).start()
@@ -61,7 +88,6 @@ class ConsoleTrainer:
         self.symbols = []
         self.symbol_categories = {}
         self.file_watcher = None
-        self.observer = None
         self.auto_training_enabled = True
         self.init_components()
         self.setup_file_monitoring()
@@ -102,6 +128,10 @@ class ConsoleTrainer:
             if self.ticker_loader:
                 self.ml_strategy.ticker_loader = self.ticker_loader
             
+            # Локальное хранилище свечей: повторное обучение догружает только новые свечи
+            self.kline_store = KlineStore(testnet=api_creds['testnet'])
+            self.ml_strategy.candle_cache = CandleCache()
+            
             # Загружаем существующие модели
             self.ml_strategy.load_models()
             
@@ -161,10 +191,10 @@ class ConsoleTrainer:
         try:
             # Сначала пытаемся загрузить из TickerDataLoader
             if self.ticker_loader:
-                # Загружаем полные данные тикеров
-                full_ticker_data = self.ticker_loader.load_tickers_data()
-                if full_ticker_data and 'tickers' in full_ticker_data:
-                    tickers = full_ticker_data['tickers']
+                # Общий снимок данных тикеров (из общей памяти, если программа тикеров ее публикует)
+                full_ticker_data = shared_ticker_snapshots().get()
+                if full_ticker_data:
+                    tickers = full_ticker_data.tickers
                     
                     # Извлекаем USDT символы из списка тикеров
                     if isinstance(tickers, list):
@@ -267,30 +297,10 @@ class ConsoleTrainer:
                 # Получаем исторические данные
                 klines = []
                 try:
-                    api_response = self.ml_strategy.api_client.get_klines(
-                        symbol=symbol,
-                        interval='4h',
-                        limit=1000,
-                        category=category
-                    )
+                    # Из API запрашиваются только свечи, которых нет в локальном хранилище
+                    klines = self.kline_store.recent(self.ml_strategy.api_client, category, symbol, '4h', 1000)
                     
-                    # Извлекаем данные из ответа API
-                    if api_response and isinstance(api_response, dict) and 'list' in api_response:
-                        raw_klines = api_response['list']
-                        # Преобразуем формат API в ожидаемый формат
-                        klines = []
-                        for kline in raw_klines:
-                            klines.append({
-                                'timestamp': int(kline[0]),
-                                'open': float(kline[1]),
-                                'high': float(kline[2]),
-                                'low': float(kline[3]),
-                                'close': float(kline[4]),
-                                'volume': float(kline[5])
-                            })
-                        print(f"📈 Загружены данные для {symbol}: {len(klines)} записей")
-                    elif api_response and isinstance(api_response, list):
-                        klines = api_response
+                    if klines:
                         print(f"📈 Загружены данные для {symbol}: {len(klines)} записей")
                     else:
                         print(f"⚠️ API не вернул данные для {symbol}")
@@ -304,6 +314,16 @@ class ConsoleTrainer:
                     else:
                         print(f"⚠️ Ошибка API для {symbol}: {error_msg}")
                 
+                # Затем из бинарного кэша загрузчика истории (memmap, без разбора файла)
+                if (not klines or len(klines) < 100) and self.ml_strategy.candle_cache is not None:
+                    try:
+                        cached = self.ml_strategy.candle_cache.tail(symbol, '4h', 1000)[::-1]
+                        if len(cached) > len(klines):
+                            klines = cached
+                            print(f"📁 Загружены данные из кэша свечей для {symbol}: {len(klines)} записей")
+                    except Exception as e:
+                        print(f"⚠️ Ошибка чтения кэша свечей для {symbol}: {e}")
+                
                 # Если API не дал данных, пытаемся загрузить из кэша
                 if not klines or len(klines) < 100:
                     try:
@@ -325,6 +345,8 @@ class ConsoleTrainer:
                 # Извлекаем признаки и метки
                 features, labels = [], []
                 window = self.ml_strategy.feature_window
+                klines = as_klines(klines)
+                closes = klines.close
                 
                 for j in range(window, len(klines) - 1):
                     try:
@@ -332,8 +354,8 @@ class ConsoleTrainer:
                         if f and len(f) > 0:
                             features.append(f)
                             # Создаем метку на основе изменения цены
-                            current_price = float(klines[j]['close'])
-                            future_price = float(klines[j + 1]['close'])
+                            current_price = float(closes[j])
+                            future_price = float(closes[j + 1])
                             change = (future_price - current_price) / current_price
                             
                             # Улучшенный алгоритм генерации меток
@@ -424,7 +446,7 @@ class ConsoleTrainer:
         print("\n✅ Работа завершена!")
     
     def setup_file_monitoring(self):
-        """Настройка мониторинга файла tickers_data.json"""
+        """Настройка мониторинга обновлений данных тикеров"""
         try:
             # Путь к файлу с данными тикеров
             data_path = Path.home() / "AppData" / "Local" / "BybitTradingBot" / "data"
@@ -433,13 +455,11 @@ class ConsoleTrainer:
                 print(f"⚠️ Директория с данными не найдена: {data_path}")
                 return
             
-            # Создаем наблюдатель за файлами
-            self.file_watcher = TickerDataWatcher(self)
-            self.observer = Observer()
-            self.observer.schedule(self.file_watcher, str(data_path), recursive=False)
-            self.observer.start()
+            # Опрос версии снимка рынка (общая память, без разбора JSON)
+            self.file_watcher = TickerDataWatcher(self, shared_ticker_snapshots())
+            self.file_watcher.start()
             
-            print(f"👁️ Мониторинг файла tickers_data.json активирован")
+            print(f"👁️ Мониторинг данных тикеров активирован")
             print(f"📁 Отслеживаемая директория: {data_path}")
             
         except Exception as e:
@@ -475,9 +495,8 @@ class ConsoleTrainer:
     
     def stop_monitoring(self):
         """Остановка мониторинга файлов"""
-        if self.observer:
-            self.observer.stop()
-            self.observer.join()
+        if self.file_watcher:
+            self.file_watcher.stop()
             print("🛑 Мониторинг файлов остановлен")
     
     def run_with_monitoring(self):
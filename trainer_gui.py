@@ -27,6 +27,10 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 try:
     from src.strategies.adaptive_ml import AdaptiveMLStrategy
     from src.api.bybit_client import BybitClient
+    from src.api.klines import as_klines
+    from src.data.candle_cache import CandleCache
+    from src.tools.ticker_data_loader import TickerDataLoader, shared_ticker_snapshots
+    from src.data.kline_store import KlineStore
     from config import get_api_credentials, get_ml_config
 except ImportError as e:
     print(f"Ошибка импорта модулей: {e}")
@@ -71,8 +75,10 @@ class TrainingWorker(QThread):
                 
                 # Пытаемся получить данные через API с оптимизированной логикой
                 try:
-                    klines_response = self.ml_strategy.api_client.get_klines(category=category, symbol=symbol, interval='60', limit=1000)
-                    if not klines_response or 'list' not in klines_response or not klines_response['list']:
+                    # Из API запрашиваются только свечи, которых нет в локальном хранилище
+                    kline_store = self.ml_strategy.kline_store
+                    klines = kline_store.recent(self.ml_strategy.api_client, category, symbol, '60', 1000)
+                    if not klines:
                         # Пробуем альтернативную категорию только если символ поддерживает несколько категорий
                         available_categories = self.symbol_categories.get(symbol, [category])
                         alt_categories = [cat for cat in available_categories if cat != category]
@@ -80,22 +86,11 @@ class TrainingWorker(QThread):
                         if alt_categories:
                             alt_category = alt_categories[0]
                             self.log_updated.emit(f"🔄 Пробуем альтернативную категорию '{alt_category}' для {symbol}")
-                            klines_response = self.ml_strategy.api_client.get_klines(category=alt_category, symbol=symbol, interval='60', limit=1000)
+                            klines = kline_store.recent(self.ml_strategy.api_client, alt_category, symbol, '60', 1000)
                         else:
                             self.log_updated.emit(f"⚠️ Символ {symbol} не поддерживается в других категориях")
                     
-                    # Извлекаем данные из ответа API
-                    if klines_response and 'list' in klines_response and klines_response['list']:
-                        klines_data = klines_response['list']
-                        # Преобразуем в нужный формат
-                        for kline in klines_data:
-                            klines.append({
-                                'open': float(kline[1]),
-                                'high': float(kline[2]), 
-                                'low': float(kline[3]),
-                                'close': float(kline[4]),
-                                'volume': float(kline[5])
-                            })
+                    if klines:
                         self.log_updated.emit(f"✅ Загружено {len(klines)} свечей для {symbol} через API")
                     else:
                         self.log_updated.emit(f"⚠️ API не вернул данные для {symbol}")
@@ -111,6 +106,16 @@ class TrainingWorker(QThread):
                     else:
                         self.log_updated.emit(f"⚠️ Ошибка API для {symbol}: API ошибка: {error_msg}")
                 
+                # Затем из бинарного кэша загрузчика истории (memmap, без разбора файла)
+                if (not klines or len(klines) < 100) and self.ml_strategy.candle_cache is not None:
+                    try:
+                        cached = self.ml_strategy.candle_cache.tail(symbol, '60', 1000)[::-1]
+                        if len(cached) > len(klines):
+                            klines = cached
+                            self.log_updated.emit(f"📁 Загружены данные из кэша свечей для {symbol}: {len(klines)} записей")
+                    except Exception as e:
+                        self.log_updated.emit(f"⚠️ Ошибка чтения кэша свечей для {symbol}: {e}")
+                
                 # Если API не дал данных, пытаемся загрузить из TickerDataLoader
                 if not klines or len(klines) < 100:
                     try:
@@ -137,6 +142,8 @@ class TrainingWorker(QThread):
                 # Извлекаем признаки и метки с улучшенной логикой
                 features, labels = [], []
                 window = self.ml_strategy.feature_window
+                klines = as_klines(klines)
+                closes, highs, lows = klines.close, klines.high, klines.low
                 
                 for j in range(window, len(klines) - 1):
                     if not self.is_running:
@@ -147,12 +154,12 @@ class TrainingWorker(QThread):
                         if f and len(f) > 0:
                             features.append(f)
                             # Создаем метку на основе изменения цены
-                            current_price = float(klines[j]['close'])
-                            future_price = float(klines[j + 1]['close'])
+                            current_price = float(closes[j])
+                            future_price = float(closes[j + 1])
                             change = (future_price - current_price) / current_price
                             
                             # Адаптивные пороги в зависимости от волатильности
-                            volatility = abs(float(klines[j]['high']) - float(klines[j]['low'])) / current_price
+                            volatility = abs(float(highs[j]) - float(lows[j])) / current_price
                             threshold = max(0.001, volatility * 0.5)  # Минимум 0.1%, максимум зависит от волатильности
                             
                             if change > threshold:
@@ -263,7 +270,7 @@ class TrainingMonitor(QMainWindow):
         self.pending_training = False
         self.symbol_progress = {}
         self.expected_symbol_count = 0
-        self.last_ticker_file_mtime = None
+        self.last_ticker_version = None
         self.ticker_data_file = None
 
         # Инициализация компонентов
@@ -289,11 +296,10 @@ class TrainingMonitor(QMainWindow):
             
             # Инициализируем TickerDataLoader для кэширования данных
             try:
-                from src.tools.ticker_data_loader import TickerDataLoader
                 self.ticker_loader = TickerDataLoader()
                 self.ticker_data_file = self.ticker_loader.get_data_file_path()
-                if self.ticker_data_file.exists():
-                    self.last_ticker_file_mtime = self.ticker_data_file.stat().st_mtime
+                # Версия данных тикеров из общего снимка рынка (без чтения файла)
+                self.last_ticker_version = shared_ticker_snapshots().version()
             except Exception as e:
                 print(f"Ошибка инициализации TickerDataLoader: {e}")
                 self.ticker_loader = None
@@ -312,6 +318,10 @@ class TrainingMonitor(QMainWindow):
             if self.ticker_loader:
                 self.ml_strategy.ticker_loader = self.ticker_loader
             
+            # Локальное хранилище свечей: повторное обучение догружает только новые свечи
+            self.ml_strategy.kline_store = KlineStore(testnet=api_creds['testnet'])
+            self.ml_strategy.candle_cache = CandleCache()
+            
             # Загружаем существующие модели
             self.ml_strategy.load_models()
             
@@ -503,13 +513,12 @@ class TrainingMonitor(QMainWindow):
             return
 
         try:
-            data_file = self.ticker_data_file or self.ticker_loader.get_data_file_path()
-            if not data_file.exists():
+            version = shared_ticker_snapshots().version()
+            if version is None:
                 return
 
-            mtime = data_file.stat().st_mtime
-            if self.last_ticker_file_mtime is None or mtime > self.last_ticker_file_mtime:
-                self.last_ticker_file_mtime = mtime
+            if version != self.last_ticker_version:
+                self.last_ticker_version = version
                 self.log("📥 Обнаружено обновление данных тикеров. Запускаем автоматическое обучение.")
                 self.handle_new_ticker_data()
         except Exception as e:
@@ -651,7 +660,9 @@ class TrainingMonitor(QMainWindow):
         try:
             # Сначала пытаемся загрузить из TickerDataLoader
             if self.ticker_loader:
-                ticker_data = self.ticker_loader.get_ticker_data()
+                # Общий снимок данных тикеров (из общей памяти, если программа тикеров ее публикует)
+                snapshot = shared_ticker_snapshots().get()
+                ticker_data = snapshot.tickers if snapshot is not None else self.ticker_loader.get_ticker_data()
                 if ticker_data:
                     # Получаем все символы из загруженных данных
                     all_symbols = self.extract_symbols_from_ticker_data(ticker_data)